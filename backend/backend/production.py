@@ -0,0 +1,21 @@
+# Production profile: DJANGO_SETTINGS_MODULE=backend.production (gunicorn.conf.py sets it).
+# The development settings plus persistent connections, debug off and a job pool sized
+# to share the cores with the other gunicorn workers.
+import os
+from backend.settings import *  # noqa: F401,F403
+
+DEBUG = os.environ.get('DJANGO_DEBUG') == '1'
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', SECRET_KEY)
+
+# Keep each thread's connection (and its PRAGMAs) across requests, checked before reuse
+DATABASES['default'] = {**DATABASES['default'], 'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True}
+
+# Every gunicorn worker has its own analysis pool; together they use each core once
+WEB_WORKERS = int(os.environ.get('WEB_CONCURRENCY', 2))
+ANALYSIS_JOBS = {**ANALYSIS_JOBS, 'WORKERS': max(1, (os.cpu_count() or 1) // WEB_WORKERS)}
+
+# Shared by the gunicorn workers so each scrape of /api/metrics/ covers all of them
+# (gunicorn.conf.py creates a fresh directory at start; see core/metrics.py)
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+
+SESSION_COOKIE_SECURE = CSRF_COOKIE_SECURE = os.environ.get('DJANGO_HTTPS') == '1'
@@ -1,6 +1,7 @@
 
 from pathlib import Path
 import os
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -30,6 +31,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.InstrumentationMiddleware',
+    'core.middleware.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     "whitenoise.middleware.WhiteNoiseMiddleware", 
@@ -66,9 +69,21 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Concurrent writers (request threads, job workers, the retention sweeper)
+            # wait up to `timeout` seconds for the lock instead of failing with
+            # "database is locked"; IMMEDIATE takes the write lock when a transaction
+            # starts, so two transactions never deadlock upgrading from read to write
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            # WAL: readers and the writer no longer block each other
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL',
+        },
     }
 }
 
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     { 'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator', },
@@ -92,6 +107,57 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 # CORS Config (Allow React to talk to Django)
 CORS_ALLOW_ALL_ORIGINS = True
+# Conditional GETs from the web app: it sends If-None-Match and reads the ETag back
+CORS_ALLOW_HEADERS = (*default_headers, 'if-none-match')
+CORS_EXPOSE_HEADERS = ['ETag']
 ALLOWED_HOSTS = ['*']  
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
\ No newline at end of file
+STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+
+# Analysis result cache (keyed by upload hash, evicted by count/size/age)
+ANALYSIS_CACHE = {
+    'MAX_ENTRIES': 200,
+    'MAX_BYTES': 256 * 1024 * 1024,
+    'MAX_AGE_SECONDS': 7 * 24 * 3600,
+}
+
+# Background analysis jobs (local process pool, job state kept in the DB)
+ANALYSIS_JOBS = {
+    'WORKERS': min(4, os.cpu_count() or 1),
+    'EAGER': False,
+}
+
+# Upload retention: a background sweeper removes the oldest uploads (with their analyses,
+# column stores and cached results) once any quota is exceeded
+RETENTION = {
+    'MAX_FILES': 1000,
+    'MAX_BYTES': 10 * 1024 ** 3,
+    'MAX_AGE_SECONDS': 90 * 24 * 3600,
+    'MIN_AGE_SECONDS': 600,
+    'INTERVAL_SECONDS': 300,
+}
+
+# Request instrumentation: per-stage Server-Timing headers, and sampling profiles for
+# requests sent with ?profile=1 or X-Profile: 1 (written to PROFILING['DIR'])
+SERVER_TIMING = True
+PROFILING = {
+    'ENABLED': False,
+    'INTERVAL': 0.005,
+    'DIR': os.path.join(BASE_DIR, 'profiles'),
+}
+
+# API renderers: JSON (orjson-encoded when installed) and, when msgpack is installed,
+# application/msgpack for clients that ask for it
+try:
+    import msgpack  # noqa: F401
+    BINARY_RENDERERS = ['core.renderers.MessagePackRenderer']
+except ImportError:
+    BINARY_RENDERERS = []
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        *BINARY_RENDERERS,
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
@@ -5,14 +5,28 @@ from django.conf import settings
 from django.conf.urls.static import static
 
 # Import the views from our 'core' app
-from core.views import UploadAndProcessView, HistoryView
+from core.views import (UploadAndProcessView, DatasetLookupView, BatchUploadView, BatchStatusView, HistoryView,
+                        HistoryDetailView, JobStatusView, DatasetChartView, DatasetSeriesView,
+                        DatasetAnomaliesView, DatasetRowsView, MergedStatsView, AggregateView, MetricsView)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     
     # API Endpoints
     path('api/upload/', UploadAndProcessView.as_view(), name='file-upload'),
+    path('api/upload/batch/', BatchUploadView.as_view(), name='batch-upload'),
+    path('api/upload/<str:sha256>/', DatasetLookupView.as_view(), name='file-lookup'),
+    path('api/batches/<uuid:pk>/', BatchStatusView.as_view(), name='batch-status'),
     path('api/history/', HistoryView.as_view(), name='file-history'),
+    path('api/history/<int:pk>/', HistoryDetailView.as_view(), name='file-history-detail'),
+    path('api/jobs/<uuid:pk>/', JobStatusView.as_view(), name='job-status'),
+    path('api/datasets/<int:pk>/chart/', DatasetChartView.as_view(), name='dataset-chart'),
+    path('api/datasets/<int:pk>/series/', DatasetSeriesView.as_view(), name='dataset-series'),
+    path('api/datasets/<int:pk>/anomalies/', DatasetAnomaliesView.as_view(), name='dataset-anomalies'),
+    path('api/datasets/<int:pk>/rows/', DatasetRowsView.as_view(), name='dataset-rows'),
+    path('api/stats/merged/', MergedStatsView.as_view(), name='merged-stats'),
+    path('api/aggregate/', AggregateView.as_view(), name='aggregate'),
+    path('api/metrics/', MetricsView.as_view(), name='metrics'),
 ]
 
 # Allow serving media files (CSVs) during development
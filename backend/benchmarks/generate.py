@@ -0,0 +1,106 @@
+"""
+Deterministic synthetic equipment CSVs for the benchmarks.
+
+    python benchmarks/generate.py 1e6 data.csv --time --types 40
+
+The same arguments always produce the same bytes: rows are generated in fixed
+blocks, each with its own seeded random stream, and written one block at a
+time, so even 1e8-row files never have to fit in memory.
+"""
+import argparse
+import functools
+import numpy as np
+
+BLOCK_ROWS = 1 << 20
+BASE_TYPES = ['Pump', 'Valve', 'Reactor', 'Compressor', 'Condenser', 'HeatExchanger']
+START_DATE = np.datetime64('2024-01-01')
+# Values are written with two decimals and clipped to this range (in hundredths)
+LOW_CENTS, HIGH_CENTS = -100000, 300000
+
+
+def type_names(types):
+    # The familiar names first, then numbered ones for large fleets
+    return BASE_TYPES[:types] + [f'Type-{i}' for i in range(len(BASE_TYPES), types)]
+
+
+@functools.lru_cache(maxsize=None)
+def _value_strings():
+    # Every two-decimal value as text, plus '' for missing, so formatting a column is one lookup
+    return np.array([f'{c / 100:.2f}' for c in range(LOW_CENTS, HIGH_CENTS)] + [''], dtype=object)
+
+
+@functools.lru_cache(maxsize=None)
+def _clock_strings():
+    return np.array([f'{h:02d}:{m:02d}:{s:02d}' for h in range(24) for m in range(60) for s in range(60)],
+                    dtype=object)
+
+
+def _format_values(x):
+    cents = np.clip(np.rint(np.nan_to_num(x) * 100), LOW_CENTS, HIGH_CENTS - 1)
+    cents = np.where(np.isnan(x), HIGH_CENTS, cents).astype(np.int64)
+    return _value_strings()[cents - LOW_CENTS]
+
+
+def _format_times(seconds):
+    # One reading per second from START_DATE
+    days = seconds // 86400
+    dates = np.array([str(START_DATE + d) for d in range(days[0], days[-1] + 1)], dtype=object)
+    return dates[days - days[0]] + ' ' + _clock_strings()[seconds % 86400]
+
+
+def _block(index, rows, seed, types, equipment, time, nan_rate, spike_rate):
+    rng = np.random.default_rng([seed, index])
+    names = np.array(type_names(types), dtype=object)
+    t = rng.integers(0, types, rows)
+    unit = rng.integers(0, equipment, rows)
+    labels = np.array([f'{name}-{k}' for name in names for k in range(equipment)], dtype=object)
+
+    # Each type runs at its own operating point so per-type stats differ
+    values = {
+        'Flowrate': rng.normal(100 + 10 * (t % 5), 20),
+        'Pressure': rng.normal(5 + 0.5 * (t % 4), 1.2),
+        'Temperature': rng.normal(100 + 8 * (t % 6), 12),
+    }
+    values['Pressure'][rng.random(rows) < spike_rate] += 10 * 1.2
+    for x in values.values():
+        x[rng.random(rows) < nan_rate] = np.nan
+
+    fields = [labels[t * equipment + unit], names[t]] + [_format_values(x) for x in values.values()]
+    if time:
+        fields.insert(0, _format_times(np.arange(index * BLOCK_ROWS, index * BLOCK_ROWS + rows)))
+    lines = fields[0]
+    for field in fields[1:]:
+        lines = lines + ',' + field
+    return lines
+
+
+def generate(path, rows, seed=0, types=6, equipment=8, time=True, nan_rate=0.01, spike_rate=0.001):
+    """Writes `rows` rows to `path` and returns the path."""
+    rows = int(rows)
+    header = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+    with open(path, 'w', newline='') as f:
+        f.write(','.join((['Time'] if time else []) + header) + '\n')
+        for index, start in enumerate(range(0, rows, BLOCK_ROWS)):
+            lines = _block(index, min(BLOCK_ROWS, rows - start), seed, types, equipment,
+                           time, nan_rate, spike_rate)
+            f.write('\n'.join(lines.tolist()) + '\n')
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('rows', type=float, help='number of rows, e.g. 1e6')
+    parser.add_argument('path')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--types', type=int, default=6, help='distinct equipment types')
+    parser.add_argument('--equipment', type=int, default=8, help='units per type')
+    parser.add_argument('--time', action='store_true', help='add a Time column')
+    parser.add_argument('--nan-rate', type=float, default=0.01, help='fraction of missing values per column')
+    parser.add_argument('--spike-rate', type=float, default=0.001, help='fraction of Pressure spikes')
+    args = parser.parse_args()
+    generate(args.path, args.rows, args.seed, args.types, args.equipment, args.time,
+             args.nan_rate, args.spike_rate)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Load test: concurrent clients against api/upload/ and api/history/.
+
+    python benchmarks/load.py                                     # gunicorn, production profile
+    python benchmarks/load.py --server runserver --profile dev    # the development setup
+    python benchmarks/load.py --url http://127.0.0.1:8000         # an already running server
+
+Each of --concurrency threads loops until --duration is over, sending an
+upload (share --upload-share) or a history request. Uploads cycle through
+--files distinct synthetic CSVs of --rows rows, so the first round is
+analysed and later ones hit the result cache. Reported per endpoint:
+requests, errors (by status), throughput and p50/p95/p99/max latency.
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from benchmarks.generate import generate  # noqa: E402
+from benchmarks.run import DATASETS, DevServer, MultipartFile, environment  # noqa: E402
+
+
+def percentile(values, q):
+    # Nearest rank on sorted values
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def client(url, files, upload_share, deadline, seed, records):
+    import requests
+    session = requests.Session()
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        if rng.random() < upload_share:
+            op = 'upload'
+            body = MultipartFile(files[rng.randrange(len(files))])
+            send = lambda: session.post(f'{url}/api/upload/', data=body,
+                                        headers={'Content-Type': body.content_type}, timeout=300)
+        else:
+            op = 'history'
+            send = lambda: session.get(f'{url}/api/history/', timeout=300)
+        start = time.perf_counter()
+        try:
+            response = send()
+            status = response.status_code
+            cached = op == 'upload' and status == 200 and response.json().get('cached')
+        except requests.RequestException as e:
+            status, cached = type(e).__name__, False
+        records.append((op, status, time.perf_counter() - start, bool(cached)))
+
+
+def summarize(records, seconds):
+    report = {}
+    for op in sorted({r[0] for r in records}):
+        rows = [r for r in records if r[0] == op]
+        ok = sorted(r[2] for r in rows if isinstance(r[1], int) and r[1] < 400)
+        errors = Counter(str(r[1]) for r in rows if not (isinstance(r[1], int) and r[1] < 400))
+        report[op] = {
+            'requests': len(rows),
+            'errors': dict(errors),
+            'per_second': round(len(ok) / seconds, 2),
+            **{f'{name}_ms': round(percentile(ok, q) * 1000, 1) if ok else None
+               for name, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99), ('max', 1.0))},
+        }
+        if op == 'upload':
+            report[op]['cache_hits'] = sum(r[3] for r in rows)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='server to test (default: start one on a throwaway database)')
+    parser.add_argument('--server', choices=('gunicorn', 'runserver'), default='gunicorn')
+    parser.add_argument('--profile', choices=('production', 'dev'), default='production')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30, help='seconds of load')
+    parser.add_argument('--upload-share', type=float, default=0.2, help='fraction of requests that are uploads')
+    parser.add_argument('--rows', type=int, default=10_000, help='rows per uploaded CSV')
+    parser.add_argument('--files', type=int, default=20, help='distinct CSVs to upload')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='also write the report as JSON here')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir, contextlib.ExitStack() as stack:
+        files = []
+        for i in range(args.files):
+            path = os.path.join(work_dir, f'load-{i}.csv')
+            generate(path, args.rows, seed=args.seed + i, **DATASETS['timed'])
+            files.append(path)
+        url = args.url
+        if url is None:
+            profile = None if args.profile == 'dev' else args.profile
+            url = stack.enter_context(DevServer(os.path.join(work_dir, 'server'), args.server, profile)).url
+
+        records = []
+        deadline = time.perf_counter() + args.duration
+        threads = [threading.Thread(target=client, args=(url, files, args.upload_share, deadline,
+                                                         args.seed + i, records))
+                   for i in range(args.concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - start
+
+    report = {
+        'environment': environment(),
+        'settings': {key: value for key, value in vars(args).items() if key != 'out'},
+        'seconds': round(seconds, 2),
+        'results': summarize(records, seconds),
+    }
+    print(f"{'endpoint':8} {'requests':>8} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}  errors")
+    for op, r in report['results'].items():
+        print(f"{op:8} {r['requests']:>8} {r['per_second']:>7} {r['p50_ms']!s:>8} {r['p95_ms']!s:>8} "
+              f"{r['p99_ms']!s:>8} {r['max_ms']!s:>8}  {r['errors'] or '-'}")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 1 if any(r['errors'] for r in report['results'].values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
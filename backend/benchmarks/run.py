@@ -0,0 +1,374 @@
+"""
+Backend benchmark suite.
+
+    python benchmarks/run.py                                  # 1e3..1e6 rows, all datasets
+    python benchmarks/run.py --sizes 1e7,1e8 --datasets timed --repeat 1 --no-upload
+    python benchmarks/run.py --sizes 1e5 --baseline benchmarks/results/abc1234.json
+
+For every dataset and size a synthetic CSV is generated (or reused from
+--data-dir), then measured in fresh processes:
+
+  analyse  process_csv_data exactly as the job runner calls it (column store
+           included): best-of-N seconds, rows/s, peak RSS, and the time and
+           size of the JSON the API sends for the result.
+  upload   POST api/upload/ over HTTP until the result is ready (in the
+           response when analysed during the upload, else after the job),
+           then the same file again (cache hit), against a dev server on a
+           throwaway database.
+
+Results are written as one JSON document. With --baseline, entries matching on
+(bench, dataset, rows) are compared and the exit status is 1 when any metric
+got worse by more than --tolerance.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.generate import generate  # noqa: E402
+
+# Dataset shapes: generator keyword arguments
+DATASETS = {
+    'timed': {'time': True, 'types': 6, 'equipment': 8, 'nan_rate': 0.01},
+    'plain': {'time': False, 'types': 6, 'equipment': 8, 'nan_rate': 0.01},
+    'fleet': {'time': True, 'types': 200, 'equipment': 25, 'nan_rate': 0.05},
+}
+DEFAULT_SIZES = '1e3,1e4,1e5,1e6'
+# Metrics compared against a baseline, and the absolute change below which a difference is noise
+COMPARED = {
+    'seconds': 0.02,
+    'json_seconds': 0.01,
+    'peak_rss_mb': 8,
+    'job_seconds': 0.1,
+    'cached_seconds': 0.05,
+}
+
+
+def peak_rss_mb():
+    # Linux: VmHWM belongs to this address space; ru_maxrss would carry over the parent's peak
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:       # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+# Child processes: each measurement runs in a fresh interpreter so peak RSS is its own
+
+def _setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    import django
+    django.setup()
+
+
+def child_analyse(spec):
+    _setup_django()
+    from rest_framework.renderers import JSONRenderer
+    from core.models import json_safe, public_result
+    from core.streaming import should_stream
+    from core.utils import process_csv_data
+
+    base_rss = peak_rss_mb()
+    runs, json_runs = [], []
+    for i in range(spec['repeat']):
+        store_dir = os.path.join(os.environ['BENCH_DIR'], f'store-{i}')
+        start = time.perf_counter()
+        result = process_csv_data(spec['path'], store_dir=store_dir)
+        runs.append(time.perf_counter() - start)
+        if not result.get('success'):
+            raise RuntimeError(result.get('error'))
+        # What the job stores and the API renders
+        start = time.perf_counter()
+        body = JSONRenderer().render(json_safe(public_result(result)))
+        json_runs.append(time.perf_counter() - start)
+
+    return {
+        'engine': 'stream' if should_stream(spec['path']) else 'memory',
+        'seconds': round(min(runs), 4),
+        'runs': [round(r, 4) for r in runs],
+        'rows_per_second': round(spec['rows'] / min(runs)) if min(runs) else None,
+        'base_rss_mb': base_rss,
+        'peak_rss_mb': peak_rss_mb(),
+        'json_seconds': round(min(json_runs), 4),
+        'json_bytes': len(body),
+    }
+
+
+class MultipartFile:
+    """multipart/form-data body read from disk as it is sent, so large files never sit in memory."""
+
+    def __init__(self, path, field='file'):
+        self.boundary = uuid.uuid4().hex
+        head = (f'--{self.boundary}\r\nContent-Disposition: form-data; name="{field}"; '
+                f'filename="{os.path.basename(path)}"\r\nContent-Type: text/csv\r\n\r\n').encode()
+        tail = f'\r\n--{self.boundary}--\r\n'.encode()
+        self.length = len(head) + os.path.getsize(path) + len(tail)
+        self.parts = [io.BytesIO(head), open(path, 'rb'), io.BytesIO(tail)]
+
+    @property
+    def content_type(self):
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        chunks = []
+        while self.parts and (size < 0 or size > 0):
+            chunk = self.parts[0].read(size)
+            if not chunk:
+                self.parts.pop(0).close()
+                continue
+            chunks.append(chunk)
+            if size > 0:
+                size -= len(chunk)
+        return b''.join(chunks)
+
+
+def upload_once(session, url, path, timeout):
+    body = MultipartFile(path)
+    start = time.perf_counter()
+    response = session.post(f'{url}/api/upload/', data=body, headers={'Content-Type': body.content_type})
+    posted = time.perf_counter() - start
+    response.raise_for_status()
+    data = response.json()
+    if 'job_id' not in data:
+        # Cache hit, or analysed while it was uploaded
+        return posted, posted, data
+    while True:
+        status = session.get(f"{url}/api/jobs/{data['job_id']}/").json()
+        if status['status'] in ('done', 'failed'):
+            break
+        if time.perf_counter() - start > timeout:
+            raise RuntimeError(f'job did not finish within {timeout}s')
+        time.sleep(0.05)
+    if status['status'] == 'failed':
+        raise RuntimeError(status['error'])
+    return posted, time.perf_counter() - start, data
+
+
+def child_upload(spec):
+    import requests
+    session = requests.Session()
+    posted, total, _ = upload_once(session, spec['url'], spec['path'], spec['timeout'])
+    _, cached, again = upload_once(session, spec['url'], spec['path'], spec['timeout'])
+    size = os.path.getsize(spec['path'])
+    return {
+        'post_seconds': round(posted, 4),
+        'job_seconds': round(total, 4),
+        'mb_per_second': round(size / (1024 * 1024) / total, 1) if total else None,
+        'cached_seconds': round(cached, 4),
+        'cache_hit': bool(again.get('cached')),
+    }
+
+
+CHILDREN = {'analyse': child_analyse, 'upload': child_upload}
+
+
+def run_child(kind, spec, env):
+    proc = subprocess.run([sys.executable, __file__, '--child', kind, json.dumps(spec)],
+                          cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {'error': (proc.stderr.strip().splitlines() or ['failed'])[-1]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# Parent side
+
+def bench_env(work_dir):
+    env = dict(os.environ)
+    env.update(DJANGO_SETTINGS_MODULE='benchmarks.settings', BENCH_DIR=work_dir, PYTHONPATH=BACKEND_DIR)
+    return env
+
+
+def dataset_path(data_dir, name, rows, seed):
+    params = DATASETS[name]
+    path = os.path.join(data_dir, f'{name}-{rows}-s{seed}.csv')
+    if not os.path.exists(path):
+        print(f'generating {os.path.basename(path)}', file=sys.stderr)
+        generate(path + '.tmp', rows, seed=seed, **params)
+        os.replace(path + '.tmp', path)
+    return path
+
+
+class DevServer:
+    """
+    A server on a free port with the benchmark settings: manage.py runserver,
+    or gunicorn with gunicorn.conf.py. `profile='production'` layers the
+    benchmark database over backend.production instead of backend.settings.
+    """
+
+    def __init__(self, work_dir, server='runserver', profile=None):
+        os.makedirs(work_dir, exist_ok=True)
+        self.env = bench_env(work_dir)
+        if profile:
+            self.env['BENCH_PROFILE'] = profile
+        self.server = server
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            self.port = s.getsockname()[1]
+        self.url = f'http://127.0.0.1:{self.port}'
+
+    def __enter__(self):
+        import requests
+        manage = os.path.join(BACKEND_DIR, 'manage.py')
+        subprocess.run([sys.executable, manage, 'migrate', '--verbosity', '0'], env=self.env, check=True)
+        if self.server == 'gunicorn':
+            command = [sys.executable, '-m', 'gunicorn', '--config', os.path.join(BACKEND_DIR, 'gunicorn.conf.py'),
+                       '--bind', f'127.0.0.1:{self.port}']
+        else:
+            command = [sys.executable, manage, 'runserver', f'127.0.0.1:{self.port}', '--noreload']
+        self.proc = subprocess.Popen(command, cwd=BACKEND_DIR, env=self.env,
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            try:
+                requests.get(f'{self.url}/api/history/', timeout=5)
+                return self
+            except requests.RequestException:
+                time.sleep(0.2)
+        self.proc.kill()
+        raise RuntimeError('dev server did not start')
+
+    def __exit__(self, *exc):
+        self.proc.terminate()
+        self.proc.wait()
+
+
+def environment():
+    def version(module):
+        try:
+            return __import__(module).__version__
+        except ImportError:
+            return None
+
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip()
+        except OSError:
+            return ''
+
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git('rev-parse', 'HEAD') or None,
+        'dirty': bool(git('status', '--porcelain', '--', '.')),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'packages': {name: version(name) for name in ('django', 'pandas', 'numpy', 'pyarrow')},
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Prints metric changes against `baseline` and returns the number of regressions."""
+    key = lambda r: (r['bench'], r['dataset'], r['rows'])
+    old = {key(r): r for r in baseline['results']}
+    regressions = 0
+    for entry in results:
+        before = old.get(key(entry))
+        if before is None:
+            continue
+        for metric, noise in COMPARED.items():
+            a, b = before.get(metric), entry.get(metric)
+            if a is None or b is None:
+                continue
+            change = (b - a) / a if a else 0.0
+            worse = b - a > noise and change > tolerance
+            regressions += worse
+            print(f"{entry['bench']:8} {entry['dataset']:6} {entry['rows']:>11} {metric:15} "
+                  f"{a:>10} -> {b:<10} {change:+7.1%}{'  REGRESSION' if worse else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f'comma-separated row counts (default {DEFAULT_SIZES})')
+    parser.add_argument('--datasets', default=','.join(DATASETS), help=f"any of {', '.join(DATASETS)}")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='analysis runs per size (best is reported)')
+    parser.add_argument('--no-upload', action='store_true', help='skip the HTTP upload benchmark')
+    parser.add_argument('--upload-max-rows', type=float, default=1e7, help='largest file uploaded over HTTP')
+    parser.add_argument('--timeout', type=float, default=3600, help='seconds to wait for an upload job')
+    parser.add_argument('--data-dir', default=os.path.join(BENCH_DIR, 'data'), help='where generated CSVs are kept')
+    parser.add_argument('--out', help='results file (default benchmarks/results/<commit>.json)')
+    parser.add_argument('--baseline', help='earlier results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='allowed slowdown before failing (0.10 = 10%%)')
+    parser.add_argument('--child', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        kind, spec = args.child
+        print(json.dumps(CHILDREN[kind](json.loads(spec))))
+        return 0
+
+    sizes = [int(float(size)) for size in args.sizes.split(',')]
+    datasets = args.datasets.split(',')
+    os.makedirs(args.data_dir, exist_ok=True)
+    meta = environment()
+    results = []
+
+    with tempfile.TemporaryDirectory() as work_dir, contextlib.ExitStack() as stack:
+        server = None
+        if not args.no_upload:
+            server = stack.enter_context(DevServer(os.path.join(work_dir, 'server')))
+            # The first job also pays for starting the worker pool; keep that out of the numbers
+            warmup = generate(os.path.join(work_dir, 'warmup.csv'), 100, seed=args.seed + 1)
+            run_child('upload', {'url': server.url, 'path': warmup, 'timeout': args.timeout}, server.env)
+
+        for name in datasets:
+            for rows in sizes:
+                path = dataset_path(args.data_dir, name, rows, args.seed)
+                common = {'dataset': name, 'rows': rows, 'file_bytes': os.path.getsize(path)}
+
+                run_dir = os.path.join(work_dir, f'{name}-{rows}')
+                os.makedirs(run_dir)
+                spec = {'path': path, 'rows': rows, 'repeat': args.repeat}
+                entry = {'bench': 'analyse', **common, **run_child('analyse', spec, bench_env(run_dir))}
+                results.append(entry)
+                print(json.dumps(entry), file=sys.stderr)
+
+                if server and rows <= args.upload_max_rows:
+                    spec = {'url': server.url, 'path': path, 'timeout': args.timeout}
+                    entry = {'bench': 'upload', **common, **run_child('upload', spec, server.env)}
+                    results.append(entry)
+                    print(json.dumps(entry), file=sys.stderr)
+
+    out = args.out or os.path.join(BENCH_DIR, 'results', f"{(meta['commit'] or 'local')[:7]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump({'meta': meta, 'config': {k: v for k, v in vars(args).items() if k != 'child'},
+                   'results': results}, f, indent=2)
+    print(f'results written to {out}', file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        print(f'{regressions} regression(s)', file=sys.stderr)
+        return 1 if regressions else 0
+    return 1 if any('error' in entry for entry in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,16 @@
+# Settings for benchmark runs: the project settings with a throwaway database and
+# media root under $BENCH_DIR, so measurements never touch (or hit the cache of) real data.
+# BENCH_PROFILE=production starts from backend.production instead.
+import os
+
+if os.environ.get('BENCH_PROFILE') == 'production':
+    from backend.production import *  # noqa: F401,F403
+else:
+    from backend.settings import *  # noqa: F401,F403
+
+BENCH_DIR = os.environ['BENCH_DIR']
+
+# Same engine options as the profile, different file
+DATABASES['default'] = {**DATABASES['default'], 'NAME': os.path.join(BENCH_DIR, 'db.sqlite3')}
+MEDIA_ROOT = os.path.join(BENCH_DIR, 'media')
+DEBUG = False
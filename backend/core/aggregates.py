@@ -0,0 +1,87 @@
+import numpy as np
+from .schema import REQUIRED_COLS
+from .sketches import ColumnSketches
+from .streaming import CoMoments, RunningMoments
+
+
+def _moments_from_stats(analysis, col):
+    # Analyses stored before partials existed: rebuild moments from the rounded summary
+    stats = (analysis.stats or {}).get(col) or {}
+    sketches = analysis.column_sketches()
+    m = RunningMoments()
+    m.n = sketches.quantiles[col].n if sketches else analysis.total_count
+    if not m.n or stats.get('avg') is None:
+        m.n = 0
+        return m
+    std = stats.get('std')
+    m.mean = stats['avg']
+    m.m2 = (std ** 2) * (m.n - 1) if std is not None else 0.0
+    m.min = stats.get('min') if stats.get('min') is not None else np.nan
+    m.max = stats.get('max') if stats.get('max') is not None else np.nan
+    return m
+
+
+def _value(x, decimals=None):
+    if x is None or np.isnan(x):
+        return None
+    return round(float(x), decimals) if decimals is not None else float(x)
+
+
+def combine_analyses(analyses):
+    """
+    One summary over several AnalysisResult rows, in O(number of rows). Counts,
+    sums, mean/std, extremes and correlations are merged from each row's stored
+    partial aggregates, so they match a single pass over all the raw data;
+    percentiles/histograms come from the merged sketches. Rows without stored
+    partials fall back to their rounded stats, and `exact` is False.
+    """
+    analyses = list(analyses)
+    moments = {col: RunningMoments() for col in REQUIRED_COLS}
+    comoments = CoMoments(REQUIRED_COLS)
+    merged = ColumnSketches()
+    exact = have_sketches = bool(analyses)
+    distribution = {}
+    for analysis in analyses:
+        partials = analysis.partials or {}
+        if partials:
+            for col in REQUIRED_COLS:
+                moments[col].merge(RunningMoments.from_dict(partials['moments'][col]))
+            comoments.merge(CoMoments.from_dict(partials['comoments']))
+        else:
+            exact = False
+            for col in REQUIRED_COLS:
+                moments[col].merge(_moments_from_stats(analysis, col))
+        sketches = analysis.column_sketches()
+        if sketches is None:
+            have_sketches = False
+        elif have_sketches:
+            merged.merge(sketches)
+        for key, count in (analysis.distribution or {}).items():
+            distribution[key] = distribution.get(key, 0) + count
+
+    stats = {}
+    for col in REQUIRED_COLS:
+        m = moments[col]
+        stats[col] = {
+            'count': m.n,
+            'sum': _value(m.sum, 4) if m.n else None,
+            'avg': _value(m.mean, 2) if m.n else None,
+            'std': _value(m.std, 2),
+            'min': _value(m.min) if m.n else None,
+            'max': _value(m.max) if m.n else None,
+        }
+        if have_sketches:
+            stats[col].update(merged.percentiles(col))
+    correlation = None
+    if exact:
+        correlation = {a: {b: _value(v) for b, v in row.items()} for a, row in comoments.correlation(4).items()}
+    return {
+        'files': len(analyses),
+        'exact': exact,
+        'total_count': sum(a.total_count for a in analyses),
+        'anomaly_count': sum(a.anomaly_count for a in analyses),
+        'stats': stats,
+        'correlation': correlation,
+        'distribution': dict(sorted(distribution.items(), key=lambda kv: kv[1], reverse=True)),
+        'histograms': merged.histogram_json() if have_sketches else None,
+    }
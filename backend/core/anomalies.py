@@ -0,0 +1,220 @@
+import numpy as np
+import pandas as pd
+from .columnar import date_format
+from .pyramid import Pyramid, build_pyramid, time_axis
+from .schema import GROUP_COLS, REQUIRED_COLS
+
+# A reading is flagged when it sits more than Z_THRESHOLD rolling standard
+# deviations away from the mean of the previous ROLLING_WINDOW readings of the
+# same equipment (the reading itself is left out, so a spike cannot hide itself).
+ROLLING_WINDOW = 50
+Z_THRESHOLD = 3.0
+MIN_PERIODS = 10
+# Rows listed in the analysis result; the anomalies endpoint pages through the rest
+MAX_LISTED_ROWS = 1000
+SLAB_ROWS = 1 << 18
+
+
+def _suffix_sums(tails):
+    # [:, j] = count, sum and sum of squares of the last j values of every tail (NaN = no reading)
+    rev = tails[:, ::-1]
+    valid = ~np.isnan(rev)
+    rv = np.where(valid, rev, 0.0)
+    lead = np.zeros((len(tails), 1))
+    return [np.concatenate([lead, np.cumsum(v, axis=1)], axis=1) for v in (valid, rv, rv * rv)]
+
+
+def _slab_z(x, run_start, run, tails, window, min_periods):
+    """
+    z-score of every x against the `window` readings before it in its group.
+    `x` is one slab sorted by (group, time); group runs start at `run_start`,
+    `run` is each row's run number and `tails` holds, per run, the group's last
+    `window` readings from earlier slabs, so windows carry across slabs.
+    Window sums come from cumulative sums: a handful of vector operations for any window.
+    """
+    valid = ~np.isnan(x)
+    xv = np.where(valid, x, 0.0)
+    c1 = np.concatenate([[0.0], np.cumsum(xv)])
+    c2 = np.concatenate([[0.0], np.cumsum(xv * xv)])
+    cn = np.concatenate([[0], np.cumsum(valid)])
+    hi = np.arange(len(x))
+    lo = np.maximum(hi - window, run_start)
+    # Readings the window still needs from before the slab
+    need = np.clip(window - (hi - run_start), 0, window)
+    tn, t1, t2 = _suffix_sums(tails)
+    count = cn[hi] - cn[lo] + tn[run, need]
+    s1 = c1[hi] - c1[lo] + t1[run, need]
+    s2 = c2[hi] - c2[lo] + t2[run, need]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = s1 / count
+        std = np.sqrt(np.maximum(s2 - s1 * mean, 0.0) / (count - 1))
+        z = (x - mean) / std
+    z[(count < min_periods) | ~(std > 0)] = np.nan
+    return z
+
+
+def _next_tails(x, first, lengths, tails, window):
+    # Last `window` readings of every run, topped up from the previous tails for short runs
+    v = lengths[:, None] + np.arange(window)
+    from_tail = v < window
+    carried = np.take_along_axis(tails, np.minimum(v, window - 1), axis=1)
+    fresh = x[np.clip(first[:, None] + v - window, 0, len(x) - 1)]
+    return np.where(from_tail, carried, fresh)
+
+
+def _keep_first(kept, rows, bits, keep):
+    # The `keep` smallest flagged rows seen so far (the page is in file order)
+    rows = np.concatenate([kept[0], rows])
+    bits = np.concatenate([kept[1], bits])
+    first = np.argsort(rows, kind='stable')[:keep]
+    return rows[first], bits[first]
+
+
+def detect(columns, rows, groupings=None, group_col=None, order=None,
+           window=ROLLING_WINDOW, threshold=Z_THRESHOLD, min_periods=MIN_PERIODS, keep=MAX_LISTED_ROWS):
+    """
+    Rolling z-score anomalies for every process parameter, counted rather than
+    materialised.
+
+    `columns` maps each parameter to its values in file order (arrays or memmaps),
+    `groupings` maps grouping columns to (codes, labels) with int32 codes in file
+    order (-1 = missing) and rows are walked per `group_col` group, and `order`
+    is the time order of the rows when the file is not already sorted.
+    Rows are walked in time order one slab at a time; each group carries its last
+    `window` readings into the next slab, so memory depends on the number of
+    groups, never on the number of rows.
+
+    Returns {'counts': {param: n}, 'by_column': {column: per-code counts, code 0
+    = no label}, 'flagged': n, 'rows': (first `keep` flagged rows, param bitmasks)}.
+    """
+    groupings = groupings or {}
+    min_periods = min(min_periods, window)
+    codes, labels = groupings.get(group_col, (None, []))
+    groups = len(labels) + 1
+    # Stable argsort is a radix sort for 16-bit keys, which covers any real fleet
+    key_dtype = np.uint16 if groups <= np.iinfo(np.uint16).max else np.int32
+
+    # Centering keeps the running sums of squares well conditioned
+    centers = {}
+    for col in REQUIRED_COLS:
+        total, count = 0.0, 0
+        for a in range(0, rows, SLAB_ROWS):
+            x = np.asarray(columns[col][a:a + SLAB_ROWS], dtype=float)
+            total += np.nansum(x)
+            count += int((~np.isnan(x)).sum())
+        centers[col] = total / count if count else 0.0
+
+    tails = {col: np.full((groups, window), np.nan) for col in REQUIRED_COLS}
+    counts = dict.fromkeys(REQUIRED_COLS, 0)
+    by_column = {col: np.zeros(len(lab) + 1, dtype=np.int64) for col, (_, lab) in groupings.items()}
+    flagged = 0
+    kept = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint8))
+    for a in range(0, rows, SLAB_ROWS):
+        b = min(a + SLAB_ROWS, rows)
+        pos = np.arange(a, b) if order is None else np.asarray(order[a:b], dtype=np.int64)
+        # Sort the slab by group (time order is kept within a group): each group is one run
+        g = np.asarray(codes[pos], dtype=np.int32) + 1 if codes is not None else np.zeros(b - a, dtype=np.int32)
+        perm = np.argsort(g.astype(key_dtype), kind='stable')
+        pos, g = pos[perm], g[perm]
+        present, first, lengths = np.unique(g, return_index=True, return_counts=True)
+        run = np.repeat(np.arange(len(present)), lengths)
+        run_start = first[run]
+
+        any_flag = np.zeros(b - a, dtype=bool)
+        bits = np.zeros(b - a, dtype=np.uint8)
+        for i, col in enumerate(REQUIRED_COLS):
+            x = np.asarray(columns[col][pos], dtype=float) - centers[col]
+            z = _slab_z(x, run_start, run, tails[col][present], window, min_periods)
+            tails[col][present] = _next_tails(x, first, lengths, tails[col][present], window)
+            hit = np.abs(z) > threshold
+            counts[col] += int(hit.sum())
+            any_flag |= hit
+            bits |= hit.astype(np.uint8) << i
+
+        hits = pos[any_flag]
+        flagged += len(hits)
+        for col, (col_codes, lab) in groupings.items():
+            by_column[col] += np.bincount(np.asarray(col_codes[hits], dtype=np.int32) + 1, minlength=len(lab) + 1)
+        kept = _keep_first(kept, hits, bits[any_flag], keep)
+
+    return {'counts': counts, 'by_column': by_column, 'flagged': flagged, 'rows': kept}
+
+
+def summarize(found, groupings, group_col, window=ROLLING_WINDOW, threshold=Z_THRESHOLD,
+              offset=0, limit=MAX_LISTED_ROWS):
+    """
+    JSON block: counts per parameter, flagged rows per group for every grouping
+    column (rows without a label are counted under 'missing', apart from every
+    label), and one page of flagged rows (0-based, file order).
+    """
+    by_column, missing = {}, {}
+    for col, (_, labels) in groupings.items():
+        per_code = found['by_column'][col]
+        missing[col] = int(per_code[0])
+        ranked = sorted(enumerate(per_code[1:]), key=lambda kv: -kv[1])
+        by_column[col] = {labels[i]: int(c) for i, c in ranked if c}
+    rows, bits = found['rows']
+    return {
+        'window': window,
+        'threshold': threshold,
+        'group_by': group_col,
+        'flagged_rows': found['flagged'],
+        'counts': found['counts'],
+        'by_group': by_column.get(group_col, {}),
+        'by_column': by_column,
+        'missing': missing,
+        'rows': [
+            {'row': int(r), 'params': [col for i, col in enumerate(REQUIRED_COLS) if m >> i & 1]}
+            for r, m in zip(rows[offset:offset + limit], bits[offset:offset + limit])
+        ],
+    }
+
+
+def _group_codes(values):
+    # int32 codes in file order; missing labels are -1
+    codes, uniques = pd.factorize(pd.Series(values))
+    return codes.astype(np.int32), [str(u) for u in uniques]
+
+
+def frame_anomalies(df, time_col=None, window=ROLLING_WINDOW, threshold=Z_THRESHOLD,
+                    offset=0, limit=MAX_LISTED_ROWS):
+    """Anomaly block for a DataFrame in file order (the in-memory path)."""
+    groupings = {col: _group_codes(df[col]) for col in GROUP_COLS if col in df.columns}
+    group_col = next(iter(groupings), None)
+    order = None
+    if time_col:
+        times = df[time_col]
+        if not pd.api.types.is_numeric_dtype(times):
+            # Same rule as the column store: free-text and clock-only times keep file order
+            fmt = date_format(times)
+            times = pd.to_datetime(times, format=fmt, errors='coerce') if fmt is not None else None
+        if times is not None:
+            order = np.argsort(times.to_numpy(), kind='stable')
+    columns = {col: df[col].to_numpy(dtype=float) for col in REQUIRED_COLS}
+    found = detect(columns, len(df), groupings, group_col, order, window, threshold, keep=offset + limit)
+    return summarize(found, groupings, group_col, window, threshold, offset, limit)
+
+
+def store_anomalies(store, window=ROLLING_WINDOW, threshold=Z_THRESHOLD,
+                    offset=0, limit=MAX_LISTED_ROWS):
+    """
+    Anomaly block straight from a column store's memory-mapped columns. An
+    unsorted export is walked in time order through the pyramid's stored
+    permutation, so no full-length array is built.
+    """
+    groupings = {}
+    for col in GROUP_COLS:
+        if col not in store.columns:
+            continue
+        if store.kind(col) == 'category':
+            groupings[col] = (store.column(col), [str(label) for label in store.meta['categories'][col]])
+        else:
+            groupings[col] = _group_codes(np.asarray(store.column(col)))
+    group_col = next(iter(groupings), None)
+    order = None
+    time_col = time_axis(store)
+    if time_col and not store.meta.get('time_sorted', True):
+        order = (Pyramid.open(store) or build_pyramid(store)).order
+    columns = {col: store.column(col) for col in REQUIRED_COLS}
+    found = detect(columns, store.rows, groupings, group_col, order, window, threshold, keep=offset + limit)
+    return summarize(found, groupings, group_col, window, threshold, offset, limit)
@@ -0,0 +1,73 @@
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+from .models import AnalysisCache
+
+DEFAULTS = {
+    'MAX_ENTRIES': 200,
+    'MAX_BYTES': 256 * 1024 * 1024,
+    'MAX_AGE_SECONDS': 7 * 24 * 3600,
+}
+
+
+def cache_setting(name):
+    return getattr(settings, 'ANALYSIS_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def get_cached_result(digest):
+    # Returns the stored process_csv_data result for this upload hash, or None
+    if not digest:
+        return None
+    entry = AnalysisCache.objects.filter(sha256=digest).only('pk', 'result', 'created_at').first()
+    if entry is None:
+        return None
+    if entry.created_at < timezone.now() - timedelta(seconds=cache_setting('MAX_AGE_SECONDS')):
+        entry.delete()
+        return None
+    AnalysisCache.objects.filter(pk=entry.pk).update(last_used_at=timezone.now())
+    return entry.result
+
+
+def is_cached(digest):
+    # Cheap existence check (no result is loaded), e.g. before analysing an upload
+    cutoff = timezone.now() - timedelta(seconds=cache_setting('MAX_AGE_SECONDS'))
+    return AnalysisCache.objects.filter(sha256=digest, created_at__gte=cutoff).exists()
+
+
+def store_result(digest, result):
+    if not digest or not result.get('success'):
+        return
+    try:
+        size = len(json.dumps(result, cls=JSONEncoder, allow_nan=False))
+    except ValueError:
+        # NaN/inf somewhere in the result: not storable as strict JSON
+        return
+    AnalysisCache.objects.update_or_create(
+        sha256=digest, defaults={'result': result, 'size_bytes': size}
+    )
+
+
+def evict():
+    # Run by the retention sweeper (retention.py), outside any request
+    # 1. Age: drop anything older than MAX_AGE_SECONDS
+    cutoff = timezone.now() - timedelta(seconds=cache_setting('MAX_AGE_SECONDS'))
+    AnalysisCache.objects.filter(created_at__lt=cutoff).delete()
+
+    # 2. Size: drop least recently used entries until under both quotas
+    max_entries = cache_setting('MAX_ENTRIES')
+    max_bytes = cache_setting('MAX_BYTES')
+    total = AnalysisCache.objects.aggregate(total=Sum('size_bytes'))['total'] or 0
+    count = AnalysisCache.objects.count()
+    if count <= max_entries and total <= max_bytes:
+        return
+    to_delete = []
+    for pk, size in AnalysisCache.objects.order_by('last_used_at').values_list('pk', 'size_bytes'):
+        if count <= max_entries and total <= max_bytes:
+            break
+        to_delete.append(pk)
+        count -= 1
+        total -= size
+    AnalysisCache.objects.filter(pk__in=to_delete).delete()
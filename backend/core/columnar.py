@@ -0,0 +1,260 @@
+import json
+import os
+import shutil
+import uuid
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+from .schema import GROUP_COLS, REQUIRED_COLS, TIME_COLS
+
+# On-disk layout of a column store directory:
+#   meta.json   -> row count, column specs, category labels, time ordering
+#   col<N>.bin  -> one raw little-endian array per column, memory-mapped on read
+META_FILE = 'meta.json'
+
+KIND_DTYPES = {
+    'float': '<f8',      # numeric parameters
+    'datetime': '<i8',   # nanoseconds since epoch, NaT as int64 min
+    'category': '<i4',   # codes into meta['categories'][name], -1 for missing
+}
+# Extra text columns (outside the schema) with more distinct values than this are
+# free text or ids: they are dropped from the store to keep its label table small
+MAX_EXTRA_CATEGORIES = 1 << 16
+SCHEMA_COLS = {*REQUIRED_COLS, *GROUP_COLS, *TIME_COLS}
+DATE_DIRECTIVES = ('%Y', '%y', '%m', '%d', '%b', '%B', '%j')
+
+
+def date_format(series):
+    """
+    strptime format of a text time column whose every value is a date or a
+    date and time, else None. Clock-only times ("08:00") would be stamped with
+    the day they are parsed on, so they stay text (in file order).
+    """
+    first = series.first_valid_index()
+    if first is None:
+        return None
+    fmt = guess_datetime_format(str(series.loc[first]))
+    if fmt is None or not any(directive in fmt for directive in DATE_DIRECTIVES):
+        return None
+    parsed = pd.to_datetime(series, format=fmt, errors='coerce')
+    return fmt if parsed.notna().sum() == series.notna().sum() else None
+
+
+def _kind_for(name, series):
+    if pd.api.types.is_numeric_dtype(series):
+        return 'float', None
+    if name in TIME_COLS:
+        fmt = date_format(series)
+        if fmt is not None:
+            return 'datetime', fmt
+    return 'category', None
+
+
+def publish(tmp_path, path):
+    """
+    Renames a finished temporary directory into place. Stores are content-addressed,
+    so if a parallel job (same bytes) got there first its copy is kept and ours dropped.
+    A published directory is never removed: rename refuses a non-empty target.
+    """
+    meta = os.path.join(path, META_FILE)
+    for attempt in range(2):
+        try:
+            os.replace(tmp_path, path)
+            return
+        except OSError:
+            if os.path.isfile(meta) or attempt:
+                break
+            shutil.rmtree(path, ignore_errors=True)  # leftovers of an unfinished store
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    if not os.path.isfile(meta):
+        raise FileExistsError(f"Could not publish {path}")
+
+
+class ColumnStoreWriter:
+    """
+    Appends DataFrame chunks to per-column binary files. Everything is written
+    to a temporary sibling directory and renamed into place by close(), so
+    readers never see a half-written store.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Unique per writer: threads of one worker process may ingest the same file at once
+        self.tmp_path = f"{path}.tmp-{uuid.uuid4().hex}"
+        os.makedirs(self.tmp_path)
+        self.specs = None
+        self.handles = {}
+        self.categories = {}
+        self.rows = 0
+        self.time_col = None
+        self.time_sorted = True
+        self._last_time = None
+
+    def append(self, chunk):
+        if self.specs is None:
+            self._start(chunk)
+        for spec in list(self.specs):
+            values = self._encode(spec, chunk[spec['name']])
+            if values is None:
+                continue
+            if spec.get('integer') and not pd.api.types.is_integer_dtype(chunk[spec['name']]):
+                spec['integer'] = False
+            values.astype(KIND_DTYPES[spec['kind']], copy=False).tofile(self.handles[spec['name']])
+            if spec['name'] == self.time_col:
+                self._track_order(values, spec['kind'])
+        self.rows += len(chunk)
+        self.touch()
+
+    def touch(self):
+        # Heartbeat: appending to files leaves the directory's mtime alone, and the
+        # retention sweeper removes temporary directories that look abandoned
+        os.utime(self.tmp_path)
+
+    def _start(self, chunk):
+        self.specs = []
+        for i, name in enumerate(chunk.columns):
+            if name == 'Index':
+                continue  # synthetic row number added by the analyser
+            kind, fmt = _kind_for(name, chunk[name])
+            self.specs.append({'name': name, 'kind': kind, 'file': f"col{i}.bin"})
+            if fmt is not None:
+                self.specs[-1]['format'] = fmt
+            if kind == 'float':
+                # Whole numbers (e.g. Hour) are stored as floats but decoded back to ints
+                self.specs[-1]['integer'] = pd.api.types.is_integer_dtype(chunk[name])
+            self.handles[name] = open(os.path.join(self.tmp_path, f"col{i}.bin"), 'wb')
+            if kind == 'category':
+                self.categories[name] = {}
+        self.time_col = next((s['name'] for s in self.specs if s['name'] in TIME_COLS), None)
+
+    def _encode(self, spec, series):
+        if spec['kind'] == 'float':
+            return pd.to_numeric(series, errors='coerce').to_numpy(dtype=float)
+        if spec['kind'] == 'datetime':
+            parsed = pd.to_datetime(series, format=spec.get('format'), errors='coerce')
+            return parsed.to_numpy(dtype='datetime64[ns]').view('<i8')
+        # Categories: factorize the chunk, then map its labels onto store-wide codes
+        codes, uniques = pd.factorize(series)
+        mapping = self.categories[spec['name']]
+        lookup = np.array([mapping.setdefault(label, len(mapping)) for label in uniques] + [-1], dtype=np.int32)
+        if len(mapping) > MAX_EXTRA_CATEGORIES and spec['name'] not in SCHEMA_COLS:
+            self._drop(spec)
+            return None
+        return lookup[codes]
+
+    def _drop(self, spec):
+        name = spec['name']
+        self.handles.pop(name).close()
+        os.remove(os.path.join(self.tmp_path, spec['file']))
+        self.specs.remove(spec)
+        del self.categories[name]
+
+    def _track_order(self, values, kind):
+        if kind == 'category':
+            self.time_sorted = False
+        if not self.time_sorted:
+            return
+        missing = np.isnan(values) if kind == 'float' else values == np.iinfo(np.int64).min
+        values = values[~missing]
+        if len(values) == 0:
+            return
+        if self._last_time is not None and values[0] < self._last_time:
+            self.time_sorted = False
+        elif np.any(values[1:] < values[:-1]):
+            self.time_sorted = False
+        self._last_time = values[-1]
+
+    def close(self, path=None):
+        # `path` overrides the target given at construction (e.g. once the content hash is known)
+        if path is not None:
+            self.path = path
+        for handle in self.handles.values():
+            handle.close()
+        meta = {
+            'rows': self.rows,
+            'columns': self.specs or [],
+            'categories': {name: list(mapping) for name, mapping in self.categories.items()},
+            'time_col': self.time_col,
+            'time_sorted': self.time_sorted,
+        }
+        with open(os.path.join(self.tmp_path, META_FILE), 'w') as f:
+            json.dump(meta, f)
+        publish(self.tmp_path, self.path)
+
+    def abort(self):
+        for handle in self.handles.values():
+            handle.close()
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+
+class ColumnStore:
+    """Read side: memory-maps only the columns a caller asks for."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.specs = {spec['name']: spec for spec in self.meta['columns']}
+
+    @classmethod
+    def open(cls, path):
+        # None when no finished store exists at `path`
+        if not path or not os.path.isfile(os.path.join(path, META_FILE)):
+            return None
+        return cls(path)
+
+    @property
+    def rows(self):
+        return self.meta['rows']
+
+    @property
+    def columns(self):
+        return [spec['name'] for spec in self.meta['columns']]
+
+    @property
+    def time_col(self):
+        return self.meta['time_col']
+
+    @property
+    def nbytes(self):
+        return sum(os.path.getsize(os.path.join(self.path, s['file'])) for s in self.meta['columns'])
+
+    def kind(self, name):
+        return self.specs[name]['kind']
+
+    def column(self, name):
+        # Raw stored values (float64 / int64 ns / int32 codes), no copy
+        spec = self.specs[name]
+        dtype = KIND_DTYPES[spec['kind']]
+        if self.rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self.path, spec['file']), dtype=dtype, mode='r', shape=(self.rows,))
+
+    def values(self, name, start=0, stop=None):
+        # Decoded slice: floats, date strings, or category labels (None when missing)
+        return self.decode(name, self.column(name)[start:stop])
+
+    def decode(self, name, raw):
+        kind = self.kind(name)
+        if kind == 'float':
+            return np.array(raw, dtype=np.int64 if self.specs[name].get('integer') else float)
+        if kind == 'datetime':
+            index = pd.DatetimeIndex(np.asarray(raw).view('datetime64[ns]'))
+            decoded = np.asarray(index.astype(str), dtype=object)
+            decoded[index.isna()] = None
+            return decoded
+        labels = np.array(self.meta['categories'][name] + [None], dtype=object)
+        return labels[raw]
+
+    def frame(self, columns=None, start=0, stop=None):
+        columns = columns or self.columns
+        return pd.DataFrame({name: self.values(name, start, stop) for name in columns})
+
+    def take(self, rows, columns=None):
+        # Decoded DataFrame of arbitrary row positions (e.g. chart samples)
+        columns = columns or self.columns
+        return pd.DataFrame({name: self.decode(name, self.column(name)[rows]) for name in columns})
+
+    def iter_frames(self, chunksize, columns=None):
+        for start in range(0, self.rows, chunksize):
+            yield self.frame(columns, start, start + chunksize)
@@ -0,0 +1,43 @@
+import hashlib
+from functools import wraps
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+# Bump when the analysis output changes, so clients drop copies made by older code
+RESULT_VERSION = 1
+
+
+def make_etag(request, version):
+    """
+    Strong ETag for a GET response: the version of the data it is built from
+    (dataset hash, job status, ...) plus everything else that changes the bytes,
+    i.e. the query string and the negotiated media type.
+    """
+    key = repr((RESULT_VERSION, version, request.get_full_path(), request.accepted_media_type))
+    return '"%s"' % hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def conditional(version_func):
+    """
+    Decorator for APIView.get methods. version_func(**url_kwargs) returns the
+    data version with a cheap query (or None to skip). A client whose
+    If-None-Match names the current ETag gets 304 Not Modified and the view
+    never runs; otherwise 200 responses carry the ETag.
+    """
+    def decorator(get):
+        @wraps(get)
+        def wrapper(self, request, *args, **kwargs):
+            version = version_func(**kwargs)
+            if version is None:
+                return get(self, request, *args, **kwargs)
+            etag = make_etag(request, version)
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = get(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response['ETag'] = etag
+            # Keep the body, but check back with If-None-Match before reusing it
+            patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
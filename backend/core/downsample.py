@@ -0,0 +1,160 @@
+import numpy as np
+from .payloads import frame_to_columns
+from .pyramid import Pyramid, build_pyramid, time_axis
+from .schema import REQUIRED_COLS
+
+DEFAULT_CHART_POINTS = 1000
+MAX_CHART_POINTS = 20_000
+METHODS = ('lttb', 'minmax')
+
+
+# Rows read at a time: every pass works on slabs, so memory is bounded for any row count
+SLAB_ROWS = 1 << 20
+
+
+def _reader(values, order=None):
+    # read(lo, hi) -> rows [lo, hi) in plotting order as floats; only that slice is touched
+    if order is None:
+        return lambda lo, hi: np.asarray(values[lo:hi], dtype=float)
+    return lambda lo, hi: np.asarray(values[np.asarray(order[lo:hi])], dtype=float)
+
+
+def _slabs(lo, hi):
+    for a in range(lo, hi, SLAB_ROWS):
+        yield a, min(a + SLAB_ROWS, hi)
+
+
+def _bucket_means(read, edges):
+    """
+    Mean of every bucket [edges[i], edges[i + 1]), with gaps counted at the
+    series mean (so they cannot poison the triangle areas), plus that mean.
+    """
+    sums = np.zeros(len(edges) - 1)
+    counts = np.zeros(len(edges) - 1, dtype=np.int64)
+    for i in range(len(edges) - 1):
+        for a, b in _slabs(edges[i], edges[i + 1]):
+            y = read(a, b)
+            present = ~np.isnan(y)
+            sums[i] += y[present].sum()
+            counts[i] += int(present.sum())
+    mean = sums.sum() / counts.sum() if counts.sum() else 0.0
+    sizes = np.diff(edges)
+    return (sums + (sizes - counts) * mean) / np.maximum(sizes, 1), mean
+
+
+def lttb_rows(read, n, n_out):
+    """
+    Largest-Triangle-Three-Buckets over `n` rows served by read(lo, hi):
+    picks `n_out` row indices that preserve the visual shape of the series.
+    Two passes (bucket means, then one argmax per bucket), each holding at
+    most SLAB_ROWS rows, so memory does not grow with `n`.
+    """
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.linspace(0, n - 1, max(n_out, 1)).astype(np.int64)
+
+    # n_out - 2 buckets between the fixed first and last points; x is the row position
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    avg_y, mean = _bucket_means(read, edges)
+    avg_x = (edges[:-1] + edges[1:] - 1) / 2
+
+    def filled(y):
+        return np.where(np.isnan(y), mean, y)
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a, ya = 0, filled(read(0, 1))[0]
+    last = len(avg_y) - 1
+    y_last = filled(read(n - 1, n))[0]
+    for i in range(len(avg_y)):
+        cx, cy = (avg_x[i + 1], avg_y[i + 1]) if i < last else (n - 1, y_last)
+        best, best_area, best_y = edges[i], -1.0, 0.0
+        for lo, hi in _slabs(edges[i], edges[i + 1]):
+            y = filled(read(lo, hi))
+            x = np.arange(lo, hi, dtype=float)
+            area = np.abs((a - cx) * (y - ya) - (a - x) * (cy - ya))
+            j = int(np.argmax(area))
+            if area[j] > best_area:
+                best, best_area, best_y = lo + j, area[j], y[j]
+        a, ya = best, best_y
+        selected[i + 1] = a
+    return selected
+
+
+def lttb_indices(y, n_out):
+    """LTTB over an in-memory array (see lttb_rows)."""
+    return lttb_rows(_reader(y), len(y), n_out)
+
+
+def minmax_rows(read, n, n_buckets):
+    # Row indices of the minimum and maximum in each of `n_buckets` equal buckets, read slab by slab
+    if 2 * n_buckets >= n:
+        return np.arange(n)
+    size = -(-n // n_buckets)
+    picks = []
+    for start in range(0, n, size):
+        lo_val, hi_val, lo_row, hi_row = np.inf, -np.inf, None, None
+        for a, b in _slabs(start, min(start + size, n)):
+            y = read(a, b)
+            if np.isnan(y).all():
+                continue
+            i, j = int(np.nanargmin(y)), int(np.nanargmax(y))
+            if y[i] < lo_val:
+                lo_val, lo_row = y[i], a + i
+            if y[j] > hi_val:
+                hi_val, hi_row = y[j], a + j
+        if lo_row is None:
+            # All gaps: argmin/argmax of an all-NaN block fall on its first row
+            lo_row = hi_row = start
+        picks += [lo_row, hi_row]
+    return np.unique(np.array(picks, dtype=np.int64))
+
+
+def minmax_indices(y, n_buckets):
+    return minmax_rows(_reader(y), len(y), n_buckets)
+
+
+def _pick_rows(readers, n, points, method):
+    # Every parameter gets an equal share of the budget, so a spike in any of them survives
+    if n <= points:
+        return np.arange(n)
+    share = max(points // len(readers), 3)
+    if method == 'minmax':
+        picks = [minmax_rows(read, n, max(share // 2, 1)) for read in readers]
+    else:
+        picks = [lttb_rows(read, n, share) for read in readers]
+    return np.unique(np.concatenate(picks))
+
+
+def downsample_indices(series, points=DEFAULT_CHART_POINTS, method='lttb'):
+    """
+    Sorted row indices to plot, given {name: values} for the process parameters.
+    The union over all parameters never exceeds `points`.
+    """
+    readers = [_reader(series[col]) for col in REQUIRED_COLS if col in series]
+    n = len(series[REQUIRED_COLS[0]]) if readers else 0
+    return _pick_rows(readers, n, points, method) if readers else np.arange(0)
+
+
+def chart_from_store(store, points=DEFAULT_CHART_POINTS, method='lttb', orient='records'):
+    """
+    chart_data records built straight from a column store: rows are put in
+    time order (when there is a usable time column), downsampled, and decoded.
+    orient='columns' returns one array per column instead. Columns are read
+    slab by slab; an unsorted export is put in time order through the
+    pyramid's stored permutation, so no full-length copy is ever made.
+    """
+    time_col = time_axis(store)
+    order = None
+    if time_col and not store.meta.get('time_sorted', True):
+        order = (Pyramid.open(store) or build_pyramid(store)).order
+    readers = [_reader(store.column(col), order) for col in REQUIRED_COLS]
+    picks = _pick_rows(readers, store.rows, points, method)
+    rows = np.asarray(order[picks]) if order is not None else picks
+    frame = store.take(rows)
+    if not store.time_col:
+        frame['Index'] = rows + 1
+    if orient == 'columns':
+        return frame_to_columns(frame)
+    return frame.replace({np.nan: None}).to_dict(orient='records')
@@ -0,0 +1,28 @@
+"""
+Standalone analysis engine: the same analysis the API runs, without Django.
+
+Clients that analyse files themselves (the desktop app's offline mode) put the
+backend directory on sys.path and call analyse_file(). Only pandas and NumPy
+are needed (pyarrow is used when installed). Nothing in this module or in the
+modules it imports may depend on Django.
+"""
+import os
+from .payloads import SHAPES, json_safe, public_result, shape_result
+from .utils import process_csv_data
+
+
+def analyse_file(path, shape='records', store_dir=None):
+    """
+    Analyses the CSV at `path` and returns what the upload endpoint would send
+    as "data": {"success": True, ...} with chart_data/preview as records or
+    columns, or {"success": False, "error": ...}. Large files stream through
+    the bounded-memory engine like on the server.
+    """
+    if shape not in SHAPES:
+        raise ValueError(f"shape must be one of: {', '.join(SHAPES)}")
+    if not os.path.isfile(path):
+        return {"success": False, "error": f"No such file: {path}"}
+    result = process_csv_data(path, store_dir=store_dir)
+    if not result.get('success'):
+        return result
+    return shape_result(json_safe(public_result(result)), shape)
@@ -0,0 +1,214 @@
+import numpy as np
+import pandas as pd
+from .schema import REQUIRED_COLS
+from .sketches import QUANTILES
+
+# Largest groups reported per key column (by row count); the rest are summarised as a count
+MAX_GROUPS = 500
+# Index key of rows without a label: not a string, so it cannot merge with a real group
+# (say one named "Unknown"); GroupStats.result() reports those rows under 'missing'
+MISSING = None
+
+
+class GroupedMoments:
+    """Count/mean/M2/min/max per group code, reduced with np.bincount and merged like RunningMoments."""
+
+    def __init__(self):
+        self.n = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros(0)
+        self.m2 = np.zeros(0)
+        self.min = np.zeros(0)
+        self.max = np.zeros(0)
+
+    def _grow(self, size):
+        extra = size - len(self.n)
+        if extra > 0:
+            self.n = np.concatenate([self.n, np.zeros(extra, dtype=np.int64)])
+            self.mean = np.concatenate([self.mean, np.zeros(extra)])
+            self.m2 = np.concatenate([self.m2, np.zeros(extra)])
+            self.min = np.concatenate([self.min, np.full(extra, np.inf)])
+            self.max = np.concatenate([self.max, np.full(extra, -np.inf)])
+
+    def update(self, codes, values, size):
+        self._grow(size)
+        valid = ~np.isnan(values)
+        codes, values = codes[valid], values[valid]
+        n_b = np.bincount(codes, minlength=size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_b = np.bincount(codes, weights=values, minlength=size) / n_b
+        d = values - mean_b[codes]
+        m2_b = np.bincount(codes, weights=d * d, minlength=size)
+        min_b = np.full(size, np.inf)
+        max_b = np.full(size, -np.inf)
+        np.minimum.at(min_b, codes, values)
+        np.maximum.at(max_b, codes, values)
+
+        # Chan et al. merge, one group per array slot
+        n = self.n + n_b
+        seen = n_b > 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delta = np.where(seen, mean_b - self.mean, 0.0)
+            weight = np.where(n > 0, n_b / n, 0.0)
+        self.m2 = self.m2 + np.where(seen, m2_b + delta * delta * self.n * weight, 0.0)
+        self.mean = self.mean + delta * weight
+        self.n = n
+        self.min = np.minimum(self.min, min_b)
+        self.max = np.maximum(self.max, max_b)
+
+    def std(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.n > 1, np.sqrt(self.m2 / (self.n - 1)), np.nan)
+
+
+class GroupedQuantiles:
+    """
+    Relative-error quantiles per group (DDSketch-style log buckets). A value's
+    bucket depends only on the value, so chunks and groups merge by adding
+    counts, and every estimate is within ALPHA of the true value.
+    """
+
+    ALPHA = 0.005
+    MIN_VALUE = 1e-9
+    SPAN = 1 << 17                  # bucket keys per group, centred on zero
+
+    def __init__(self):
+        self.gamma = (1 + self.ALPHA) / (1 - self.ALPHA)
+        self.log_gamma = np.log(self.gamma)
+        self.offset = int(-np.ceil(np.log(self.MIN_VALUE) / self.log_gamma)) + 1
+        self.keys = np.zeros(0, dtype=np.int64)     # code * SPAN + bucket, sorted
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def _buckets(self, values):
+        magnitude = np.abs(values)
+        with np.errstate(divide='ignore'):
+            k = np.ceil(np.log(magnitude) / self.log_gamma).astype(np.int64) + self.offset
+        k = np.where(magnitude < self.MIN_VALUE, 0, np.clip(k, 1, self.SPAN // 2 - 1))
+        return np.sign(values).astype(np.int64) * k
+
+    def _value(self, bucket):
+        k = np.abs(bucket) - self.offset
+        return np.sign(bucket) * 2 * self.gamma ** k / (self.gamma + 1)
+
+    def update(self, codes, values):
+        valid = ~np.isnan(values)
+        codes, buckets = codes[valid], self._buckets(values[valid])
+        if len(buckets) == 0:
+            return
+        # Count (group, bucket) pairs with one dense bincount over the chunk's bucket range
+        low = int(buckets.min())
+        width = int(buckets.max()) - low + 1
+        size = int(codes.max()) + 1
+        if size * width <= max(4 * len(buckets), 1 << 20):
+            dense = np.bincount(codes * width + (buckets - low), minlength=size * width)
+            cells = np.flatnonzero(dense)
+            keys = (cells // width) * self.SPAN + (cells % width) + low + self.SPAN // 2
+            counts = dense[cells]
+        else:
+            # Extremely spread values: fall back to a sort
+            keys, counts = np.unique(codes * self.SPAN + buckets + self.SPAN // 2, return_counts=True)
+        self._add(keys, counts)
+
+    def _add(self, keys, counts):
+        # Sorted merge: known keys are bumped in place, new ones inserted (no re-sort)
+        idx = np.searchsorted(self.keys, keys)
+        hit = idx < len(self.keys)
+        hit[hit] = self.keys[idx[hit]] == keys[hit]
+        self.counts[idx[hit]] += counts[hit]
+        if not hit.all():
+            self.keys = np.insert(self.keys, idx[~hit], keys[~hit])
+            self.counts = np.insert(self.counts, idx[~hit], counts[~hit])
+
+    def quantiles(self, code, qs):
+        lo, hi = np.searchsorted(self.keys, [code * self.SPAN, (code + 1) * self.SPAN])
+        if lo == hi:
+            return [np.nan for _ in qs]
+        buckets = self.keys[lo:hi] - code * self.SPAN - self.SPAN // 2
+        cumulative = np.cumsum(self.counts[lo:hi])
+        ranks = np.asarray(qs) * (cumulative[-1] - 1)
+        picks = np.searchsorted(cumulative, ranks, side='right')
+        return [float(v) for v in self._value(buckets[picks])]
+
+
+class GroupStats:
+    """
+    Per-group statistics for one key column (e.g. Type), fed chunk by chunk in
+    the same scan as the global stats. Labels map to integer codes once per
+    chunk; everything else is a vectorized reduction over those codes.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.index = {}
+        self.labels = []
+        self.rows = np.zeros(0, dtype=np.int64)
+        self.anomalies = np.zeros(0, dtype=np.int64)
+        self.moments = {col: GroupedMoments() for col in REQUIRED_COLS}
+        self.quantiles = {col: GroupedQuantiles() for col in REQUIRED_COLS}
+
+    def codes(self, series):
+        codes, uniques = pd.factorize(series)
+        lookup = [self.index.setdefault(str(label), len(self.index)) for label in uniques]
+        if (codes < 0).any():
+            lookup.append(self.index.setdefault(MISSING, len(self.index)))   # code -1: missing label
+        self.labels = list(self.index)
+        return np.asarray(lookup, dtype=np.int64)[codes]
+
+    def _counter(self, counts, codes):
+        size = len(self.labels)
+        grown = np.concatenate([counts, np.zeros(size - len(counts), dtype=np.int64)])
+        return grown + np.bincount(codes, minlength=size)
+
+    def update(self, chunk):
+        codes = self.codes(chunk[self.key])
+        self.rows = self._counter(self.rows, codes)
+        for col in REQUIRED_COLS:
+            values = chunk[col].to_numpy(dtype=float)
+            self.moments[col].update(codes, values, len(self.labels))
+            self.quantiles[col].update(codes, values)
+
+    def add_anomalies(self, series, mask):
+        # Rows flagged by the global Pressure rule, attributed to their group
+        self.anomalies = self._counter(self.anomalies, self.codes(series[mask]))
+
+    def result(self, anomalies=None, limit=MAX_GROUPS):
+        """
+        {'groups': {label: {count, stats, anomaly_count, flagged_rows}}} for the
+        largest `limit` labelled groups, and the same block for rows without a
+        label under 'missing' (None when every row has one). `anomalies` is the
+        rolling anomaly block, for the flagged rows per group.
+        """
+        anomalies = anomalies or {}
+        flagged = anomalies.get('by_column', {}).get(self.key, {})
+        size = len(self.labels)
+        counts = np.concatenate([self.anomalies, np.zeros(size - len(self.anomalies), dtype=np.int64)])
+        stds = {col: self.moments[col].std() for col in REQUIRED_COLS}
+        order = sorted((code for code in range(size) if self.labels[code] is not MISSING),
+                       key=lambda code: -self.rows[code])
+        groups = {self.labels[code]: self._entry(code, stds, counts, flagged.get(self.labels[code], 0))
+                  for code in order[:limit]}
+        missing = None
+        if MISSING in self.index:
+            missing_flagged = anomalies.get('missing', {}).get(self.key, 0)
+            missing = self._entry(self.index[MISSING], stds, counts, missing_flagged)
+        return {'groups': groups, 'missing': missing, 'total_groups': len(order),
+                'truncated': max(len(order) - limit, 0)}
+
+    def _entry(self, code, stds, anomalies, flagged_rows):
+        stats = {}
+        for col in REQUIRED_COLS:
+            m = self.moments[col]
+            seen = code < len(m.n) and m.n[code] > 0
+            values = self.quantiles[col].quantiles(code, list(QUANTILES.values()))
+            stats[col] = {
+                'avg': round(float(m.mean[code]), 2) if seen else None,
+                'std': round(float(stds[col][code]), 2) if seen and m.n[code] > 1 else None,
+                'min': round(float(m.min[code]), 2) if seen else None,
+                'max': round(float(m.max[code]), 2) if seen else None,
+                **{name: round(v, 2) if seen else None for name, v in zip(QUANTILES, values)}
+            }
+        return {
+            'count': int(self.rows[code]),
+            'stats': stats,
+            'anomaly_count': int(anomalies[code]),
+            'flagged_rows': flagged_rows,
+        }
@@ -0,0 +1,251 @@
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from . import metrics
+from .cache import store_result
+from .models import AnalysisResult, ProcessingJob, json_safe, public_result
+from .profiling import SamplingProfiler
+from .pyramid import Pyramid, build_pyramid
+from .timing import Timings, current, stage
+from .worker import execute_job, init_worker
+
+DEFAULTS = {
+    # One worker per core (capped; each in-memory analysis can take a few hundred MB)
+    'WORKERS': min(4, os.cpu_count() or 1),
+    # Run jobs inline in the request thread (handy for tests and debugging)
+    'EAGER': False,
+    # Analyse single uploads while they arrive (AnalysingUploadHandler); no job unless that fails
+    'ANALYSE_ON_UPLOAD': True,
+    # Bigger uploads analysed on the fly are finished by a job: the store-side passes
+    # (pyramid, anomalies, chart) read every row, which is too long to hold a request open
+    'FINISH_IN_REQUEST_BYTES': 32 * 1024 * 1024,
+    # Runs a job may start before it counts as crashing its worker and is failed for good
+    'MAX_ATTEMPTS': 2,
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+_identity = (None, None)
+_boot_id = None
+_recovered = False
+
+
+def jobs_setting(name):
+    return getattr(settings, 'ANALYSIS_JOBS', {}).get(name, DEFAULTS[name])
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # 'spawn' so children never inherit the parent's DB connections or threads
+            _executor = ProcessPoolExecutor(
+                max_workers=jobs_setting('WORKERS'),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker,
+            )
+        return _executor
+
+
+def _process_start(pid):
+    # When `pid` started (boot id + clock ticks since boot, from /proc), so a process
+    # that was given a dead owner's pid is told apart from it. None once it has
+    # exited; '' where /proc is not available
+    global _boot_id
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            ticks = f.read().rsplit(')', 1)[1].split()[19]
+        if _boot_id is None:
+            with open('/proc/sys/kernel/random/boot_id') as f:
+                _boot_id = f.read().strip()[:8]
+    except FileNotFoundError:
+        return None if os.path.isdir('/proc/self') else ''
+    except (OSError, IndexError):
+        return ''
+    return f"{_boot_id}.{ticks}"
+
+
+def process_owner():
+    # host:pid:start:token of this process; start and token tell a reused pid from the original
+    global _identity
+    pid = os.getpid()
+    if _identity[0] != pid:
+        _identity = (pid, f"{socket.gethostname()}:{pid}:{_process_start(pid) or ''}:{uuid.uuid4().hex[:8]}")
+    return _identity[1]
+
+
+def _has_exited(owner):
+    if not owner:
+        return True  # submitted before jobs had owners
+    host, pid, *rest = owner.split(':')
+    if host != socket.gethostname():
+        return False  # another machine's process: not ours to judge
+    if int(pid) == os.getpid():
+        return owner != process_owner()
+    started = rest[0] if len(rest) == 2 else ''  # host:pid:token owners predate start times
+    if started:
+        return _process_start(pid) not in (started, '')
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def recover_jobs():
+    """
+    Takes over queued and running jobs whose owning process has exited (server
+    restart, recycled worker): they are submitted again from this process, or
+    failed once they have been started MAX_ATTEMPTS times. Each job is claimed
+    with one conditional UPDATE, so concurrent workers never both take it.
+    Returns (requeued, failed).
+    """
+    global _recovered
+    _recovered = True
+    me = process_owner()
+    requeued = failed = 0
+    unfinished = ProcessingJob.objects.filter(status__in=(ProcessingJob.QUEUED, ProcessingJob.RUNNING))
+    for pk, owner, attempts in list(unfinished.values_list('pk', 'owner', 'attempts')):
+        if owner == me or not _has_exited(owner):
+            continue
+        stale = unfinished.filter(pk=pk, owner=owner)
+        if attempts >= jobs_setting('MAX_ATTEMPTS'):
+            failed += stale.update(status=ProcessingJob.FAILED, finished_at=timezone.now(),
+                                   error="Analysis was interrupted too many times (the worker kept exiting).")
+        elif stale.update(status=ProcessingJob.QUEUED, owner=me, progress=0.0):
+            requeued += 1
+            if jobs_setting('EAGER'):
+                metrics.observe_job(run_job(pk))
+            else:
+                _submit(pk)
+    return requeued, failed
+
+
+def enqueue(upload, profile=False):
+    """
+    Creates a queued job for `upload` and hands it to the worker pool once
+    committed. With `profile`, the analysis runs under the sampling profiler.
+    The first call in a process also recovers jobs left by exited processes
+    (gunicorn does that as each worker starts; see gunicorn.conf.py).
+    """
+    if not _recovered:
+        recover_jobs()
+    job = ProcessingJob.objects.create(upload=upload, owner=process_owner())
+    if jobs_setting('EAGER'):
+        metrics.observe_job(run_job(job.pk, profile))
+        job.refresh_from_db()
+    else:
+        transaction.on_commit(lambda: _submit(job.pk, profile))
+    return job
+
+
+def _submit(job_id, profile=False):
+    future = get_executor().submit(execute_job, job_id, profile)
+    future.add_done_callback(lambda f: _on_done(job_id, f))
+
+
+def _on_done(job_id, future):
+    # run_job records its own failures; this only catches a crashed worker process.
+    # Runs on the pool's callback thread, which no request cycle cleans up after
+    exc = future.exception()
+    if exc is not None:
+        close_old_connections()
+        try:
+            ProcessingJob.objects.filter(pk=job_id).exclude(status=ProcessingJob.DONE).update(
+                status=ProcessingJob.FAILED, error=str(exc), finished_at=timezone.now()
+            )
+        finally:
+            connection.close()
+    else:
+        # The worker's timings and sizes, recorded in this (the web) process
+        metrics.observe_job(future.result())
+
+
+def run_job(job_id, profile=False):
+    """
+    Runs one analysis job and returns a summary for the metrics:
+    {status, seconds, stages, rows, bytes, peak_memory}.
+    """
+    metrics.reset_peak_memory()
+    timings = Timings()
+    start = time.perf_counter()
+    with timings.activate():
+        if profile:
+            with SamplingProfiler() as profiler:
+                status, rows, size = _run(job_id)
+            profiler.save(f'job-{job_id}')
+        else:
+            status, rows, size = _run(job_id)
+    return {
+        'status': status,
+        'seconds': time.perf_counter() - start,
+        'stages': timings.stages,
+        'rows': rows,
+        'bytes': size,
+        'peak_memory': metrics.peak_memory(),
+    }
+
+
+def _run(job_id):
+    # Imported here so the web process does not need pandas just to queue jobs
+    from .utils import process_csv_data, process_column_store
+
+    job = ProcessingJob.objects.select_related('upload').get(pk=job_id)
+    started_at = timezone.now()
+    ProcessingJob.objects.filter(pk=job_id).update(status=ProcessingJob.RUNNING, started_at=started_at,
+                                                   attempts=F('attempts') + 1)
+    timings = current()
+    timings.add('queued', (started_at - job.created_at).total_seconds())
+
+    last = [0.0]
+    def report(fraction):
+        # Throttle DB writes to whole-percent steps
+        if fraction - last[0] >= 0.01:
+            last[0] = fraction
+            ProcessingJob.objects.filter(pk=job_id).update(progress=round(fraction, 3))
+
+    try:
+        size = os.path.getsize(job.upload.file.path)
+    except (OSError, ValueError):
+        size = None
+
+    try:
+        store = job.upload.column_store()
+        if store is not None:
+            # Same bytes were ingested before: analyse the memory-mapped columns
+            result = process_column_store(store, progress=report)
+        else:
+            # First sighting: parse the CSV once and write the column store on the way
+            result = process_csv_data(job.upload.file.path, progress=report, store_dir=job.upload.columnar_dir)
+    except Exception as e:
+        result = {"success": False, "error": str(e)}
+
+    if result['success']:
+        # Zoom pyramid for the time-series endpoint (once per column store)
+        with stage('pyramid'):
+            store = job.upload.column_store()
+            if store is not None and Pyramid.open(store) is None:
+                build_pyramid(store)
+        with stage('save'):
+            AnalysisResult.from_result(job.upload, result)
+            store_result(job.upload.sha256, result)
+            payload = json_safe(public_result(result))
+        ProcessingJob.objects.filter(pk=job_id).update(
+            status=ProcessingJob.DONE, progress=1.0, result=payload, timings=timings.to_dict(),
+            finished_at=timezone.now()
+        )
+        return ProcessingJob.DONE, result['total_count'], size
+    ProcessingJob.objects.filter(pk=job_id).update(
+        status=ProcessingJob.FAILED, error=result['error'], timings=timings.to_dict(), finished_at=timezone.now()
+    )
+    return ProcessingJob.FAILED, None, size
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from core.retention import expired_uploads, sweep
+
+
+class Command(BaseCommand):
+    help = "Applies the upload retention quotas now (uploads also start this in the background)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="only report how many uploads are over quota")
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self.stdout.write(f"{len(expired_uploads())} uploads are over the retention quotas")
+            return
+        result = sweep()
+        self.stdout.write(f"Removed {result['files']} uploads ({result['bytes']} bytes)")
@@ -0,0 +1,326 @@
+"""
+Prometheus metrics, rendered in the text exposition format by the metrics
+endpoint. Analysis jobs run in pool workers, which send their numbers back
+with the job's future (see jobs.py), so the web process that queued a job
+records it.
+
+Each web process counts in memory. Under a multi-process server (gunicorn),
+METRICS_DIR names a directory the processes share: every process writes its
+numbers there (every FLUSH_SECONDS while it changes, and on exit), and render() adds
+up all of them, so any worker answers a scrape for the whole server and the
+counters stay monotonic. Files of exited processes are folded into one
+archive file. Without METRICS_DIR a scrape only sees the process it reached.
+"""
+import atexit
+import glob
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: no lock, so files of exited processes are never folded
+    fcntl = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+RATE_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7)
+BYTES_BUCKETS = tuple(1024 * 4 ** i for i in range(13))             # 1 KiB .. 16 GiB
+MEMORY_BUCKETS = tuple(2 ** i for i in range(26, 36))               # 64 MiB .. 32 GiB
+
+REGISTRY = []
+FLUSH_SECONDS = 5.0
+ARCHIVE_FILE = 'archive.json'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def _number(value):
+    return '+Inf' if value == float('inf') else repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.label_names = name, help, labels
+        self.values = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        _changed()
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.values)
+
+    @staticmethod
+    def combine(a, b):
+        return a + b
+
+    def render(self, values=None):
+        values = self.snapshot() if values is None else values
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for key, value in sorted(values.items()):
+            lines.append(f'{self.name}{_labels(list(zip(self.label_names, key)))} {_number(value)}')
+        return lines
+
+
+class Histogram:
+    """Cumulative buckets plus _sum and _count, per label combination."""
+
+    def __init__(self, name, help, buckets, labels=()):
+        self.name, self.help, self.label_names = name, help, labels
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self.series = {}                    # label values -> [bucket counts..., sum, count]
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        if value is None:
+            return
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self.lock:
+            series = self.series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+        _changed()
+
+    def snapshot(self):
+        with self.lock:
+            return {key: list(series) for key, series in self.series.items()}
+
+    @staticmethod
+    def combine(a, b):
+        return [x + y for x, y in zip(a, b)]
+
+    def render(self, values=None):
+        values = self.snapshot() if values is None else values
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for key, series in sorted(values.items()):
+            pairs = list(zip(self.label_names, key))
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{_labels(pairs + [("le", _number(bound))])} {count}')
+            lines.append(f'{self.name}_sum{_labels(pairs)} {_number(series[-2])}')
+            lines.append(f'{self.name}_count{_labels(pairs)} {series[-1]}')
+        return lines
+
+
+# Shared numbers of a multi-process server
+
+_process = {'pid': None, 'file': None, 'dirty': False}
+_flush_lock = threading.Lock()
+
+
+def shared_dir():
+    return getattr(settings, 'METRICS_DIR', None) if settings.configured else None
+
+
+def _process_file(directory):
+    # One file per process (the token keeps a later process with a reused pid off it),
+    # written by a flusher thread started with the process's first number
+    pid = os.getpid()
+    if _process['pid'] != pid:
+        _process.update(pid=pid, file=None)
+        threading.Thread(target=_flusher, name='metrics-flush', daemon=True).start()
+    if _process['file'] is None or os.path.dirname(_process['file']) != directory:
+        _process['file'] = os.path.join(directory, f"{pid}-{uuid.uuid4().hex[:8]}.json")
+    return _process['file']
+
+
+def _flusher():
+    pid = os.getpid()
+    while _process['pid'] == pid:
+        time.sleep(FLUSH_SECONDS)
+        if _process['dirty']:
+            flush()
+
+
+def _changed():
+    directory = shared_dir()
+    if directory:
+        _process['dirty'] = True
+        _process_file(directory)
+
+
+def _dump(path, numbers):
+    tmp = f"{path}.tmp-{uuid.uuid4().hex}"
+    with open(tmp, 'w') as f:
+        json.dump({name: [[list(key), value] for key, value in values.items()] for name, values in numbers.items()}, f)
+    os.replace(tmp, path)
+
+
+def _load(path):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {name: {tuple(key): value for key, value in entries} for name, entries in data.items()}
+
+
+def _add(totals, numbers):
+    for metric in REGISTRY:
+        total = totals.setdefault(metric.name, {})
+        for key, value in numbers.get(metric.name, {}).items():
+            total[key] = metric.combine(total[key], value) if key in total else value
+
+
+def flush():
+    """Writes this process's numbers to METRICS_DIR (a no-op without one or before anything was recorded)."""
+    directory = shared_dir()
+    if not directory:
+        return
+    with _flush_lock:
+        _process['dirty'] = False
+        numbers = {metric.name: metric.snapshot() for metric in REGISTRY}
+        if not any(numbers.values()):
+            return  # e.g. analysis pool processes, which report through the web process
+        os.makedirs(directory, exist_ok=True)
+        _dump(_process_file(directory), numbers)
+
+
+atexit.register(flush)
+
+
+def _alive(path):
+    pid = int(os.path.basename(path).split('-', 1)[0])
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@contextmanager
+def _locked(directory):
+    # Folding and reading take turns, so no scrape sees a process both in its file and in the archive
+    if fcntl is None:
+        yield False
+        return
+    with open(os.path.join(directory, '.lock'), 'a') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield True
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _fold_exited(directory):
+    # Numbers of exited processes go into the archive, so the directory does not grow with recycled workers
+    dead = [path for path in glob.glob(os.path.join(directory, '[0-9]*-*.json')) if not _alive(path)]
+    if not dead:
+        return
+    archive = os.path.join(directory, ARCHIVE_FILE)
+    totals = _load(archive)
+    for path in dead:
+        _add(totals, _load(path))
+    _dump(archive, totals)
+    for path in dead:
+        os.remove(path)
+
+
+def collect():
+    """{metric name: {label values: value}} over every process sharing METRICS_DIR (or just this one)."""
+    directory = shared_dir()
+    if not directory:
+        return {metric.name: metric.snapshot() for metric in REGISTRY}
+    flush()
+    os.makedirs(directory, exist_ok=True)
+    totals = {}
+    with _locked(directory) as locked:
+        if locked:
+            _fold_exited(directory)
+        for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+            _add(totals, _load(path))
+    return totals
+
+
+def render():
+    numbers = collect()
+    return '\n'.join(line for metric in REGISTRY for line in metric.render(numbers.get(metric.name, {}))) + '\n'
+
+
+http_seconds = Histogram('http_request_duration_seconds', 'API request latency.',
+                         LATENCY_BUCKETS, labels=('view', 'method', 'status'))
+http_request_bytes = Histogram('http_request_size_bytes', 'API request body size.', BYTES_BUCKETS, labels=('view',))
+http_response_bytes = Histogram('http_response_size_bytes', 'API response body size.', BYTES_BUCKETS, labels=('view',))
+
+analysis_jobs = Counter('analysis_jobs_total', 'Finished analysis jobs.', labels=('status',))
+analysis_seconds = Histogram('analysis_duration_seconds', 'Analysis job run time.', LATENCY_BUCKETS)
+analysis_stage_seconds = Histogram('analysis_stage_seconds', 'Time per analysis pipeline stage.',
+                                   LATENCY_BUCKETS, labels=('stage',))
+analysis_rows_per_second = Histogram('analysis_rows_per_second', 'Analysis throughput.', RATE_BUCKETS)
+analysis_bytes = Histogram('analysis_input_bytes', 'Size of the analysed file.', BYTES_BUCKETS)
+analysis_peak_memory = Histogram('analysis_peak_memory_bytes', 'Peak resident memory of the worker during a job.',
+                                 MEMORY_BUCKETS)
+
+retention_files = Counter('retention_deleted_uploads_total', 'Uploads removed by the retention sweeper.')
+retention_bytes = Counter('retention_freed_bytes_total', 'CSV bytes freed by the retention sweeper.')
+
+
+def observe_request(view, method, status, seconds, request_bytes, response_bytes):
+    http_seconds.observe(seconds, view=view, method=method, status=status)
+    http_request_bytes.observe(request_bytes, view=view)
+    http_response_bytes.observe(response_bytes, view=view)
+
+
+def observe_job(summary):
+    """Records the summary dict returned by jobs.run_job."""
+    analysis_jobs.inc(status=summary['status'])
+    analysis_seconds.observe(summary['seconds'])
+    for name, seconds in summary['stages'].items():
+        analysis_stage_seconds.observe(seconds, stage=name)
+    if summary['status'] == 'done':
+        rows = summary.get('rows') or 0
+        analysis_rows_per_second.observe(rows / summary['seconds'] if summary['seconds'] else None)
+        analysis_bytes.observe(summary.get('bytes'))
+        analysis_peak_memory.observe(summary.get('peak_memory'))
+
+
+def reset_peak_memory():
+    # Linux: restart the VmHWM high-water mark so the next reading covers one job
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def peak_memory():
+    """Peak resident set size of this process in bytes, or None where unknown."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss: kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
@@ -0,0 +1,122 @@
+import gzip
+import re
+import time
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from . import metrics
+from .profiling import SamplingProfiler, profile_requested, request_profile_name
+from .timing import Timings, stage
+
+try:
+    # Optional: brotli responses, smaller than gzip at similar speed (pip install brotli)
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = 1024
+# API payloads only: HTML pages (admin, browsable API) carry CSRF tokens, and compressing a
+# secret next to reflected input leaks it through the response size (BREACH)
+COMPRESS_TYPES = ('application/json', 'application/msgpack', 'text/csv')
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+ENCODED_ETAG = re.compile(r'-(?:br|gzip)"')
+
+
+class InstrumentationMiddleware:
+    """
+    Times every request and records it in the Prometheus metrics. Stages the
+    view marks with timing.stage() are sent back in a Server-Timing header
+    (browser dev tools show them per request). Requests selected with
+    ?profile=1 / X-Profile: 1 run under the sampling profiler when
+    PROFILING['ENABLED'] is on; the profile's file name comes back in X-Profile
+    (a profiled upload's analysis job writes job-<job_id>.collapsed next to it).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = Timings()
+        request.profile = profile_requested(request)
+        start = time.perf_counter()
+        with timings.activate():
+            if request.profile:
+                with SamplingProfiler() as profiler:
+                    response = self.get_response(request)
+                response['X-Profile'] = profiler.save(request_profile_name())
+            else:
+                response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        if getattr(settings, 'SERVER_TIMING', True):
+            response['Server-Timing'] = timings.header(total=elapsed)
+            # Cross-origin pages (the dashboard) may read it too, like the CORS setup allows
+            response['Timing-Allow-Origin'] = '*'
+        match = request.resolver_match
+        metrics.observe_request(
+            view=match.url_name if match and match.url_name else 'other',
+            method=request.method,
+            status=response.status_code,
+            seconds=elapsed,
+            request_bytes=int(request.headers.get('Content-Length') or 0),
+            response_bytes=None if response.streaming else len(response.content),
+        )
+        return response
+
+
+class CompressionMiddleware:
+    """
+    Compresses API responses (COMPRESS_TYPES) with brotli (when installed) or
+    gzip, whichever the client accepts. Responses that set the CSRF cookie are
+    sent as they are, whatever their type. A strong ETag gets the encoding
+    appended ("...-gzip"), so each encoding has its own tag, and the suffix is
+    stripped again from If-None-Match before the view compares it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            request.META['HTTP_IF_NONE_MATCH'] = ENCODED_ETAG.sub('"', if_none_match)
+        response = self.get_response(request)
+
+        if response.status_code == 304:
+            # Echo the tag the client sent, suffix included
+            etag = response.get('ETag')
+            if etag and if_none_match:
+                for tag in if_none_match.split(','):
+                    if ENCODED_ETAG.sub('"', tag.strip()) == etag:
+                        response['ETag'] = tag.strip()
+                        break
+            return response
+        if (response.streaming or len(response.content) < COMPRESS_MIN_BYTES
+                or response.has_header('Content-Encoding')
+                or settings.CSRF_COOKIE_NAME in response.cookies
+                or not response.get('Content-Type', '').startswith(COMPRESS_TYPES)):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = request.headers.get('Accept-Encoding', '')
+        if brotli is not None and re.search(r'\bbr\b', accepted):
+            encoding = 'br'
+        elif re.search(r'\bgzip\b', accepted):
+            encoding = 'gzip'
+        else:
+            return response
+        with stage('compress'):
+            if encoding == 'br':
+                content = brotli.compress(response.content, quality=BROTLI_QUALITY)
+            else:
+                content = gzip.compress(response.content, compresslevel=GZIP_LEVEL, mtime=0)
+        if len(content) >= len(response.content):
+            return response
+
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = f'{etag[:-1]}-{encoding}"'
+        return response
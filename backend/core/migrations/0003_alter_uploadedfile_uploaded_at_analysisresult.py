@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:22
+
+import django.db.models.deletion
+import rest_framework.utils.encoders
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_analysiscache_uploadedfile_sha256'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadedfile',
+            name='uploaded_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='AnalysisResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_count', models.PositiveBigIntegerField(default=0)),
+                ('avg_flowrate', models.FloatField(null=True)),
+                ('avg_pressure', models.FloatField(null=True)),
+                ('avg_temperature', models.FloatField(null=True)),
+                ('anomaly_count', models.PositiveBigIntegerField(default=0)),
+                ('time_col', models.CharField(blank=True, max_length=64)),
+                ('stats', models.JSONField(default=dict, encoder=rest_framework.utils.encoders.JSONEncoder)),
+                ('correlation', models.JSONField(default=dict, encoder=rest_framework.utils.encoders.JSONEncoder)),
+                ('distribution', models.JSONField(default=dict, encoder=rest_framework.utils.encoders.JSONEncoder)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('upload', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='analysis', to='core.uploadedfile')),
+            ],
+        ),
+    ]
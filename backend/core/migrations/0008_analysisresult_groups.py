@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:41
+
+import rest_framework.utils.encoders
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_analysisresult_partials'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisresult',
+            name='groups',
+            field=models.JSONField(default=dict, encoder=rest_framework.utils.encoders.JSONEncoder),
+        ),
+    ]
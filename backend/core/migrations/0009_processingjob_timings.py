@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_analysisresult_groups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processingjob',
+            name='timings',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:08
+
+import os
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_sizes(apps, schema_editor):
+    # Existing uploads: take the size from disk (0 if the file is gone)
+    UploadedFile = apps.get_model('core', 'UploadedFile')
+    for upload in UploadedFile.objects.only('pk', 'file').iterator():
+        path = os.path.join(settings.MEDIA_ROOT, upload.file.name)
+        if os.path.isfile(path):
+            UploadedFile.objects.filter(pk=upload.pk).update(size_bytes=os.path.getsize(path))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_processingjob_timings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedfile',
+            name='size_bytes',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_sizes, migrations.RunPython.noop),
+    ]
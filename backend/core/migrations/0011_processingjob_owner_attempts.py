@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_uploadedfile_size_bytes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processingjob',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='processingjob',
+            name='owner',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
@@ -1,24 +1,132 @@
 # core/models.py
+from django.conf import settings
 from django.db import models
+from rest_framework.utils.encoders import JSONEncoder
+from .columnar import ColumnStore
+from .payloads import json_safe, public_result
+from .sketches import ColumnSketches
 import os
+import uuid
+
+class UploadBatch(models.Model):
+    # Several files uploaded together through the batch endpoint
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Batch {self.id}"
 
 class UploadedFile(models.Model):
     file = models.FileField(upload_to='uploads/')
-    uploaded_at = models.DateTimeField(auto_now_add=True)
+    uploaded_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    # SHA-256 of the uploaded bytes (filled in by HashingUploadHandler)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    batch = models.ForeignKey(UploadBatch, on_delete=models.SET_NULL, null=True, blank=True, related_name='files')
+    # Size of the CSV on disk, for the retention byte quota (see retention.py)
+    size_bytes = models.PositiveBigIntegerField(default=0)
 
     def save(self, *args, **kwargs):
-        # Logic: Keep only the last 5 files 
-        objects = UploadedFile.objects.all().order_by('-uploaded_at')
-        if objects.count() >= 5:
-            # Get the files to delete (everything after the 4th item)
-            to_delete = objects[4:] 
-            for obj in to_delete:
-                # Optional: Delete actual file from disk to save space
-                if os.path.isfile(obj.file.path):
-                    os.remove(obj.file.path)
-                obj.delete()
-        
+        # Old uploads are removed by the retention sweeper, never here
+        if not self.size_bytes and self.file:
+            self.size_bytes = self.file.size
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"File {self.id} - {self.uploaded_at}"
\ No newline at end of file
+        return f"File {self.id} - {self.uploaded_at}"
+
+    @property
+    def file_name(self):
+        return os.path.basename(self.file.name)
+
+    @property
+    def columnar_dir(self):
+        # Content-addressed, so re-uploads of the same bytes share one column store
+        return os.path.join(settings.MEDIA_ROOT, 'columnar', self.sha256 or f"file-{self.pk}")
+
+    def column_store(self):
+        # Memory-mapped columnar copy of this upload, or None if not ingested yet
+        return ColumnStore.open(self.columnar_dir)
+
+class AnalysisResult(models.Model):
+    # Summary computed once at upload time, so history never re-reads the CSV
+    upload = models.OneToOneField(UploadedFile, on_delete=models.CASCADE, related_name='analysis')
+    total_count = models.PositiveBigIntegerField(default=0)
+    avg_flowrate = models.FloatField(null=True)
+    avg_pressure = models.FloatField(null=True)
+    avg_temperature = models.FloatField(null=True)
+    anomaly_count = models.PositiveBigIntegerField(default=0)
+    time_col = models.CharField(max_length=64, blank=True)
+    stats = models.JSONField(encoder=JSONEncoder, default=dict)
+    correlation = models.JSONField(encoder=JSONEncoder, default=dict)
+    distribution = models.JSONField(encoder=JSONEncoder, default=dict)
+    # Per-Type / per-Equipment Name breakdowns
+    groups = models.JSONField(encoder=JSONEncoder, default=dict)
+    # Serialized quantile sketches + histograms, mergeable across uploads
+    sketches = models.JSONField(default=dict)
+    # Exact partial aggregates (moments, co-moments) for cross-upload queries
+    partials = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @classmethod
+    def from_result(cls, upload, result):
+        result = json_safe(result)
+        stats = result.get('stats', {})
+        avg = lambda col: stats.get(col, {}).get('avg')
+        analysis, _ = cls.objects.update_or_create(upload=upload, defaults={
+            'total_count': result.get('total_count', 0),
+            'avg_flowrate': avg('Flowrate'),
+            'avg_pressure': avg('Pressure'),
+            'avg_temperature': avg('Temperature'),
+            'anomaly_count': result.get('anomaly_count', 0),
+            'time_col': result.get('time_col') or '',
+            'stats': stats,
+            'correlation': result.get('correlation', {}),
+            'distribution': result.get('distribution', {}),
+            'groups': result.get('groups') or {},
+            'sketches': result.get('sketches', {}),
+            'partials': result.get('partials', {}),
+        })
+        return analysis
+
+    def column_sketches(self):
+        # None for analyses stored before sketches existed
+        return ColumnSketches.from_dict(self.sketches) if self.sketches else None
+
+    def __str__(self):
+        return f"Analysis of file {self.upload_id}"
+
+class AnalysisCache(models.Model):
+    # process_csv_data results keyed by the SHA-256 of the uploaded bytes
+    sha256 = models.CharField(max_length=64, unique=True)
+    result = models.JSONField(encoder=JSONEncoder)
+    size_bytes = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"Cache {self.sha256[:12]} ({self.size_bytes} bytes)"
+
+class ProcessingJob(models.Model):
+    # One background analysis run. The queue itself lives in the worker pool of the
+    # process that submitted the job (`owner`); jobs.recover_jobs() requeues the
+    # unfinished jobs of owners that have exited
+    QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    upload = models.ForeignKey(UploadedFile, on_delete=models.CASCADE, related_name='jobs')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    progress = models.FloatField(default=0.0)
+    result = models.JSONField(encoder=JSONEncoder, null=True, blank=True)
+    error = models.TextField(blank=True)
+    # Seconds per pipeline stage (parse, stats, ...), sent as Server-Timing by the status endpoint
+    timings = models.JSONField(default=dict, blank=True)
+    # host:pid:start:token of the web process whose pool runs the job
+    owner = models.CharField(max_length=255, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Job {self.id} ({self.status})"
@@ -0,0 +1,193 @@
+import csv
+import io
+import pandas as pd
+from .schema import GROUP_COLS, REQUIRED_COLS, TIME_COLS, normalize_columns
+
+try:
+    # Optional: multithreaded CSV reader (pip install pyarrow)
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    PARSE_ERRORS = (ValueError, TypeError, pa.ArrowInvalid)
+except ImportError:
+    pa = pa_csv = None
+    PARSE_ERRORS = (ValueError, TypeError)
+
+# Declared schema for the columns the analysis reads. Times and any other columns are read
+# as text and become numbers when every value is one (e.g. Hour), like pandas would infer;
+# date strings stay text, the column store and the sort logic parse them.
+SCHEMA = {
+    **{col: 'float' for col in REQUIRED_COLS},
+    **{col: 'category' for col in GROUP_COLS},
+    **{col: 'time' for col in TIME_COLS},
+}
+PANDAS_DTYPES = {'float': 'float64', 'category': 'category', 'time': 'str', 'text': 'str'}
+ARROW_BLOCK_BYTES = 16 * 1024 * 1024
+# IncrementalCsvReader parses once it holds this many bytes of complete lines
+FEED_BLOCK_BYTES = 4 * 1024 * 1024
+
+
+def read_header(file_path):
+    with open(file_path, newline='', encoding='utf-8-sig', errors='replace') as f:
+        return next(csv.reader(f), [])
+
+
+def plan(file_path, columns=None):
+    """
+    Original header names to read and their declared kinds, keyed by the
+    original (un-normalized) name. Columns outside the schema are kept as
+    'text' (they still show up in preview and chart_data) unless `columns`
+    narrows the read to a subset, e.g. ['Pressure']. Empty when the header
+    matches nothing in the schema.
+    """
+    return header_kinds(read_header(file_path), columns)
+
+
+def header_kinds(header, columns=None):
+    kinds = {}
+    for original, name in zip(header, normalize_columns(header)):
+        if name in SCHEMA:
+            if columns is None or name in columns:
+                kinds[original] = SCHEMA[name]
+        elif columns is None:
+            kinds[original] = 'text'
+    return kinds if any(kind != 'text' for kind in kinds.values()) else {}
+
+
+def _arrow_options(kinds, block_size=None):
+    arrow_types = {'float': pa.float64(), 'category': pa.dictionary(pa.int32(), pa.string()),
+                   'time': pa.string(), 'text': pa.string()}
+    read_options = pa_csv.ReadOptions(use_threads=True, **({'block_size': block_size} if block_size else {}))
+    convert_options = pa_csv.ConvertOptions(
+        include_columns=list(kinds),
+        column_types={name: arrow_types[kind] for name, kind in kinds.items()},
+        strings_can_be_null=True,
+    )
+    return {'read_options': read_options, 'convert_options': convert_options}
+
+
+class ChunkTypes:
+    """
+    Which text columns of a file hold numbers, decided once: from the first
+    chunk that has values in the column. Every later chunk gets the same
+    dtype, so a column that turns to text further down keeps being numeric,
+    with those values missing (as in the typed Flowrate/Pressure/Temperature
+    columns), instead of switching type from one chunk to the next.
+    """
+
+    def __init__(self):
+        self.numeric = {}
+
+    def decide(self, name, series):
+        if name not in self.numeric:
+            first = series.first_valid_index()
+            if first is None:
+                return False  # nothing to go on yet
+            numbers = pd.to_numeric(series, errors='coerce')
+            self.numeric[name] = bool(numbers.notna().sum() == series.notna().sum())
+        return self.numeric[name]
+
+
+def _finish(df, types=None):
+    # `types` is shared by the chunks of one file; a whole-file read decides on all of its values
+    types = types or ChunkTypes()
+    df.columns = normalize_columns(df.columns)
+    for name in df.columns:
+        series = df[name]
+        if isinstance(series.dtype, pd.CategoricalDtype) or not pd.api.types.is_string_dtype(series):
+            continue
+        # Text columns holding only numbers become numbers (int64 when complete, as pandas infers)
+        if types.decide(name, series):
+            df[name] = pd.to_numeric(series, errors='coerce')
+    return df
+
+
+def read_csv_typed(file_path, columns=None):
+    """
+    Whole-file read with the declared schema: pyarrow when installed, the
+    pandas C engine otherwise. Files whose header matches nothing in the
+    schema, or whose values do not fit it (text in a numeric column), are
+    read untyped as before, so validation and error messages are unchanged.
+    """
+    kinds = plan(file_path, columns)
+    if kinds:
+        try:
+            if pa_csv is not None:
+                table = pa_csv.read_csv(file_path, **_arrow_options(kinds))
+                return _finish(table.to_pandas())
+            dtypes = {name: PANDAS_DTYPES[kind] for name, kind in kinds.items()}
+            return _finish(pd.read_csv(file_path, usecols=list(kinds), dtype=dtypes))
+        except PARSE_ERRORS:
+            pass
+    return pd.read_csv(file_path)
+
+
+def iter_csv_typed(handle, kinds, chunksize):
+    """Chunks from an open binary file: pyarrow record batches, or pandas C-engine chunks."""
+    types = ChunkTypes()
+    if pa_csv is not None:
+        reader = pa_csv.open_csv(handle, **_arrow_options(kinds, ARROW_BLOCK_BYTES))
+        for batch in reader:
+            yield _finish(batch.to_pandas(), types)
+        return
+    dtypes = {name: PANDAS_DTYPES[kind] for name, kind in kinds.items()}
+    for chunk in pd.read_csv(handle, chunksize=chunksize, usecols=list(kinds), dtype=dtypes):
+        yield _finish(chunk, types)
+
+
+class IncrementalCsvReader:
+    """
+    Parses a CSV that arrives in arbitrary byte pieces (e.g. an upload in
+    flight) with the declared schema. feed() returns the DataFrames for every
+    complete block of lines received so far and close() the rest. Blocks are
+    only cut at newlines outside quoted fields.
+    """
+
+    def __init__(self, block_bytes=FEED_BLOCK_BYTES):
+        self.block_bytes = block_bytes
+        self.header = None
+        self.kinds = None
+        self.types = ChunkTypes()
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        self.buffer += data
+        if self.header is None and not self._read_header():
+            return []
+        if len(self.buffer) < self.block_bytes:
+            return []
+        cut = self.buffer.rfind(b'\n') + 1
+        # An odd number of quotes before the cut means it falls inside a quoted field
+        while cut > 0 and self.buffer.count(b'"', 0, cut) % 2:
+            cut = self.buffer.rfind(b'\n', 0, cut - 1) + 1
+        if cut == 0:
+            return []
+        block = bytes(self.buffer[:cut])
+        del self.buffer[:cut]
+        return [self._parse(block)]
+
+    def close(self):
+        if self.header is None and not self._read_header(final=True):
+            raise ValueError("CSV file is empty")
+        block, self.buffer = bytes(self.buffer), bytearray()
+        return [self._parse(block)] if block.strip() else []
+
+    def _read_header(self, final=False):
+        end = self.buffer.find(b'\n')
+        if end < 0 and not final:
+            return False
+        end = len(self.buffer) if end < 0 else end + 1
+        self.header = bytes(self.buffer[:end]).removeprefix(b'\xef\xbb\xbf')
+        del self.buffer[:end]
+        names = next(csv.reader([self.header.decode('utf-8', errors='replace')]), [])
+        self.kinds = header_kinds(names)
+        if not self.kinds:
+            raise ValueError(f"Missing columns: {', '.join(REQUIRED_COLS)}")
+        return True
+
+    def _parse(self, block):
+        data = self.header + block
+        if pa_csv is not None:
+            table = pa_csv.read_csv(pa.py_buffer(data), **_arrow_options(self.kinds))
+            return _finish(table.to_pandas(), self.types)
+        dtypes = {name: PANDAS_DTYPES[kind] for name, kind in self.kinds.items()}
+        return _finish(pd.read_csv(io.BytesIO(data), usecols=list(self.kinds), dtype=dtypes), self.types)
@@ -0,0 +1,59 @@
+import math
+import numpy as np
+import pandas as pd
+
+# Row lists in an analysis result that can be sent one array per column
+ROW_KEYS = ('chart_data', 'preview')
+SHAPES = ('records', 'columns')
+# Result keys that are only kept for merging later (stored, never sent to clients)
+STORAGE_KEYS = ('sketches', 'partials')
+
+
+def json_safe(value):
+    # SQLite's JSON columns reject NaN, so missing statistics are stored as null
+    if isinstance(value, dict):
+        return {k: json_safe(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [json_safe(v) for v in value]
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def public_result(result):
+    return {key: value for key, value in result.items() if key not in STORAGE_KEYS}
+
+
+def _column(values):
+    # Numbers (with gaps) become one NumPy array; anything else stays a list
+    numbers = [v for v in values if v is not None]
+    if numbers and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in numbers):
+        if len(numbers) == len(values) and all(isinstance(v, int) for v in numbers):
+            return np.asarray(values, dtype=np.int64)
+        return np.asarray([np.nan if v is None else v for v in values], dtype=float)
+    return list(values)
+
+
+def records_to_columns(records):
+    """[{col: value}, ...] -> {col: array or list}; column names are sent once instead of per row."""
+    names = list(records[0]) if records else []
+    return {name: _column([row.get(name) for row in records]) for name in names}
+
+
+def frame_to_columns(frame):
+    columns = {}
+    for name in frame.columns:
+        series = frame[name]
+        if pd.api.types.is_bool_dtype(series) or not pd.api.types.is_numeric_dtype(series):
+            columns[name] = series.astype(object).where(series.notna(), None).tolist()
+        else:
+            columns[name] = series.to_numpy(dtype=np.int64 if pd.api.types.is_integer_dtype(series) else float)
+    return columns
+
+
+def shape_result(result, shape):
+    """The result with its row lists as records (stored form) or columns."""
+    if not result or shape != 'columns':
+        return result
+    return {key: records_to_columns(value) if key in ROW_KEYS and isinstance(value, list) else value
+            for key, value in result.items()}
@@ -0,0 +1,78 @@
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from django.conf import settings
+
+DEFAULTS = {
+    # Master switch: when off, profile requests are ignored
+    'ENABLED': False,
+    'INTERVAL': 0.005,
+    # Where .collapsed files are written (default: <BASE_DIR>/profiles)
+    'DIR': None,
+}
+
+
+def profiling_setting(name):
+    return getattr(settings, 'PROFILING', {}).get(name, DEFAULTS[name])
+
+
+def profile_requested(request):
+    # ?profile=1 or an X-Profile: 1 header, honoured only when PROFILING['ENABLED'] is on
+    if not profiling_setting('ENABLED'):
+        return False
+    flag = request.GET.get('profile') or request.headers.get('X-Profile')
+    return flag not in (None, '', '0', 'false')
+
+
+class SamplingProfiler:
+    """
+    Samples one thread's Python stack every `interval` seconds from a helper
+    thread (no tracing, so the profiled code runs at full speed between
+    samples). Output is collapsed stacks, one 'frame;frame;... count' line per
+    distinct stack, as read by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, thread_id=None, interval=None):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval or profiling_setting('INTERVAL')
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.samples.most_common())
+
+    def save(self, name):
+        """Writes the profile to PROFILING['DIR'] and returns the file name."""
+        directory = profiling_setting('DIR') or os.path.join(settings.BASE_DIR, 'profiles')
+        os.makedirs(directory, exist_ok=True)
+        filename = f'{name}.collapsed'
+        with open(os.path.join(directory, filename), 'w') as f:
+            f.write(self.collapsed())
+        return filename
+
+
+def request_profile_name():
+    return f"request-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
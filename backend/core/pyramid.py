@@ -0,0 +1,297 @@
+import json
+import os
+import shutil
+import uuid
+import numpy as np
+import pandas as pd
+from .columnar import publish
+from .schema import REQUIRED_COLS
+
+# Level k aggregates FANOUT**k consecutive rows (in time order) into one bucket.
+# Level 0 is the column store itself; levels stop once a level is down to a few dozen buckets.
+FANOUT = 4
+TOP_LEVEL_BUCKETS = 64
+SLAB_BUCKETS = 1 << 18
+# Unsorted exports are put in time order by an external merge sort: runs of
+# SORT_ROWS rows are sorted in memory, then merged pairwise on disk
+SORT_ROWS = 1 << 20
+PYRAMID_DIR = 'pyramid'
+STATS = ('min', 'max', 'sum', 'count')
+
+LEVEL_DTYPE = np.dtype([
+    (f"{col}_{stat}", '<i8' if stat == 'count' else '<f8')
+    for col in REQUIRED_COLS for stat in STATS
+])
+
+
+def _reduce(blocks, stat_blocks=None):
+    """
+    Folds rows of (buckets, FANOUT-or-more) blocks into min/max/sum/count per
+    bucket. `stat_blocks` carries the previous level's aggregates instead of raw values.
+    """
+    if stat_blocks is None:
+        valid = ~np.isnan(blocks)
+        counts = valid.sum(axis=1)
+        sums = np.where(valid, blocks, 0.0).sum(axis=1)
+        mins = np.where(valid, blocks, np.inf).min(axis=1)
+        maxs = np.where(valid, blocks, -np.inf).max(axis=1)
+    else:
+        mins = stat_blocks['min'].min(axis=1)
+        maxs = stat_blocks['max'].max(axis=1)
+        sums = stat_blocks['sum'].sum(axis=1)
+        counts = stat_blocks['count'].sum(axis=1)
+    mins = np.where(np.isinf(mins), np.nan, mins)
+    maxs = np.where(np.isinf(maxs), np.nan, maxs)
+    return mins, maxs, sums, counts
+
+
+def _padded(values, width, fill):
+    # Pads to a whole number of buckets and reshapes to (buckets, width)
+    buckets = -(-len(values) // width)
+    out = np.full(buckets * width, fill, dtype=values.dtype)
+    out[:len(values)] = values
+    return out.reshape(buckets, width)
+
+
+def time_axis(store):
+    # Time column usable for range queries (free-text times fall back to row Index)
+    time_col = store.time_col
+    return time_col if time_col and store.kind(time_col) != 'category' else None
+
+
+def build_pyramid(store):
+    """
+    Writes min/max/sum/count levels for the process parameters next to the
+    column store. Every level is filled slab by slab through np.memmap, so
+    memory stays flat regardless of the number of rows.
+    """
+    final = os.path.join(store.path, PYRAMID_DIR)
+    # Unique per call: threads of one worker process may build the same pyramid at
+    # once; whichever finishes first is published and the others are dropped
+    tmp = f"{final}.tmp-{uuid.uuid4().hex}"
+    os.makedirs(tmp)
+    try:
+        _write_levels(store, tmp)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    publish(tmp, final)
+    return Pyramid(store)
+
+
+def _sort_keys(values, lo, hi):
+    # NaN times sort last, as with np.argsort; +inf keeps the merge comparisons total
+    keys = np.array(values[lo:hi])
+    if keys.dtype.kind == 'f':
+        keys[np.isnan(keys)] = np.inf
+    return keys
+
+
+def _merge_runs(src, dst, lo, mid, hi):
+    # Stable merge of the sorted runs [lo, mid) and [mid, hi) of src into dst, SORT_ROWS at a time
+    (keys, pos), (out_keys, out_pos) = src, dst
+    i, j, k = lo, mid, lo
+    while i < mid and j < hi:
+        a, b = keys[i:min(i + SORT_ROWS, mid)], keys[j:min(j + SORT_ROWS, hi)]
+        # Emit what cannot be overtaken by rows not loaded yet; ties go to the left run
+        if a[-1] <= b[-1]:
+            na, nb = len(a), int(np.searchsorted(b, a[-1], side='left'))
+        else:
+            na, nb = int(np.searchsorted(a, b[-1], side='right')), len(b)
+        merged = np.concatenate([a[:na], b[:nb]])
+        picked = np.argsort(merged, kind='stable')
+        out_keys[k:k + na + nb] = merged[picked]
+        out_pos[k:k + na + nb] = np.concatenate([pos[i:i + na], pos[j:j + nb]])[picked]
+        i, j, k = i + na, j + nb, k + na + nb
+    for start, stop in ((i, mid), (j, hi)):
+        for s in range(start, stop, SORT_ROWS):
+            e = min(s + SORT_ROWS, stop)
+            out_keys[k:k + e - s] = keys[s:e]
+            out_pos[k:k + e - s] = pos[s:e]
+            k += e - s
+
+
+def _write_order(values, tmp):
+    """
+    Saves order.npy (the stable argsort of `values`) and times.npy (`values`
+    in that order) under `tmp`, holding at most a few SORT_ROWS-row slabs in
+    memory: sorted runs are written to scratch files and merged pairwise.
+    """
+    n = len(values)
+    scratch = []
+    for name in ('a', 'b'):
+        keys = np.lib.format.open_memmap(os.path.join(tmp, f'sort-{name}-keys.npy'), mode='w+',
+                                         dtype=_sort_keys(values, 0, 0).dtype, shape=(n,))
+        pos = np.lib.format.open_memmap(os.path.join(tmp, f'sort-{name}-pos.npy'), mode='w+',
+                                        dtype=np.int64, shape=(n,))
+        scratch.append((keys, pos))
+    src, dst = scratch
+    for lo in range(0, n, SORT_ROWS):
+        keys = _sort_keys(values, lo, min(lo + SORT_ROWS, n))
+        picked = np.argsort(keys, kind='stable')
+        src[0][lo:lo + len(keys)] = keys[picked]
+        src[1][lo:lo + len(keys)] = picked + lo
+    width = SORT_ROWS
+    while width < n:
+        os.utime(tmp)  # heartbeat for the retention sweeper (see ColumnStoreWriter.touch)
+        for lo in range(0, n, 2 * width):
+            mid, hi = min(lo + width, n), min(lo + 2 * width, n)
+            _merge_runs(src, dst, lo, mid, hi)
+        src, dst = dst, src
+        width *= 2
+
+    order = src[1]
+    times = np.lib.format.open_memmap(os.path.join(tmp, 'times.npy'), mode='w+', dtype=values.dtype, shape=(n,))
+    for lo in range(0, n, SORT_ROWS):
+        times[lo:lo + SORT_ROWS] = values[np.asarray(order[lo:lo + SORT_ROWS])]
+    times.flush()
+    order.flush()
+    os.replace(order.filename, os.path.join(tmp, 'order.npy'))
+    for keys, pos in scratch:
+        for array in (keys, pos):
+            if os.path.exists(array.filename):
+                os.remove(array.filename)
+    return np.load(os.path.join(tmp, 'order.npy'), mmap_mode='r')
+
+
+def _write_levels(store, tmp):
+    # Rows must be in time order; exports usually are, otherwise keep a permutation
+    order = None
+    time_col = time_axis(store)
+    if time_col and not store.meta.get('time_sorted', True):
+        order = _write_order(store.column(time_col), tmp)
+
+    levels = []
+    size, source = FANOUT, None
+    while True:
+        rows = store.rows
+        buckets = -(-rows // size) if rows else 0
+        level = np.lib.format.open_memmap(os.path.join(tmp, f"L{len(levels) + 1}.npy"),
+                                          mode='w+', dtype=LEVEL_DTYPE, shape=(buckets,))
+        for b0 in range(0, buckets, SLAB_BUCKETS):
+            os.utime(tmp)  # heartbeat for the retention sweeper (see ColumnStoreWriter.touch)
+            b1 = min(b0 + SLAB_BUCKETS, buckets)
+            for col in REQUIRED_COLS:
+                if source is None:
+                    # First level: straight from the raw column
+                    raw = store.column(col)
+                    picked = raw[order[b0 * size:b1 * size]] if order is not None else raw[b0 * size:b1 * size]
+                    stats = _reduce(_padded(np.asarray(picked, dtype=float), FANOUT, np.nan))
+                else:
+                    prev = source[b0 * FANOUT:b1 * FANOUT]
+                    fills = {'min': np.inf, 'max': -np.inf, 'sum': 0.0, 'count': 0}
+                    stats = _reduce(None, {
+                        stat: _padded(np.asarray(prev[f"{col}_{stat}"]), FANOUT, fills[stat]) for stat in STATS
+                    })
+                for stat, values in zip(STATS, stats):
+                    level[f"{col}_{stat}"][b0:b1] = values
+        level.flush()
+        levels.append({'level': len(levels) + 1, 'bucket_rows': size, 'buckets': buckets})
+        if buckets <= TOP_LEVEL_BUCKETS:
+            break
+        source = level
+        size *= FANOUT
+
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump({'fanout': FANOUT, 'rows': store.rows, 'levels': levels}, f)
+
+
+class Pyramid:
+    """Answers range queries from the coarsest level that still fills the requested width."""
+
+    def __init__(self, store):
+        self.store = store
+        self.path = os.path.join(store.path, PYRAMID_DIR)
+        with open(os.path.join(self.path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        # Only present when the export was not already in time order
+        order_path = os.path.join(self.path, 'order.npy')
+        self.order = np.load(order_path, mmap_mode='r') if os.path.exists(order_path) else None
+        self.time_col = time_axis(store)
+        self.times = None
+        if self.time_col:
+            times_path = os.path.join(self.path, 'times.npy')
+            self.times = np.load(times_path, mmap_mode='r') if self.order is not None else store.column(self.time_col)
+
+    @classmethod
+    def open(cls, store):
+        if store is None or not os.path.isfile(os.path.join(store.path, PYRAMID_DIR, 'meta.json')):
+            return None
+        return cls(store)
+
+    def level(self, k):
+        return np.load(os.path.join(self.path, f"L{k}.npy"), mmap_mode='r')
+
+    def row_range(self, start=None, end=None):
+        """
+        Row positions [i0, i1) for a closed x-range. For datasets without a time
+        column, x is the 1-based Index used by chart_data.
+        """
+        rows = self.store.rows
+        if not self.time_col:
+            i0 = 0 if start is None else max(int(np.floor(start)) - 1, 0)
+            i1 = rows if end is None else min(int(np.floor(end)), rows)
+            return i0, max(i0, i1)
+        i0 = 0 if start is None else int(np.searchsorted(self.times, start, side='left'))
+        i1 = rows if end is None else int(np.searchsorted(self.times, end, side='right'))
+        return i0, max(i0, i1)
+
+    def parse_x(self, value):
+        # Query-string bound -> the stored representation of the time axis
+        if value in (None, ''):
+            return None
+        if self.time_col and self.store.kind(self.time_col) == 'datetime':
+            return pd.Timestamp(value).value
+        return float(value)
+
+    def _format_x(self, values, rows):
+        if not self.time_col:
+            return (rows + 1).tolist()
+        if self.store.kind(self.time_col) == 'datetime':
+            return self.store.decode(self.time_col, values).tolist()
+        return np.asarray(values, dtype=float).tolist()
+
+    def query(self, start=None, end=None, width=1000):
+        """
+        Buckets covering [start, end] at the coarsest level with at most `width`
+        buckets in range. Cost is proportional to `width`, not to the row count.
+        """
+        i0, i1 = self.row_range(start, end)
+        span = i1 - i0
+        if span <= width:
+            # Zoomed in far enough to show raw rows
+            rows = np.arange(i0, i1)
+            picked = self.order[i0:i1] if self.order is not None else rows
+            series = {}
+            for col in REQUIRED_COLS:
+                values = np.asarray(self.store.column(col)[picked], dtype=float)
+                series[col] = {'min': values, 'max': values, 'mean': values}
+            x = self._format_x(self.times[i0:i1] if self.times is not None else None, rows)
+            return self._payload(0, 1, i0, i1, x, series)
+
+        levels = self.meta['levels']
+        chosen = next((info for info in levels if -(-span // info['bucket_rows']) <= width), levels[-1])
+        size = chosen['bucket_rows']
+        b0, b1 = i0 // size, -(-i1 // size)
+        level = self.level(chosen['level'])[b0:b1]
+        series = {}
+        for col in REQUIRED_COLS:
+            counts = np.asarray(level[f"{col}_count"])
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = np.where(counts > 0, level[f"{col}_sum"] / counts, np.nan)
+            series[col] = {'min': np.asarray(level[f"{col}_min"]), 'max': np.asarray(level[f"{col}_max"]), 'mean': mean}
+        first_rows = np.arange(b0, b1) * size
+        x = self._format_x(self.times[first_rows] if self.times is not None else None, first_rows)
+        return self._payload(chosen['level'], size, i0, i1, x, series)
+
+    def _payload(self, level, bucket_rows, i0, i1, x, series):
+        def clean(values):
+            return [None if np.isnan(v) else round(float(v), 4) for v in values]
+        return {
+            'level': level,
+            'bucket_rows': bucket_rows,
+            'start_row': i0,
+            'end_row': i1,
+            'x': x,
+            'series': {col: {stat: clean(vals) for stat, vals in stats.items()} for col, stats in series.items()},
+        }
@@ -0,0 +1,74 @@
+import numpy as np
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    # Optional: much faster JSON encoding (pip install orjson)
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # Optional: binary responses (pip install msgpack)
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# msgpack extension type for NumPy arrays: 3-byte dtype string (e.g. b'<f8') + raw little-endian bytes
+NDARRAY_EXT = 1
+
+
+class NumpyJSONEncoder(JSONEncoder):
+    # Arrays from columnar payloads; NaN gaps become null so the output stays strict JSON
+    def default(self, obj):
+        if isinstance(obj, np.ndarray):
+            if obj.dtype.kind == 'f':
+                return [None if np.isnan(v) else v for v in obj.tolist()]
+            return obj.tolist()
+        return super().default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Same output as DRF's JSONRenderer, encoded with orjson when it is installed.
+    Indented (browsable/?indent) responses still go through the standard encoder.
+    """
+
+    encoder_class = NumpyJSONEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(data, default=NumpyJSONEncoder().default,
+                           option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        # Escaped like DRF does, so the output is also safe inside <script> tags
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+def _pack_default(obj):
+    if isinstance(obj, np.ndarray) and obj.dtype.kind in 'biuf' and obj.dtype.itemsize <= 8:
+        array = np.ascontiguousarray(obj, dtype=obj.dtype.newbyteorder('<'))
+        return msgpack.ExtType(NDARRAY_EXT, array.dtype.str.encode() + array.tobytes())
+    if isinstance(obj, np.generic):
+        return obj.item()
+    # Dates, UUIDs, Decimals, other arrays: the same as in JSON
+    return JSONEncoder().default(obj)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    application/msgpack. Numeric NumPy arrays (the columns of ?shape=columns
+    payloads) are packed as NDARRAY_EXT, so clients read them with one
+    np.frombuffer instead of parsing numbers. Listed in the renderer classes
+    only when msgpack is installed.
+    """
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_pack_default, use_bin_type=True)
@@ -0,0 +1,153 @@
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from . import metrics
+from .cache import evict
+from .models import AnalysisCache, ProcessingJob, UploadBatch, UploadedFile
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Quotas: the oldest uploads go once any of them is exceeded
+    'MAX_FILES': 1000,
+    'MAX_BYTES': 10 * 1024 ** 3,            # uploaded CSVs (column stores come and go with them)
+    'MAX_AGE_SECONDS': 90 * 24 * 3600,
+    # Uploads younger than this are never removed (still being analysed or looked at)
+    'MIN_AGE_SECONDS': 600,
+    # Uploads start a background sweep at most this often
+    'INTERVAL_SECONDS': 300,
+    'BATCH_SIZE': 500,
+}
+
+_lock = threading.Lock()
+_last_started = None
+_thread = None
+
+
+def retention_setting(name):
+    return getattr(settings, 'RETENTION', {}).get(name, DEFAULTS[name])
+
+
+def expired_uploads(now=None):
+    """Ids of uploads over the count, byte or age quota, oldest first."""
+    now = now or timezone.now()
+    max_files = retention_setting('MAX_FILES')
+    max_bytes = retention_setting('MAX_BYTES')
+    too_old = now - timedelta(seconds=retention_setting('MAX_AGE_SECONDS'))
+    protected = now - timedelta(seconds=retention_setting('MIN_AGE_SECONDS'))
+    busy = set(ProcessingJob.objects.filter(status__in=(ProcessingJob.QUEUED, ProcessingJob.RUNNING))
+               .values_list('upload_id', flat=True))
+
+    # Newest first: everything past the quotas (counted cumulatively) is over
+    expired = []
+    count = total = 0
+    rows = UploadedFile.objects.order_by('-uploaded_at', '-pk').values_list('pk', 'size_bytes', 'uploaded_at')
+    for pk, size, uploaded_at in rows.iterator():
+        count += 1
+        total += size
+        over = count > max_files or total > max_bytes or uploaded_at < too_old
+        if over and uploaded_at < protected and pk not in busy:
+            expired.append(pk)
+    expired.reverse()
+    return expired
+
+
+def _remove_derived(digests, pks):
+    """Column stores (with their pyramids) and cached results no remaining upload refers to."""
+    digests = set(digests) - {''}
+    digests -= set(UploadedFile.objects.filter(sha256__in=digests).values_list('sha256', flat=True))
+    AnalysisCache.objects.filter(sha256__in=digests).delete()
+    root = os.path.join(settings.MEDIA_ROOT, 'columnar')
+    for name in [*digests, *(f'file-{pk}' for pk in pks)]:
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None  # published or removed meanwhile
+
+
+def _remove_orphans():
+    # Column stores without an upload, and temporary directories left by crashed uploads or
+    # jobs. Live writers touch their directory as they go, so only abandoned ones look old
+    root = os.path.join(settings.MEDIA_ROOT, 'columnar')
+    if not os.path.isdir(root):
+        return
+    grace = time.time() - retention_setting('MIN_AGE_SECONDS')
+    names = [entry.name for entry in os.scandir(root)]
+    names = [name for name in names if (_mtime(os.path.join(root, name)) or grace) < grace]
+    referenced = set(UploadedFile.objects.filter(sha256__in=names).values_list('sha256', flat=True))
+    pks = {f'file-{pk}' for pk in UploadedFile.objects.filter(sha256='').values_list('pk', flat=True)}
+    for name in names:
+        path = os.path.join(root, name)
+        # Checked again right before removing: a writer may have touched it since the scan
+        if name not in referenced and name not in pks and (_mtime(path) or grace) < grace:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def sweep(now=None):
+    """
+    Applies the retention quotas once. Uploads are deleted in bulk, BATCH_SIZE
+    at a time (their analyses and jobs cascade), then their files, and then
+    the column stores and cache entries of content no upload refers to any
+    more. Also runs the analysis cache's own eviction. Returns
+    {'files': deleted uploads, 'bytes': CSV bytes freed}.
+    """
+    expired = expired_uploads(now)
+    storage = UploadedFile._meta.get_field('file').storage
+    batch_size = retention_setting('BATCH_SIZE')
+    files = freed = 0
+    for i in range(0, len(expired), batch_size):
+        batch = expired[i:i + batch_size]
+        rows = list(UploadedFile.objects.filter(pk__in=batch).values_list('pk', 'file', 'sha256', 'size_bytes'))
+        UploadedFile.objects.filter(pk__in=batch).delete()
+        for pk, name, digest, size in rows:
+            if name:
+                storage.delete(name)
+        _remove_derived([row[2] for row in rows], [row[0] for row in rows if not row[2]])
+        files += len(rows)
+        freed += sum(row[3] for row in rows)
+
+    UploadBatch.objects.filter(files__isnull=True).delete()
+    evict()
+    _remove_orphans()
+    metrics.retention_files.inc(files)
+    metrics.retention_bytes.inc(freed)
+    return {'files': files, 'bytes': freed}
+
+
+def _run_in_background():
+    try:
+        sweep()
+    except Exception:
+        # Nobody waits on this thread, so failures only show up in the log
+        logger.exception("Retention sweep failed")
+    finally:
+        # This thread's own DB connection
+        connection.close()
+
+
+def schedule():
+    """
+    Starts a sweep in a background thread unless one is running or the last
+    one started less than INTERVAL_SECONDS ago. Returns at once, so uploads
+    never wait for cleanup.
+    """
+    global _last_started, _thread
+    with _lock:
+        now = time.monotonic()
+        if _thread is not None and _thread.is_alive():
+            return
+        if _last_started is not None and now - _last_started < retention_setting('INTERVAL_SECONDS'):
+            return
+        _last_started = now
+        _thread = threading.Thread(target=_run_in_background, name='retention-sweeper', daemon=True)
+        _thread.start()
@@ -0,0 +1,100 @@
+import os
+import uuid
+import numpy as np
+from .payloads import frame_to_columns
+
+# Sort permutations live next to the column store they index (removed with it)
+SORT_DIR = 'sort'
+MAX_PAGE_ROWS = 10_000
+NAT = np.iinfo(np.int64).min
+
+
+def _sort_keys(store, column):
+    # Values whose ascending order is the column's order; missing values sort last
+    raw = store.column(column)
+    kind = store.kind(column)
+    if kind == 'float':
+        return raw  # NaN already sorts last
+    if kind == 'datetime':
+        return np.where(raw == NAT, np.iinfo(np.int64).max, raw)
+    # Categories: codes are in order of first appearance, so rank the labels
+    labels = store.meta['categories'][column]
+    ranks = np.empty(len(labels) + 1, dtype=np.int32)
+    ranks[np.argsort(np.array(labels, dtype=str), kind='stable')] = np.arange(len(labels))
+    ranks[-1] = len(labels)  # code -1 (missing)
+    return ranks[raw]
+
+
+def _is_missing(store, column, values):
+    kind = store.kind(column)
+    if kind == 'float':
+        return np.isnan(values)
+    return values == (NAT if kind == 'datetime' else -1)
+
+
+def sort_order(store, column):
+    """
+    Row positions that put `column` in ascending order (stable, missing values
+    last). Built with one argsort the first time a column is sorted on, then
+    saved under sort/ and memory-mapped by later requests.
+    """
+    path = os.path.join(store.path, SORT_DIR, os.path.splitext(store.specs[column]['file'])[0] + '.npy')
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        order = np.argsort(_sort_keys(store, column), kind='stable')
+        # Unique per call: threads of one worker may sort the same column at once
+        tmp = f"{path}.tmp-{uuid.uuid4().hex}.npy"
+        try:
+            np.save(tmp, order)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+    return np.load(path, mmap_mode='r')
+
+
+def _present_rows(store, column, order):
+    # Missing values are all at the end of `order`: binary search for where they start
+    raw = store.column(column)
+    lo, hi = 0, len(order)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _is_missing(store, column, raw[order[mid]]):
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+def row_positions(store, offset, limit, sort=None, descending=False):
+    """Positions (into the stored file order) of rows [offset, offset + limit) of the sorted view."""
+    stop = min(offset + limit, store.rows)
+    if offset >= stop:
+        return np.empty(0, dtype=np.int64)
+    if sort is None:
+        if descending:
+            return np.arange(store.rows - 1 - offset, store.rows - 1 - stop, -1)
+        return np.arange(offset, stop)
+    order = sort_order(store, sort)
+    if not descending:
+        return np.asarray(order[offset:stop])
+    # Descending: present values reversed, missing values still last
+    present = _present_rows(store, sort, order)
+    view = np.arange(offset, stop)
+    index = np.where(view < present, present - 1 - view, view)
+    return np.asarray(order[index])
+
+
+def page(store, offset=0, limit=100, sort=None, descending=False, shape='records'):
+    """
+    One page of decoded rows. Only the requested rows are read from the
+    memory-mapped columns, so a page costs the same at any offset and for any
+    file size. "row" holds each row's position in the file.
+    """
+    positions = row_positions(store, offset, limit, sort, descending)
+    frame = store.take(positions)
+    if shape == 'columns':
+        return {"total": store.rows, "columns": store.columns, "row": positions, "rows": frame_to_columns(frame)}
+    records = frame.astype(object).where(frame.notna(), None).to_dict(orient='records')
+    return {"total": store.rows, "columns": store.columns, "row": positions.tolist(), "rows": records}
@@ -0,0 +1,14 @@
+# Column names shared by the CSV readers, the streaming engine and the column store
+REQUIRED_COLS = ['Flowrate', 'Pressure', 'Temperature']
+TIME_COLS = ['Time', 'Timestamp', 'Date', 'Hour']
+# Categorical columns that stats and anomalies are broken down by (most specific first)
+GROUP_COLS = ['Equipment Name', 'Type']
+
+
+def normalize_columns(columns):
+    # Clean headers: " Flowrate " -> "Flowrate"
+    return [c.strip().title() for c in columns]
+
+
+def find_time_col(columns):
+    return next((col for col in columns if col in TIME_COLS), None)
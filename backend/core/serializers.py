@@ -1,7 +1,47 @@
 from rest_framework import serializers
-from .models import UploadedFile
+from .models import UploadedFile, ProcessingJob
 
 class FileUploadSerializer(serializers.ModelSerializer):
     class Meta:
         model = UploadedFile
-        fields = ['file', 'uploaded_at']
\ No newline at end of file
+        fields = ['file', 'uploaded_at']
+
+class HistorySerializer(serializers.ModelSerializer):
+    # Everything here comes from the stored AnalysisResult, never from the CSV
+    file_name = serializers.CharField(read_only=True)
+    total_count = serializers.IntegerField(source='analysis.total_count', read_only=True, default=None)
+    avg_flowrate = serializers.FloatField(source='analysis.avg_flowrate', read_only=True, default=None)
+    avg_pressure = serializers.FloatField(source='analysis.avg_pressure', read_only=True, default=None)
+    avg_temperature = serializers.FloatField(source='analysis.avg_temperature', read_only=True, default=None)
+    anomaly_count = serializers.IntegerField(source='analysis.anomaly_count', read_only=True, default=None)
+
+    class Meta:
+        model = UploadedFile
+        fields = ['id', 'file', 'file_name', 'uploaded_at', 'total_count',
+                  'avg_flowrate', 'avg_pressure', 'avg_temperature', 'anomaly_count']
+
+class HistoryDetailSerializer(HistorySerializer):
+    time_col = serializers.CharField(source='analysis.time_col', read_only=True, default=None)
+    stats = serializers.JSONField(source='analysis.stats', read_only=True, default=None)
+    correlation = serializers.JSONField(source='analysis.correlation', read_only=True, default=None)
+    distribution = serializers.JSONField(source='analysis.distribution', read_only=True, default=None)
+    groups = serializers.JSONField(source='analysis.groups', read_only=True, default=None)
+    histograms = serializers.SerializerMethodField()
+
+    class Meta(HistorySerializer.Meta):
+        fields = HistorySerializer.Meta.fields + ['time_col', 'stats', 'correlation', 'distribution',
+                                                  'groups', 'histograms']
+
+    def get_histograms(self, obj):
+        analysis = getattr(obj, 'analysis', None)
+        sketches = analysis.column_sketches() if analysis else None
+        return sketches.histogram_json() if sketches else None
+
+class JobSerializer(serializers.ModelSerializer):
+    job_id = serializers.UUIDField(source='id', read_only=True)
+    file_id = serializers.IntegerField(source='upload_id', read_only=True)
+
+    class Meta:
+        model = ProcessingJob
+        fields = ['job_id', 'file_id', 'status', 'progress', 'error', 'result', 'timings',
+                  'created_at', 'started_at', 'finished_at']
@@ -0,0 +1,229 @@
+import base64
+import numpy as np
+from .schema import REQUIRED_COLS
+
+# Quantiles reported next to avg/std/min/max in the stats block
+QUANTILES = {'p50': 0.5, 'p90': 0.9, 'p99': 0.99}
+HISTOGRAM_BINS = 64
+# Persisted sketches are compacted to this size (about 0.2% rank error, a few KB per column)
+STORED_K = 1024
+
+
+def _pack(values):
+    return base64.b64encode(np.asarray(values, dtype='<f8').tobytes()).decode('ascii')
+
+
+def _unpack(text):
+    return np.frombuffer(base64.b64decode(text), dtype='<f8').copy()
+
+
+class QuantileSketch:
+    """
+    Compact KLL-style quantile sketch. Values are exact until `k` items have been
+    seen; after that, memory stays at O(k log n) with rank error of roughly 1.7/k.
+    """
+
+    def __init__(self, k=4096, seed=0):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        self.n += other.n
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self._compress()
+
+    def _capacity(self, h):
+        depth = len(self.levels) - h - 1
+        return max(2, int(np.ceil(self.k * (2.0 / 3.0) ** depth)))
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            items = self.levels[h]
+            if len(items) > self._capacity(h):
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # Odd leftovers stay behind so total weight is preserved exactly
+                keep = items[-1:] if len(items) % 2 else items[:0]
+                pairs = items[:len(items) - len(keep)]
+                offset = int(self._rng.integers(2))
+                self.levels[h] = keep
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], pairs[offset::2]])
+            h += 1
+
+    @property
+    def is_exact(self):
+        return len(self.levels) == 1
+
+    def quantile(self, q):
+        if self.n == 0:
+            return np.nan
+        if self.is_exact:
+            return float(np.quantile(self.levels[0], q))
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2 ** h) for h, items in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        target = q * cumulative[-1]
+        idx = min(int(np.searchsorted(cumulative, target)), len(order) - 1)
+        return float(values[order][idx])
+
+    def median(self):
+        return self.quantile(0.5)
+
+    def to_dict(self, k=STORED_K):
+        # Shrinks to `k` first so stored sketches stay small; levels are base64 float64
+        sketch = self
+        if k < self.k:
+            sketch = QuantileSketch(k)
+            sketch.merge(self)
+        return {'k': sketch.k, 'n': sketch.n, 'levels': [_pack(items) for items in sketch.levels]}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['k'])
+        sketch.n = data['n']
+        sketch.levels = [_unpack(items) for items in data['levels']] or [np.empty(0)]
+        return sketch
+
+
+class Histogram:
+    """
+    Fixed-bin histogram whose bin width is always a power of two and whose
+    edges sit on multiples of that width. Two histograms can therefore be merged
+    exactly: the finer one is coarsened (pairs of bins summed) to the wider
+    width, and both are coarsened again while the union spans more than `bins`.
+    """
+
+    def __init__(self, bins=HISTOGRAM_BINS):
+        self.bins = bins
+        self.exp = None                       # bin width is 2 ** exp
+        self.start = 0                        # bin index of counts[0], in units of the width
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    @property
+    def n(self):
+        return int(self.counts.sum())
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return
+        lo, hi = values.min(), values.max()
+        exp = self.exp
+        if exp is None:
+            span = hi - lo
+            scale = span / self.bins if span > 0 else (abs(lo) or 1.0) / self.bins
+            exp = int(np.ceil(np.log2(scale)))
+        while np.floor(hi / 2.0 ** exp) - np.floor(lo / 2.0 ** exp) >= self.bins:
+            exp += 1
+        idx = np.floor(values / 2.0 ** exp).astype(np.int64)
+        other = Histogram(self.bins)
+        other.exp, other.start = exp, int(idx.min())
+        other.counts = np.bincount(idx - other.start).astype(np.int64)
+        self.merge(other)
+
+    def _coarsen(self, steps):
+        # Every step doubles the width: index i -> i // 2 (>> floors negatives too)
+        if steps <= 0:
+            return
+        idx = (np.arange(len(self.counts), dtype=np.int64) + self.start) >> steps
+        self.start = int(idx[0])
+        self.counts = np.bincount(idx - self.start, weights=self.counts).astype(np.int64)
+        self.exp += steps
+
+    def merge(self, other):
+        if other.exp is None or len(other.counts) == 0:
+            return
+        if self.exp is None or len(self.counts) == 0:
+            self.exp, self.start, self.counts = other.exp, other.start, other.counts.copy()
+            return
+        other = Histogram.from_dict(other.to_dict())
+        exp = max(self.exp, other.exp)
+        self._coarsen(exp - self.exp)
+        other._coarsen(exp - other.exp)
+        while True:
+            lo = min(self.start, other.start)
+            hi = max(self.start + len(self.counts), other.start + len(other.counts))
+            if hi - lo <= self.bins:
+                break
+            self._coarsen(1)
+            other._coarsen(1)
+        counts = np.zeros(hi - lo, dtype=np.int64)
+        counts[self.start - lo:self.start - lo + len(self.counts)] += self.counts
+        counts[other.start - lo:other.start - lo + len(other.counts)] += other.counts
+        self.start, self.counts = lo, counts
+
+    def edges(self):
+        if self.exp is None:
+            return []
+        width = 2.0 ** self.exp
+        return [(self.start + i) * width for i in range(len(self.counts) + 1)]
+
+    def to_json(self):
+        # Chart-ready form: len(edges) == len(counts) + 1
+        return {'edges': [round(e, 6) for e in self.edges()], 'counts': self.counts.tolist()}
+
+    def to_dict(self):
+        return {'bins': self.bins, 'exp': self.exp, 'start': self.start, 'counts': self.counts.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        hist = cls(data['bins'])
+        hist.exp, hist.start = data['exp'], data['start']
+        hist.counts = np.asarray(data['counts'], dtype=np.int64)
+        return hist
+
+
+class ColumnSketches:
+    """Quantile sketch + histogram for each process parameter."""
+
+    def __init__(self):
+        self.quantiles = {col: QuantileSketch() for col in REQUIRED_COLS}
+        self.histograms = {col: Histogram() for col in REQUIRED_COLS}
+
+    def update(self, col, values):
+        self.quantiles[col].update(values)
+        self.histograms[col].update(values)
+
+    def merge(self, other):
+        for col in REQUIRED_COLS:
+            self.quantiles[col].merge(other.quantiles[col])
+            self.histograms[col].merge(other.histograms[col])
+
+    def percentiles(self, col, decimals=2):
+        sketch = self.quantiles[col]
+        # None (not NaN) for an empty column so the values stay valid JSON
+        return {name: round(sketch.quantile(q), decimals) if sketch.n else None for name, q in QUANTILES.items()}
+
+    def histogram_json(self):
+        return {col: self.histograms[col].to_json() for col in REQUIRED_COLS}
+
+    def to_dict(self):
+        return {col: {'quantiles': self.quantiles[col].to_dict(), 'histogram': self.histograms[col].to_dict()}
+                for col in REQUIRED_COLS}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketches = cls()
+        for col in REQUIRED_COLS:
+            sketches.quantiles[col] = QuantileSketch.from_dict(data[col]['quantiles'])
+            sketches.histograms[col] = Histogram.from_dict(data[col]['histogram'])
+        return sketches
+
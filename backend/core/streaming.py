@@ -0,0 +1,489 @@
+import os
+import numpy as np
+import pandas as pd
+from .anomalies import store_anomalies
+from .columnar import ColumnStore, ColumnStoreWriter
+from .downsample import chart_from_store
+from .groups import GroupStats
+from .parsing import IncrementalCsvReader, iter_csv_typed, plan
+from .pyramid import Pyramid, build_pyramid
+from .schema import GROUP_COLS, REQUIRED_COLS, TIME_COLS, normalize_columns, find_time_col
+from .sketches import QUANTILES, ColumnSketches
+from .timing import Timings, stage, timed
+
+# Files above this size are analysed chunk by chunk instead of loaded whole
+STREAMING_THRESHOLD_BYTES = 64 * 1024 * 1024
+CHUNK_ROWS = 100_000
+# Without a column store, streaming keeps at most this many chart rows (stride doubles beyond it)
+MAX_CHART_POINTS = 10_000
+
+
+class RunningMoments:
+    """Count/mean/variance/min/max of one column, merged chunk by chunk (Chan/Welford)."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.nan
+        self.max = np.nan
+
+    def update(self, values):
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        other = RunningMoments()
+        other.n = len(values)
+        other.mean = float(values.mean())
+        other.m2 = float(((values - other.mean) ** 2).sum())
+        other.min = float(values.min())
+        other.max = float(values.max())
+        self.merge(other)
+
+    def merge(self, other):
+        if other.n == 0:
+            return
+        if self.n == 0:
+            self.n, self.mean, self.m2 = other.n, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def std(self):
+        # Sample standard deviation (ddof=1), same as pandas
+        return np.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else np.nan
+
+    @property
+    def sum(self):
+        return self.n * self.mean
+
+    def to_dict(self):
+        # mean/m2 rather than sum/sum-of-squares: same information, no cancellation on merge
+        return {'n': self.n, 'mean': self.mean, 'm2': self.m2, 'min': self.min, 'max': self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        m = cls()
+        m.n, m.mean, m.m2 = data['n'], data['mean'], data['m2']
+        m.min = np.nan if data['min'] is None else data['min']
+        m.max = np.nan if data['max'] is None else data['max']
+        return m
+
+
+class CoMoments:
+    """Pairwise co-moments over rows where both columns are present, like DataFrame.corr()."""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.pairs = {}
+        for i, a in enumerate(self.columns):
+            for b in self.columns[i:]:
+                self.pairs[(a, b)] = [0, 0.0, 0.0, 0.0, 0.0, 0.0]  # n, mean_a, mean_b, m2_a, m2_b, c_ab
+
+    def update(self, frame):
+        arrays = {col: frame[col].to_numpy(dtype=float) for col in self.columns}
+        for (a, b), acc in self.pairs.items():
+            mask = ~(np.isnan(arrays[a]) | np.isnan(arrays[b]))
+            x, y = arrays[a][mask], arrays[b][mask]
+            if len(x) == 0:
+                continue
+            mx, my = x.mean(), y.mean()
+            dx, dy = x - mx, y - my
+            self._merge(acc, [len(x), mx, my, (dx * dx).sum(), (dy * dy).sum(), (dx * dy).sum()])
+
+    def merge(self, other):
+        for key, acc in self.pairs.items():
+            self._merge(acc, other.pairs[key])
+
+    @staticmethod
+    def _merge(acc, other):
+        n_a, n_b = acc[0], other[0]
+        if n_b == 0:
+            return
+        n = n_a + n_b
+        d_x = other[1] - acc[1]
+        d_y = other[2] - acc[2]
+        acc[5] += other[5] + d_x * d_y * n_a * n_b / n
+        acc[3] += other[3] + d_x * d_x * n_a * n_b / n
+        acc[4] += other[4] + d_y * d_y * n_a * n_b / n
+        acc[1] += d_x * n_b / n
+        acc[2] += d_y * n_b / n
+        acc[0] = n
+
+    def corr(self, a, b):
+        key = (a, b) if (a, b) in self.pairs else (b, a)
+        n, _, _, m2_a, m2_b, c_ab = self.pairs[key]
+        if n < 2 or m2_a <= 0 or m2_b <= 0:
+            return np.nan
+        return float(np.clip(c_ab / np.sqrt(m2_a * m2_b), -1.0, 1.0))
+
+    def correlation(self, decimals=2):
+        # Same nesting as DataFrame.corr().round(2).to_dict(): {column: {row: value}}
+        return {
+            b: {a: round(self.corr(a, b), decimals) for a in self.columns}
+            for b in self.columns
+        }
+
+    def to_dict(self):
+        return {'columns': self.columns, 'pairs': [[a, b, *acc] for (a, b), acc in self.pairs.items()]}
+
+    @classmethod
+    def from_dict(cls, data):
+        comoments = cls(data['columns'])
+        for a, b, *acc in data['pairs']:
+            comoments.pairs[(a, b)] = list(acc)
+        return comoments
+
+
+def partial_aggregates(moments, comoments):
+    # Mergeable per-upload state, stored on AnalysisResult.partials (see aggregates.py)
+    return {
+        'moments': {col: m.to_dict() for col, m in moments.items()},
+        'comoments': comoments.to_dict(),
+    }
+
+
+class ChartSampler:
+    """
+    Keeps every `stride`-th row (like df.iloc[::10]). When the sample grows past
+    `max_points` the stride doubles and every other kept row is dropped, so the
+    memory held for charts is bounded whatever the file length.
+    """
+
+    def __init__(self, stride=10, max_points=MAX_CHART_POINTS):
+        self.stride = stride
+        self.max_points = max_points
+        self.frames = []
+        self.positions = []
+        self.size = 0
+
+    def update(self, chunk, offset):
+        first = (-offset) % self.stride
+        sample = chunk.iloc[first::self.stride]
+        if len(sample) == 0:
+            return
+        self.frames.append(sample)
+        self.positions.append(offset + first + self.stride * np.arange(len(sample)))
+        self.size += len(sample)
+        if self.size > self.max_points:
+            self._compact()
+
+    def _compact(self):
+        frame = pd.concat(self.frames)
+        positions = np.concatenate(self.positions)
+        while len(positions) > self.max_points:
+            self.stride *= 2
+            mask = positions % self.stride == 0
+            frame, positions = frame[mask], positions[mask]
+        self.frames, self.positions, self.size = [frame], [positions], len(positions)
+
+    def frame(self):
+        if not self.frames:
+            return pd.DataFrame()
+        return pd.concat(self.frames)
+
+
+class StreamingAnalyzer:
+    """
+    One-pass accumulators behind process_csv_stream. Feed it DataFrame chunks with
+    update() and call result() once the stream is done.
+    """
+
+    def __init__(self, chart_stride=10, max_chart_points=MAX_CHART_POINTS):
+        self.columns = None
+        self.time_col = None
+        self.rows = 0
+        self.moments = {col: RunningMoments() for col in REQUIRED_COLS}
+        self.comoments = CoMoments(REQUIRED_COLS)
+        self.sketches = ColumnSketches()
+        self.type_counts = {}
+        self.groups = {}
+        self.preview = None
+        self.chart = ChartSampler(chart_stride, max_chart_points)
+
+    def _start(self, columns):
+        self.columns = normalize_columns(columns)
+        missing = [col for col in REQUIRED_COLS if col not in self.columns]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+        self.time_col = find_time_col(self.columns)
+        self.groups = {key: GroupStats(key) for key in GROUP_COLS if key in self.columns}
+
+    def update(self, chunk):
+        if self.columns is None:
+            self._start(chunk.columns)
+        chunk.columns = self.columns
+        if self.time_col is None:
+            # If no time, just create a dummy index for plotting
+            chunk['Index'] = np.arange(self.rows + 1, self.rows + len(chunk) + 1)
+
+        for col in REQUIRED_COLS:
+            values = chunk[col].to_numpy(dtype=float)
+            self.moments[col].update(values)
+            self.sketches.update(col, values)
+        self.comoments.update(chunk)
+        for group in self.groups.values():
+            group.update(chunk)
+
+        if 'Type' in chunk.columns:
+            for key, count in chunk['Type'].value_counts().items():
+                self.type_counts[key] = self.type_counts.get(key, 0) + int(count)
+
+        self._update_preview(chunk)
+        self.chart.update(chunk, self.rows)
+        self.rows += len(chunk)
+
+    def _update_preview(self, chunk):
+        if self.time_col is None:
+            if self.preview is None:
+                self.preview = chunk.head(5)
+            elif len(self.preview) < 5:
+                self.preview = pd.concat([self.preview, chunk.head(5)]).head(5)
+            return
+        # Earliest five rows by time; skip chunks that cannot change the preview
+        if self.preview is not None and len(self.preview) == 5:
+            if not chunk[self.time_col].min() < self.preview[self.time_col].max():
+                return
+        merged = chunk if self.preview is None else pd.concat([self.preview, chunk])
+        self.preview = merged.sort_values(by=self.time_col, kind='stable').head(5)
+
+    def stats(self):
+        stats = {}
+        for col in REQUIRED_COLS:
+            m = self.moments[col]
+            stats[col] = {
+                'avg': round(m.mean if m.n else np.nan, 2),
+                'std': round(m.std, 2),
+                'min': round(m.min, 2),
+                'max': round(m.max, 2),
+                'median': round(self.sketches.quantiles[col].median(), 2),
+                **self.sketches.percentiles(col)
+            }
+        return stats
+
+    def result(self, anomaly_count, chart_data=None, anomalies=None):
+        if chart_data is None:
+            chart = self.chart.frame()
+            if self.time_col and len(chart):
+                chart = chart.sort_values(by=self.time_col, kind='stable')
+            chart_data = chart.replace({np.nan: None}).to_dict(orient='records')
+        preview = self.preview if self.preview is not None else pd.DataFrame()
+        distribution = dict(sorted(self.type_counts.items(), key=lambda kv: kv[1], reverse=True))
+        return {
+            "success": True,
+            "total_count": self.rows,
+            "stats": self.stats(),
+            "correlation": self.comoments.correlation(),
+            "distribution": distribution,
+            "preview": preview.replace({np.nan: None}).to_dict(orient='records'),
+            "anomaly_count": anomaly_count,
+            "anomalies": anomalies,
+            "groups": {key: group.result(anomalies) for key, group in self.groups.items()},
+            "chart_data": chart_data,
+            "time_col": self.time_col or 'Index',
+            "histograms": self.sketches.histogram_json(),
+            "sketches": self.sketches.to_dict(),
+            "partials": partial_aggregates(self.moments, self.comoments)
+        }
+
+
+def pressure_limit(stats):
+    # "Critical" if value is > Mean + 2 Standard Deviations
+    return stats['Pressure']['avg'] + (2 * stats['Pressure']['std'])
+
+
+def read_chunks(file_path, chunksize=CHUNK_ROWS, progress=None, span=(0.0, 1.0), columns=None):
+    """
+    Yields DataFrame chunks parsed with the declared schema (see parsing.py),
+    limited to `columns` if given. If `progress` is given it is called with the
+    fraction of bytes consumed, scaled into `span`.
+    """
+    size = os.path.getsize(file_path) or 1
+    start, end = span
+    kinds = plan(file_path, columns)
+    with open(file_path, 'rb') as handle:
+        chunks = iter_csv_typed(handle, kinds, chunksize) if kinds else pd.read_csv(handle, chunksize=chunksize)
+        for chunk in chunks:
+            yield chunk
+            if progress:
+                progress(start + (end - start) * min(handle.tell() / size, 1.0))
+
+
+def count_anomalies(file_path, limit, chunksize=CHUNK_ROWS, progress=None, span=(0.0, 1.0), groups=None):
+    # Second, narrow pass: only Pressure (and any group columns) are parsed
+    count = 0
+    groups = groups or {}
+    for chunk in read_chunks(file_path, chunksize, progress, span, columns=['Pressure', *groups]):
+        mask = chunk['Pressure'].to_numpy(dtype=float) > limit
+        count += int(mask.sum())
+        for group in groups.values():
+            group.add_anomalies(chunk[group.key], mask)
+    return count
+
+
+def count_anomalies_in_store(store, limit, chunksize=CHUNK_ROWS, groups=None):
+    # Same check against the memory-mapped Pressure column: no text parsing at all
+    pressure = store.column('Pressure')
+    count = 0
+    for i in range(0, len(pressure), chunksize):
+        mask = pressure[i:i + chunksize] > limit
+        count += int(mask.sum())
+        for group in (groups or {}).values():
+            # Only the flagged rows' labels are decoded
+            labels = store.decode(group.key, store.column(group.key)[i:i + chunksize][mask])
+            group.add_anomalies(pd.Series(labels), np.ones(len(labels), dtype=bool))
+    return count
+
+
+def _store_result(analyzer, store, limit, chunksize):
+    # Threshold count, chart and rolling anomalies straight from the column store.
+    # The zoom pyramid is built first: the chart and anomaly passes read its time
+    # order, and the series endpoint then never has to build it inside a request
+    with stage('pyramid'):
+        if Pyramid.open(store) is None:
+            build_pyramid(store)
+    with stage('threshold'):
+        anomaly_count = count_anomalies_in_store(store, limit, chunksize, analyzer.groups)
+    with stage('chart'):
+        chart_data = chart_from_store(store)
+    with stage('anomalies'):
+        anomalies = store_anomalies(store)
+    with stage('serialize'):
+        return analyzer.result(anomaly_count, chart_data, anomalies)
+
+
+def process_csv_stream(file_path, chunksize=CHUNK_ROWS, progress=None, store_dir=None):
+    """
+    Bounded-memory twin of process_csv_data: reads the CSV in `chunksize` rows
+    at a time and returns the same result structure. The median comes from a
+    quantile sketch (exact for small files) and chart_data is capped at
+    MAX_CHART_POINTS rows. Time-sorted output assumes the export is already in
+    time order, which historian exports are.
+
+    With `store_dir`, the same scan also writes a column store there; the
+    anomaly pass and the LTTB chart then read it instead of the CSV.
+    """
+    writer = ColumnStoreWriter(store_dir) if store_dir else None
+    try:
+        analyzer = StreamingAnalyzer()
+        for chunk in timed(read_chunks(file_path, chunksize, progress, span=(0.0, 0.9)), 'parse'):
+            with stage('stats'):
+                analyzer.update(chunk)
+            if writer:
+                with stage('store'):
+                    writer.append(chunk)
+        if analyzer.columns is None:
+            raise ValueError("CSV file is empty")
+
+        limit = pressure_limit(analyzer.stats())
+        if writer:
+            with stage('store'):
+                writer.close()
+                store = ColumnStore(store_dir)
+            return _store_result(analyzer, store, limit, chunksize)
+        with stage('threshold'):
+            anomaly_count = count_anomalies(file_path, limit, chunksize, progress, span=(0.9, 1.0),
+                                            groups=analyzer.groups)
+        with stage('serialize'):
+            return analyzer.result(anomaly_count)
+
+    except Exception as e:
+        if writer:
+            writer.abort()
+        return {"success": False, "error": str(e)}
+
+
+class IncrementalAnalysis:
+    """
+    process_csv_stream for bytes that arrive piece by piece (an upload in
+    flight): feed() each piece as it comes and call finish() after the last.
+    Parsing, statistics and the column store all keep up with the data, so
+    finish() only has the store-side passes left. The store is written under
+    `tmp_dir` and published at the path given to finish(), since stores are
+    named by content hash and that is only known at the end. close() instead
+    publishes the store alone, for a job to analyse.
+
+    Stages are timed into `timings` (not the request's), so they describe the
+    analysis on its own.
+    """
+
+    def __init__(self, tmp_dir):
+        self.reader = IncrementalCsvReader()
+        self.analyzer = StreamingAnalyzer()
+        self.writer = ColumnStoreWriter(tmp_dir)
+        self.timings = Timings()
+
+    def feed(self, data):
+        with self.timings.activate():
+            with stage('parse'):
+                chunks = self.reader.feed(data)
+            self._update(chunks)
+        # Slow clients can go a long time without completing a chunk
+        self.writer.touch()
+
+    def _update(self, chunks):
+        for chunk in chunks:
+            with stage('stats'):
+                self.analyzer.update(chunk)
+            with stage('store'):
+                self.writer.append(chunk)
+
+    def close(self, store_dir):
+        """Parses the rest and publishes the column store at `store_dir`. Raises if the file is unusable."""
+        with self.timings.activate():
+            with stage('parse'):
+                chunks = self.reader.close()
+            self._update(chunks)
+            if self.analyzer.columns is None:
+                raise ValueError("CSV file is empty")
+            with stage('store'):
+                self.writer.close(store_dir)
+                return ColumnStore(store_dir)
+
+    def finish(self, store_dir):
+        try:
+            store = self.close(store_dir)
+            with self.timings.activate():
+                result = _store_result(self.analyzer, store, pressure_limit(self.analyzer.stats()), CHUNK_ROWS)
+                if store.nbytes <= STREAMING_THRESHOLD_BYTES:
+                    # Small enough for the exact median/percentiles the in-memory engine reports
+                    with stage('stats'):
+                        for col, stats in result['stats'].items():
+                            values = pd.Series(store.column(col))
+                            stats['median'] = round(values.median(), 2)
+                            for name, q in QUANTILES.items():
+                                stats[name] = round(values.quantile(q), 2)
+            return result
+        except Exception as e:
+            self.writer.abort()
+            return {"success": False, "error": str(e)}
+
+    def abort(self):
+        self.writer.abort()
+
+
+def process_store_stream(store, chunksize=CHUNK_ROWS, progress=None):
+    # process_csv_stream over an existing column store
+    try:
+        analyzer = StreamingAnalyzer()
+        frames = timed(store.iter_frames(chunksize), 'read')
+        for start, chunk in zip(range(0, store.rows, chunksize), frames):
+            with stage('stats'):
+                analyzer.update(chunk)
+            if progress:
+                progress(min((start + chunksize) / store.rows, 1.0))
+        return _store_result(analyzer, store, pressure_limit(analyzer.stats()), chunksize)
+
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+def should_stream(file_path):
+    return os.path.getsize(file_path) > STREAMING_THRESHOLD_BYTES
@@ -0,0 +1,53 @@
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from core.columnar import ColumnStore, ColumnStoreWriter
+
+
+def equipment_frame(rows=5000, seed=7, shuffled=True):
+    # Plant export: three machines, two types, a few gaps, timestamps out of order
+    rng = np.random.default_rng(seed)
+    minutes = rng.permutation(rows) if shuffled else np.arange(rows)
+    df = pd.DataFrame({
+        'Equipment Name': rng.choice(['Pump-1', 'Pump-2', 'Valve-1'], rows),
+        'Type': rng.choice(['Pump', 'Valve'], rows),
+        'Flowrate': rng.normal(100, 10, rows).round(2),
+        'Pressure': rng.normal(5, 1, rows).round(2),
+        'Temperature': rng.normal(110, 5, rows).round(2),
+        'Timestamp': (pd.Timestamp('2024-01-01') + pd.to_timedelta(minutes, unit='min')).strftime('%Y-%m-%d %H:%M:%S'),
+    })
+    df.loc[rng.random(rows) < 0.02, 'Pressure'] = np.nan
+    return df
+
+
+def write_store(path, df, chunk_rows=1000):
+    writer = ColumnStoreWriter(path)
+    for start in range(0, len(df), chunk_rows):
+        writer.append(df.iloc[start:start + chunk_rows])
+    writer.close()
+    return ColumnStore.open(path)
+
+
+def csv_file(name, rows=50, seed=7):
+    frame = equipment_frame(rows, seed=seed, shuffled=False)
+    return SimpleUploadedFile(name, frame.to_csv(index=False).encode(), 'text/csv')
+
+
+class TemporaryMediaMixin:
+    """Uploads, column stores and pyramids of the test case go to a fresh MEDIA_ROOT."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp(prefix='core-tests-')
+        cls._media = override_settings(MEDIA_ROOT=cls.media_root)
+        cls._media.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
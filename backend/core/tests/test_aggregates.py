@@ -0,0 +1,50 @@
+from datetime import timedelta
+from unittest import mock
+import pandas as pd
+from django.test import TestCase
+from django.utils import timezone
+from core.aggregates import combine_analyses
+from core.models import AnalysisResult, UploadedFile
+from .support import TemporaryMediaMixin, csv_file, equipment_frame
+
+
+@mock.patch('core.views.schedule_retention')
+class AggregateTests(TemporaryMediaMixin, TestCase):
+    def upload(self, seed, days_ago=0):
+        file_id = self.client.post('/api/upload/', {'file': csv_file(f'{seed}.csv', rows=300, seed=seed)}).json()['file_id']
+        UploadedFile.objects.filter(pk=file_id).update(uploaded_at=timezone.now() - timedelta(days=days_ago))
+        return file_id
+
+    def test_merged_partials_match_one_pass_over_all_rows(self, schedule):
+        for seed in (1, 2, 3):
+            self.upload(seed)
+        combined = combine_analyses(AnalysisResult.objects.all())
+        rows = pd.concat([equipment_frame(300, seed=seed, shuffled=False) for seed in (1, 2, 3)])
+        self.assertTrue(combined['exact'])
+        self.assertEqual(combined['total_count'], 900)
+        for col in ('Flowrate', 'Pressure', 'Temperature'):
+            self.assertEqual(combined['stats'][col]['count'], rows[col].count())
+            self.assertAlmostEqual(combined['stats'][col]['sum'], rows[col].sum(), places=3)
+            self.assertAlmostEqual(combined['stats'][col]['std'], round(rows[col].std(), 2))
+            self.assertEqual(combined['stats'][col]['max'], rows[col].max())
+        expected = rows[['Flowrate', 'Pressure', 'Temperature']].corr()
+        self.assertAlmostEqual(combined['correlation']['Pressure']['Temperature'],
+                               expected.loc['Pressure', 'Temperature'], places=4)
+        self.assertEqual(combined['distribution'], rows['Type'].value_counts().to_dict())
+
+    def test_analyses_without_partials_are_not_exact(self, schedule):
+        self.upload(1)
+        AnalysisResult.objects.update(partials={})
+        combined = combine_analyses(AnalysisResult.objects.all())
+        self.assertFalse(combined['exact'])
+        self.assertIsNone(combined['correlation'])
+        self.assertEqual(combined['stats']['Flowrate']['count'], 300)
+
+    def test_endpoint_filters_by_upload_date(self, schedule):
+        old, new = self.upload(1, days_ago=10), self.upload(2)
+        start = (timezone.now() - timedelta(days=2)).date().isoformat()
+        body = self.client.get('/api/aggregate/', {'start': start}).json()
+        self.assertEqual((body['file_ids'], body['files'], body['exact']), ([new], 1, True))
+        body = self.client.get('/api/aggregate/', {'end': start}).json()
+        self.assertEqual(body['file_ids'], [old])
+        self.assertEqual(self.client.get('/api/aggregate/', {'start': 'last week'}).status_code, 400)
@@ -0,0 +1,63 @@
+import os
+import tempfile
+from unittest import mock
+import pandas as pd
+from django.test import SimpleTestCase, TestCase
+from core import anomalies
+from core.anomalies import frame_anomalies, store_anomalies
+from .support import TemporaryMediaMixin, csv_file, equipment_frame, write_store
+
+
+class RollingAnomalyTests(SimpleTestCase):
+    def naive_counts(self, df, window=anomalies.ROLLING_WINDOW, threshold=anomalies.Z_THRESHOLD):
+        # Straightforward pandas version: per machine, in time order, against the previous `window` rows
+        df = df.assign(Timestamp=pd.to_datetime(df['Timestamp'])).sort_values('Timestamp', kind='stable')
+        counts = {}
+        for col in ('Flowrate', 'Pressure', 'Temperature'):
+            flagged = 0
+            for _, group in df.groupby('Equipment Name', dropna=False):
+                previous = group[col].shift(1).rolling(window, min_periods=anomalies.MIN_PERIODS)
+                z = (group[col] - previous.mean()) / previous.std()
+                flagged += int((z.abs() > threshold).sum())
+            counts[col] = flagged
+        return counts
+
+    def test_counts_match_a_naive_rolling_window(self):
+        df = equipment_frame(6000, seed=3)
+        df.loc[[100, 2500, 4000], 'Temperature'] += 60
+        result = frame_anomalies(df, 'Timestamp')
+        self.assertEqual(result['counts'], self.naive_counts(df))
+        self.assertEqual(result['flagged_rows'], len({r['row'] for r in result['rows']}))
+
+    def test_planted_spike_is_reported_per_machine(self):
+        df = equipment_frame(3000, seed=4, shuffled=False)
+        row = int(df.index[(df['Equipment Name'] == 'Pump-2') & (df.index > 1500)][0])
+        df.loc[row, 'Temperature'] = 500.0
+        result = frame_anomalies(df, 'Timestamp')
+        self.assertIn({'row': row, 'params': ['Temperature']}, result['rows'])
+        self.assertGreaterEqual(result['by_group']['Pump-2'], 1)
+        # Machines running at very different levels are never compared with each other
+        df.loc[df['Equipment Name'] == 'Valve-1', 'Pressure'] += 50
+        self.assertEqual(frame_anomalies(df, 'Timestamp')['counts'], result['counts'])
+
+    def test_store_walk_matches_in_memory_for_any_slab(self):
+        df = equipment_frame(8000, seed=5)
+        expected = frame_anomalies(df, 'Timestamp', offset=10, limit=50)
+        with tempfile.TemporaryDirectory() as tmp:
+            store = write_store(os.path.join(tmp, 'store'), df)
+            for slab in (anomalies.SLAB_ROWS, 1000, 37):
+                with mock.patch.object(anomalies, 'SLAB_ROWS', slab):
+                    self.assertEqual(store_anomalies(store, offset=10, limit=50), expected)
+
+
+@mock.patch('core.views.schedule_retention')
+class AnomaliesEndpointTests(TemporaryMediaMixin, TestCase):
+    def test_pages_and_parameters(self, schedule):
+        file_id = self.client.post('/api/upload/', {'file': csv_file('a.csv', rows=3000)}).json()['file_id']
+        url = f'/api/datasets/{file_id}/anomalies/'
+        loose = self.client.get(url, {'threshold': 1.5, 'window': 20}).json()
+        self.assertGreater(loose['flagged_rows'], 10)
+        page = self.client.get(url, {'threshold': 1.5, 'window': 20, 'offset': 5, 'limit': 5}).json()
+        self.assertEqual(page['rows'], loose['rows'][5:10])
+        for query in ({'window': 1}, {'threshold': 0}, {'limit': -1}, {'window': 'wide'}):
+            self.assertEqual(self.client.get(url, query).status_code, 400, msg=query)
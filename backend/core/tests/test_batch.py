@@ -0,0 +1,64 @@
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from core.models import ProcessingJob, UploadBatch, UploadedFile
+from core.uploadhandlers import HashingUploadHandler
+from .support import TemporaryMediaMixin, csv_file
+
+EAGER = {'EAGER': True, 'ANALYSE_ON_UPLOAD': False}
+
+
+class LosingHashingUploadHandler(HashingUploadHandler):
+    # Loses the digest of the second file, as if its part had been cut short
+    def file_complete(self, file_size):
+        result = super().file_complete(file_size)
+        if len(self.digest_lists.get(self.field_name, [])) == 2:
+            self.digest_lists[self.field_name].pop()
+        return result
+
+
+@override_settings(ANALYSIS_JOBS=EAGER)
+@mock.patch('core.views.schedule_retention')
+class BatchUploadTests(TemporaryMediaMixin, TestCase):
+    def post(self, *files):
+        return self.client.post('/api/upload/batch/', {'files': list(files)})
+
+    def test_every_file_is_analysed_and_summarised(self, schedule):
+        response = self.post(csv_file('a.csv', seed=1), csv_file('b.csv', seed=2), csv_file('a2.csv', seed=1))
+        self.assertEqual(response.status_code, 202)
+        body = response.json()
+        self.assertEqual([f['file_name'] for f in body['files']], ['a.csv', 'b.csv', 'a2.csv'])
+        # The third file has the same bytes as the first: served from the cache
+        self.assertEqual([f['cached'] for f in body['files']], [False, False, True])
+        uploads = UploadedFile.objects.order_by('pk')
+        self.assertEqual(uploads[0].sha256, uploads[2].sha256)
+        self.assertNotEqual(uploads[0].sha256, uploads[1].sha256)
+
+        status = self.client.get(body['status_url']).json()
+        self.assertTrue(status['complete'])
+        self.assertEqual((status['done'], status['failed']), (3, 0))
+        self.assertEqual({f['status'] for f in status['files']}, {ProcessingJob.DONE})
+        self.assertEqual(status['summary']['total_count'], 150)
+
+    def test_invalid_and_missing_files_are_rejected(self, schedule):
+        self.assertEqual(self.client.post('/api/upload/batch/', {}).status_code, 400)
+        response = self.post(csv_file('a.csv'), SimpleUploadedFile('empty.csv', b''))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('empty.csv', response.json()['files'])
+        self.assertFalse(UploadedFile.objects.exists())
+
+    @mock.patch('core.views.HashingUploadHandler', LosingHashingUploadHandler)
+    def test_files_without_a_digest_are_not_saved(self, schedule):
+        response = self.post(csv_file('a.csv', seed=1), csv_file('b.csv', seed=2))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('hash', response.json()['files'][0])
+        self.assertFalse(UploadedFile.objects.exists())
+
+    def test_files_without_a_job_are_reported_failed(self, schedule):
+        batch = UploadBatch.objects.create()
+        UploadedFile.objects.create(file=csv_file('a.csv'), batch=batch)
+        status = self.client.get(f'/api/batches/{batch.pk}/').json()
+        self.assertTrue(status['complete'])
+        self.assertEqual(status['failed'], 1)
+        self.assertEqual(status['files'][0]['status'], ProcessingJob.FAILED)
+        self.assertIsNone(status['files'][0]['job_id'])
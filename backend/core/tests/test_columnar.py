@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import warnings
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+from core.columnar import ColumnStore, ColumnStoreWriter
+from core.utils import process_csv_data
+from .support import equipment_frame, write_store
+
+
+class ColumnStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+
+    def test_round_trip_keeps_values_kinds_and_order(self):
+        df = equipment_frame(3000, shuffled=False).assign(Hour=np.arange(3000) % 24)
+        df.loc[5, 'Type'] = None
+        store = write_store(os.path.join(self.dir, 'store'), df, chunk_rows=700)
+        self.assertEqual(store.rows, 3000)
+        self.assertEqual({name: store.kind(name) for name in ('Type', 'Pressure', 'Timestamp', 'Hour')},
+                         {'Type': 'category', 'Pressure': 'float', 'Timestamp': 'datetime', 'Hour': 'float'})
+        self.assertTrue(store.meta['time_sorted'])
+        frame = store.frame()
+        pd.testing.assert_series_equal(frame['Pressure'], df['Pressure'])
+        self.assertEqual(frame['Hour'].tolist(), df['Hour'].tolist())
+        self.assertTrue(pd.isna(frame['Type'][5]))
+        self.assertEqual(frame['Timestamp'].tolist(), df['Timestamp'].tolist())
+        self.assertEqual(store.take([2999, 0])['Equipment Name'].tolist(),
+                         df['Equipment Name'].iloc[[2999, 0]].tolist())
+
+    def test_shuffled_times_are_flagged_unsorted(self):
+        store = write_store(os.path.join(self.dir, 'store'), equipment_frame(2000))
+        self.assertFalse(store.meta['time_sorted'])
+
+    def test_clock_only_times_stay_text(self):
+        df = equipment_frame(1440, shuffled=False)
+        df['Time'] = pd.to_datetime(df.pop('Timestamp')).dt.strftime('%H:%M')
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')  # no "Could not infer format" per chunk
+            store = write_store(os.path.join(self.dir, 'store'), df, chunk_rows=100)
+        self.assertEqual(store.kind('Time'), 'category')
+        self.assertEqual(store.values('Time', 0, 2).tolist(), ['00:00', '00:01'])
+
+    def test_clock_only_store_path_matches_in_memory(self):
+        df = equipment_frame(1440, seed=9, shuffled=False)
+        df['Time'] = pd.to_datetime(df.pop('Timestamp')).dt.strftime('%H:%M')
+        path = os.path.join(self.dir, 'clock.csv')
+        df.to_csv(path, index=False)
+        memory = process_csv_data(path)
+        stored = process_csv_data(path, chunksize=100, store_dir=os.path.join(self.dir, 'store'))
+        for key in ('time_col', 'preview', 'chart_data', 'anomalies', 'anomaly_count', 'groups'):
+            self.assertEqual(stored[key], memory[key], msg=key)
+        self.assertEqual(stored['chart_data'][0]['Time'], '00:00')
+
+    def test_publish_keeps_the_first_finished_copy(self):
+        path = os.path.join(self.dir, 'store')
+        first = ColumnStoreWriter(path)
+        second = ColumnStoreWriter(path)
+        first.append(equipment_frame(10))
+        second.append(equipment_frame(20))
+        first.close()
+        second.close()
+        self.assertEqual(ColumnStore.open(path).rows, 10)
+        self.assertEqual(os.listdir(self.dir), ['store'])
@@ -0,0 +1,82 @@
+import gzip
+import json
+from unittest import mock
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from core.middleware import CompressionMiddleware
+from .support import TemporaryMediaMixin, csv_file
+
+
+@mock.patch('core.views.schedule_retention')
+class ConditionalRequestTests(TemporaryMediaMixin, TestCase):
+    def upload(self, name, seed=7):
+        response = self.client.post('/api/upload/', {'file': csv_file(name, seed=seed)})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_unchanged_history_detail_is_not_modified(self, schedule):
+        file_id = self.upload('a.csv')['file_id']
+        url = f'/api/history/{file_id}/'
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Another representation of the same data gets its own tag
+        self.assertNotEqual(self.client.get(url + '?shape=columns')['ETag'], etag)
+
+    def test_new_upload_changes_the_history_tag(self, schedule):
+        self.upload('a.csv')
+        etag = self.client.get('/api/history/')['ETag']
+        self.assertEqual(self.client.get('/api/history/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.upload('b.csv', seed=8)
+        response = self.client.get('/api/history/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_compressed_tag_round_trips(self, schedule):
+        url = f"/api/history/{self.upload('a.csv')['file_id']}/"
+        plain = self.client.get(url)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(response['ETag'], plain['ETag'][:-1] + '-gzip"')
+        self.assertEqual(json.loads(gzip.decompress(response.content)), plain.json())
+        # The client sends back the tag it was given and gets that same tag with the 304
+        not_modified = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+
+
+class CompressionTests(SimpleTestCase):
+    body = b'{"values": [%s]}' % b', '.join(b'1.5' for _ in range(1000))
+
+    def respond(self, content_type, cookie=None, encoding='gzip'):
+        def view(request):
+            response = HttpResponse(self.body, content_type=content_type)
+            if cookie:
+                response.set_cookie(cookie, 'secret')
+            return response
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=encoding)
+        return CompressionMiddleware(view)(request)
+
+    def test_api_payloads_are_compressed(self):
+        for content_type in ('application/json', 'application/msgpack', 'text/csv; charset=utf-8'):
+            response = self.respond(content_type)
+            self.assertEqual(response['Content-Encoding'], 'gzip', content_type)
+            self.assertEqual(gzip.decompress(response.content), self.body)
+
+    def test_pages_are_not_compressed(self):
+        for content_type in ('text/html; charset=utf-8', 'text/plain'):
+            response = self.respond(content_type)
+            self.assertFalse(response.has_header('Content-Encoding'), content_type)
+            self.assertEqual(response.content, self.body)
+
+    def test_responses_setting_the_csrf_cookie_are_not_compressed(self):
+        response = self.respond('application/json', cookie='csrftoken')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_identity_when_not_accepted(self):
+        response = self.respond('application/json', encoding='identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
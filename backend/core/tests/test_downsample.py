@@ -0,0 +1,70 @@
+import os
+import tempfile
+from unittest import mock
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+from core import downsample
+from core.downsample import chart_from_store, downsample_indices, lttb_indices, minmax_indices
+from .support import TemporaryMediaMixin, csv_file, equipment_frame, write_store
+
+
+class DownsampleTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(2)
+        self.y = np.cumsum(rng.normal(size=50_000))
+        self.y[rng.random(len(self.y)) < 0.01] = np.nan
+        self.spike = 31_337
+        self.y[self.spike] = np.nanmax(self.y) + 100
+
+    def test_lttb_keeps_ends_and_spikes(self):
+        picks = lttb_indices(self.y, 500)
+        self.assertEqual(len(picks), 500)
+        self.assertEqual((picks[0], picks[-1]), (0, len(self.y) - 1))
+        self.assertTrue(np.all(np.diff(picks) > 0))
+        self.assertIn(self.spike, picks)
+
+    def test_lttb_short_series_is_untouched(self):
+        np.testing.assert_array_equal(lttb_indices(self.y[:10], 50), np.arange(10))
+
+    def test_minmax_keeps_every_bucket_extreme(self):
+        picks = minmax_indices(self.y, 100)
+        size = -(-len(self.y) // 100)
+        for start in range(0, len(self.y), size):
+            block = self.y[start:start + size]
+            self.assertIn(start + np.nanargmin(block), picks)
+            self.assertIn(start + np.nanargmax(block), picks)
+
+    def test_slabs_do_not_change_the_picks(self):
+        whole = lttb_indices(self.y, 300), minmax_indices(self.y, 150)
+        with mock.patch.object(downsample, 'SLAB_ROWS', 97):
+            np.testing.assert_array_equal(lttb_indices(self.y, 300), whole[0])
+            np.testing.assert_array_equal(minmax_indices(self.y, 150), whole[1])
+
+    def test_store_chart_follows_time_order(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = write_store(os.path.join(tmp, 'store'), equipment_frame(20_000))
+            for method in downsample.METHODS:
+                chart = chart_from_store(store, 300, method, orient='columns')
+                times = chart['Timestamp']
+                self.assertEqual(times, sorted(times))
+                self.assertLessEqual(len(times), 300)
+
+    def test_union_over_parameters_stays_within_the_budget(self):
+        rng = np.random.default_rng(3)
+        series = {col: rng.normal(size=20_000) for col in ('Flowrate', 'Pressure', 'Temperature')}
+        for method in downsample.METHODS:
+            picks = downsample_indices(series, 400, method)
+            self.assertLessEqual(len(picks), 400)
+            self.assertTrue(np.all(np.diff(picks) > 0))
+
+
+@mock.patch('core.views.schedule_retention')
+class ChartEndpointTests(TemporaryMediaMixin, TestCase):
+    def test_point_budget_and_method_are_validated(self, schedule):
+        file_id = self.client.post('/api/upload/', {'file': csv_file('a.csv', rows=500)}).json()['file_id']
+        url = f'/api/datasets/{file_id}/chart/'
+        response = self.client.get(url, {'points': 100, 'method': 'minmax', 'shape': 'columns'})
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(response.json()['chart_data']['Pressure']), 100)
+        for query in ({'points': 2}, {'points': 'many'}, {'method': 'random'}):
+            self.assertEqual(self.client.get(url, query).status_code, 400, msg=query)
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+from core.anomalies import frame_anomalies
+from core.groups import GroupStats
+from .support import equipment_frame
+
+
+class GroupStatsTests(SimpleTestCase):
+    def setUp(self):
+        self.df = equipment_frame(6000, seed=12)
+        # A real group called "Unknown", and rows with no Type at all
+        self.df.loc[self.df.index[:300], 'Type'] = 'Unknown'
+        self.df.loc[self.df.index[300:420], 'Type'] = None
+
+    def stats(self, chunk_rows):
+        group = GroupStats('Type')
+        for start in range(0, len(self.df), chunk_rows):
+            group.update(self.df.iloc[start:start + chunk_rows])
+        return group
+
+    def test_matches_a_pandas_groupby(self):
+        result = self.stats(len(self.df)).result()
+        expected = self.df.groupby('Type')
+        self.assertEqual({label: g['count'] for label, g in result['groups'].items()},
+                         expected.size().to_dict())
+        for label, group in expected:
+            stats = result['groups'][label]['stats']['Pressure']
+            self.assertAlmostEqual(stats['avg'], round(group['Pressure'].mean(), 2))
+            self.assertAlmostEqual(stats['std'], round(group['Pressure'].std(), 2))
+            self.assertEqual(stats['max'], round(group['Pressure'].max(), 2))
+            # Relative-error quantiles
+            self.assertAlmostEqual(stats['p50'], group['Pressure'].median(), delta=0.01 * group['Pressure'].median())
+
+    def test_rows_without_a_label_stay_apart_from_a_group_named_unknown(self):
+        result = self.stats(1000).result()
+        self.assertEqual(result['groups']['Unknown']['count'], 300)
+        self.assertEqual(result['missing']['count'], 120)
+        self.assertEqual(result['total_groups'], 3)
+        missing = self.df[self.df['Type'].isna()]
+        self.assertAlmostEqual(result['missing']['stats']['Flowrate']['avg'], round(missing['Flowrate'].mean(), 2))
+        self.assertIsNone(GroupStats('Type').result()['missing'])
+
+    def test_chunks_merge_to_the_whole(self):
+        whole, chunked = self.stats(len(self.df)).result(), self.stats(777).result()
+        for label, group in whole['groups'].items():
+            self.assertEqual(chunked['groups'][label]['count'], group['count'])
+            for col, stats in group['stats'].items():
+                for name, value in stats.items():
+                    self.assertAlmostEqual(chunked['groups'][label]['stats'][col][name], value, places=6)
+
+    def test_flagged_rows_follow_the_same_split(self):
+        anomalies = frame_anomalies(self.df, 'Timestamp')
+        result = self.stats(len(self.df)).result(anomalies)
+        self.assertEqual(result['missing']['flagged_rows'], anomalies['missing']['Type'])
+        self.assertEqual(sum(g['flagged_rows'] for g in result['groups'].values()) + result['missing']['flagged_rows'],
+                         anomalies['flagged_rows'])
+
+    def test_largest_groups_are_kept(self):
+        df = pd.DataFrame({'Type': np.repeat(['a', 'b', 'c'], [5, 30, 10]), 'Flowrate': 1.0,
+                           'Pressure': 2.0, 'Temperature': 3.0})
+        group = GroupStats('Type')
+        group.update(df)
+        result = group.result(limit=2)
+        self.assertEqual(list(result['groups']), ['b', 'c'])
+        self.assertEqual(result['truncated'], 1)
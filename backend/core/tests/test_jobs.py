@@ -0,0 +1,96 @@
+import os
+import socket
+import threading
+from concurrent.futures import Future
+from unittest import mock
+from django.test import TestCase, TransactionTestCase, override_settings
+from core import jobs
+from core.models import AnalysisResult, ProcessingJob, UploadedFile
+from .support import TemporaryMediaMixin, csv_file
+
+EAGER = {'EAGER': True, 'ANALYSE_ON_UPLOAD': False}
+
+
+def dead_owner():
+    # A pid that is not running on this host
+    pid = 4_000_000
+    while jobs._process_start(pid) is not None:
+        pid += 1
+    return f"{socket.gethostname()}:{pid}:x.1:deadbeef"
+
+
+@mock.patch('core.views.schedule_retention')
+class JobQueueTests(TemporaryMediaMixin, TestCase):
+    @override_settings(ANALYSIS_JOBS=EAGER)
+    def test_upload_queues_a_job_with_the_result(self, schedule):
+        response = self.client.post('/api/upload/', {'file': csv_file('a.csv')})
+        self.assertEqual(response.status_code, 202)
+        status = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(status['status'], ProcessingJob.DONE)
+        self.assertEqual(status['result']['total_count'], 50)
+        self.assertIn('parse', status['timings'])
+        job = ProcessingJob.objects.get()
+        self.assertEqual((job.owner, job.attempts), (jobs.process_owner(), 1))
+        self.assertTrue(AnalysisResult.objects.filter(upload_id=response.json()['file_id']).exists())
+
+    @override_settings(ANALYSIS_JOBS=EAGER)
+    def test_bad_file_fails_the_job(self, schedule):
+        bad = csv_file('bad.csv')
+        bad.file.seek(0)
+        bad.file.write(b'A,B\n1,2\n')
+        bad.file.truncate()
+        bad.file.seek(0)
+        response = self.client.post('/api/upload/', {'file': bad})
+        status = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(status['status'], ProcessingJob.FAILED)
+        self.assertIn('Missing columns', status['error'])
+
+
+class OwnerTests(TestCase):
+    def test_exited_and_reused_pids_are_told_apart(self):
+        host = socket.gethostname()
+        parent = os.getppid()
+        self.assertFalse(jobs._has_exited(jobs.process_owner()))
+        self.assertFalse(jobs._has_exited(f"{host}:{parent}:{jobs._process_start(parent)}:0"))
+        # Same pid, other start time: the pid was given to a new process
+        self.assertTrue(jobs._has_exited(f"{host}:{parent}:0.0:0"))
+        self.assertTrue(jobs._has_exited(dead_owner()))
+        self.assertTrue(jobs._has_exited(''))
+        self.assertFalse(jobs._has_exited(f"elsewhere:{parent}:0.0:0"))
+
+
+@override_settings(ANALYSIS_JOBS=EAGER)
+class RecoveryTests(TemporaryMediaMixin, TestCase):
+    def job(self, owner, status=ProcessingJob.RUNNING, attempts=1):
+        upload = UploadedFile.objects.create(file=csv_file('a.csv'), sha256='')
+        return ProcessingJob.objects.create(upload=upload, owner=owner, status=status, attempts=attempts)
+
+    def test_jobs_of_exited_owners_are_run_again_or_failed(self):
+        orphan = self.job(dead_owner())
+        crashing = self.job(dead_owner(), attempts=jobs.jobs_setting('MAX_ATTEMPTS'))
+        live = self.job(jobs.process_owner(), status=ProcessingJob.QUEUED, attempts=0)
+        self.assertEqual(jobs.recover_jobs(), (1, 1))
+        orphan.refresh_from_db()
+        crashing.refresh_from_db()
+        live.refresh_from_db()
+        self.assertEqual((orphan.status, orphan.owner, orphan.attempts),
+                         (ProcessingJob.DONE, jobs.process_owner(), 2))
+        self.assertEqual(crashing.status, ProcessingJob.FAILED)
+        self.assertIn('interrupted', crashing.error)
+        self.assertEqual(live.status, ProcessingJob.QUEUED)
+
+
+class CallbackTests(TemporaryMediaMixin, TransactionTestCase):
+    def test_crashed_worker_fails_the_job_from_the_callback_thread(self):
+        upload = UploadedFile.objects.create(file=csv_file('a.csv'))
+        job = ProcessingJob.objects.create(upload=upload, status=ProcessingJob.RUNNING)
+        future = Future()
+        future.set_exception(RuntimeError("worker died"))
+        # The pool's callback thread: the write must not leave a connection open behind it
+        with mock.patch('core.jobs.connection') as connection:
+            thread = threading.Thread(target=jobs._on_done, args=(job.pk, future))
+            thread.start()
+            thread.join()
+        connection.close.assert_called_once_with()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (ProcessingJob.FAILED, "worker died"))
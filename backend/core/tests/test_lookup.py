@@ -0,0 +1,64 @@
+from unittest import mock
+from django.test import TestCase
+from core.models import AnalysisCache, AnalysisResult, UploadedFile
+from .support import TemporaryMediaMixin, csv_file
+
+
+@mock.patch('core.views.schedule_retention')
+class LookupTests(TemporaryMediaMixin, TestCase):
+    def upload(self, name, seed=7):
+        response = self.client.post('/api/upload/', {'file': csv_file(name, seed=seed)})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def lookup_url(self, file_id):
+        return f'/api/upload/{UploadedFile.objects.get(pk=file_id).sha256}/'
+
+    def test_unknown_digest(self, schedule):
+        self.assertEqual(self.client.get('/api/upload/' + 'f' * 64 + '/').status_code, 404)
+
+    def test_lookup_follows_the_latest_upload_and_survives_eviction(self, schedule):
+        first = self.upload('a.csv')
+        url = self.lookup_url(first['file_id'])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        second = self.upload('a.csv')
+        self.assertTrue(second['cached'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['file_id'], second['file_id'])
+
+        AnalysisCache.objects.all().delete()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['chart_data'], second['data']['chart_data'])
+        self.assertNotIn('partials', response.json()['data'])
+
+    def test_reupload_after_eviction_still_merges(self, schedule):
+        first = self.upload('a.csv')
+        self.upload('b.csv', seed=8)
+        AnalysisCache.objects.all().delete()
+        self.client.get(self.lookup_url(first['file_id']))  # rebuilds the cache entry from the store
+
+        again = self.upload('a.csv')
+        self.assertTrue(again['cached'])
+        merged = self.client.get('/api/stats/merged/').json()
+        self.assertEqual(merged['missing'], [])
+        self.assertEqual(len(merged['file_ids']), 3)
+        aggregate = self.client.get('/api/aggregate/').json()
+        self.assertTrue(aggregate['exact'])
+        self.assertEqual(aggregate['total_count'], 150)
+
+    def test_cache_entry_without_merge_data_borrows_it(self, schedule):
+        # Entries rebuilt before stored_result kept sketches/partials
+        first = self.upload('a.csv')
+        entry = AnalysisCache.objects.get()
+        entry.result = {key: value for key, value in entry.result.items() if key not in ('sketches', 'partials')}
+        entry.save()
+
+        again = self.upload('a.csv')
+        self.assertTrue(again['cached'])
+        analysis = AnalysisResult.objects.get(upload_id=again['file_id'])
+        self.assertEqual(analysis.partials, AnalysisResult.objects.get(upload_id=first['file_id']).partials)
+        self.assertTrue(analysis.sketches)
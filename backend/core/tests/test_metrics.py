@@ -0,0 +1,112 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+from django.test import SimpleTestCase, TestCase, override_settings
+from core import metrics
+
+
+class RenderTests(SimpleTestCase):
+    def test_counter_lines(self):
+        counter = metrics.Counter('test_events_total', 'Events.', labels=('kind',))
+        metrics.REGISTRY.remove(counter)
+        counter.inc(kind='a')
+        counter.inc(2, kind='a "quoted"')
+        self.assertEqual(counter.render(), [
+            '# HELP test_events_total Events.',
+            '# TYPE test_events_total counter',
+            'test_events_total{kind="a"} 1',
+            'test_events_total{kind="a \\"quoted\\""} 2',
+        ])
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = metrics.Histogram('test_seconds', 'Latency.', (0.1, 1))
+        metrics.REGISTRY.remove(histogram)
+        for value in (0.05, 0.5, 5.0, None):
+            histogram.observe(value)
+        self.assertEqual(histogram.render()[2:], [
+            'test_seconds_bucket{le="0.1"} 1',
+            'test_seconds_bucket{le="1"} 2',
+            'test_seconds_bucket{le="+Inf"} 3',
+            'test_seconds_sum 5.55',
+            'test_seconds_count 3',
+        ])
+
+    def test_observe_job(self):
+        before = metrics.analysis_jobs.snapshot().get(('done',), 0)
+        count = metrics.analysis_rows_per_second.snapshot().get((), [0] * 13)[-1]
+        metrics.observe_job({'status': 'done', 'seconds': 2.0, 'stages': {'ingest': 1.5},
+                             'rows': 1000, 'bytes': 4096, 'peak_memory': None})
+        self.assertEqual(metrics.analysis_jobs.snapshot()[('done',)], before + 1)
+        self.assertEqual(metrics.analysis_rows_per_second.snapshot()[()][-1], count + 1)
+        self.assertIn(('ingest',), metrics.analysis_stage_seconds.snapshot())
+
+
+class SharedDirectoryTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        settings = override_settings(METRICS_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def write(self, name, count):
+        # Numbers another process flushed: one 'file-history' request counted `count` times
+        key = ['file-history', 'GET', '200']
+        series = [0] * len(metrics.http_seconds.buckets) + [0.0, count]
+        with open(os.path.join(self.directory, name), 'w') as f:
+            json.dump({metrics.http_seconds.name: [[key, series]]}, f)
+
+    def count(self):
+        return metrics.collect()[metrics.http_seconds.name].get(('file-history', 'GET', '200'), [0])[-1]
+
+    def test_numbers_of_every_process_are_added_up(self):
+        own = metrics.http_seconds.snapshot().get(('file-history', 'GET', '200'), [0])[-1]
+        self.write(f'{os.getppid()}-aaaaaaaa.json', 3)
+        self.write(metrics.ARCHIVE_FILE, 4)
+        self.assertEqual(self.count(), own + 7)
+        metrics.observe_request('file-history', 'GET', 200, 0.01, 0, 10)
+        self.assertEqual(self.count(), own + 8)
+        self.assertIn(os.path.basename(metrics._process_file(self.directory)), os.listdir(self.directory))
+
+    def test_exited_processes_are_folded_into_the_archive(self):
+        exited = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                                capture_output=True, text=True).stdout.strip()
+        self.write(f'{exited}-bbbbbbbb.json', 5)
+        own = metrics.http_seconds.snapshot().get(('file-history', 'GET', '200'), [0])[-1]
+        self.assertEqual(self.count(), own + 5)
+        self.assertNotIn(f'{exited}-bbbbbbbb.json', os.listdir(self.directory))
+        self.assertIn(metrics.ARCHIVE_FILE, os.listdir(self.directory))
+        self.assertEqual(self.count(), own + 5)
+
+    def test_without_a_directory_only_this_process_counts(self):
+        with override_settings(METRICS_DIR=None):
+            self.write(f'{os.getppid()}-cccccccc.json', 3)
+            self.assertEqual(metrics.collect()[metrics.http_seconds.name],
+                             metrics.http_seconds.snapshot())
+
+
+class EndpointTests(TestCase):
+    def test_metrics_endpoint(self):
+        self.client.get('/api/history/')
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_request_duration_seconds_count{view="file-history",method="GET",status="200"}', body)
+
+    def test_server_timing_header(self):
+        response = self.client.get('/api/history/')
+        self.assertRegex(response['Server-Timing'], r'total;dur=[\d.]+')
+        self.assertEqual(response['Timing-Allow-Origin'], '*')
+
+    @override_settings(SERVER_TIMING=False)
+    def test_server_timing_can_be_turned_off(self):
+        with mock.patch('core.middleware.metrics.observe_request') as observe:
+            response = self.client.get('/api/history/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(observe.call_args.kwargs['view'], 'file-history')
@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+from core import parsing
+from core.parsing import IncrementalCsvReader, iter_csv_typed, plan, read_csv_typed
+from .support import equipment_frame
+
+ENGINES = {'pyarrow': parsing.pa_csv, 'pandas': None}
+
+
+class ParsingTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+
+    def write(self, name, text):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w', newline='') as f:
+            f.write(text)
+        return path
+
+    def assertSameValues(self, actual, expected, msg=None):
+        pd.testing.assert_series_equal(actual.reset_index(drop=True), expected.reset_index(drop=True),
+                                       check_dtype=False, check_names=False, obj=msg or 'column')
+
+    def test_engines_read_the_same_typed_frame(self):
+        df = equipment_frame(500).assign(Hour=np.arange(500) % 24, Notes='ok')
+        df.columns = [f' {c.lower()} ' if c == 'Flowrate' else c for c in df.columns]
+        path = os.path.join(self.dir, 'plant.csv')
+        df.to_csv(path, index=False)
+        frames = {}
+        for name, module in ENGINES.items():
+            with mock.patch.object(parsing, 'pa_csv', module):
+                frames[name] = read_csv_typed(path)
+        expected = frames['pandas']
+        self.assertIn('Flowrate', expected.columns)
+        self.assertTrue(pd.api.types.is_integer_dtype(expected['Hour']))
+        self.assertTrue(pd.api.types.is_float_dtype(expected['Pressure']))
+        self.assertEqual(expected['Notes'].tolist(), ['ok'] * 500)
+        for col in ('Flowrate', 'Pressure', 'Hour', 'Timestamp', 'Notes'):
+            self.assertSameValues(frames['pyarrow'][col], expected[col], msg=col)
+        self.assertSameValues(frames['pyarrow']['Type'].astype(str), expected['Type'].astype(str))
+
+    def test_plan_narrows_the_read_and_needs_a_schema_column(self):
+        path = self.write('a.csv', 'Flowrate,Pressure,Notes\n1,2,x\n')
+        self.assertEqual(plan(path), {'Flowrate': 'float', 'Pressure': 'float', 'Notes': 'text'})
+        self.assertEqual(plan(path, columns=['Pressure']), {'Pressure': 'float'})
+        self.assertEqual(plan(self.write('b.csv', 'A,B\n1,2\n')), {})
+
+    def test_values_that_do_not_fit_the_schema_fall_back_to_an_untyped_read(self):
+        path = self.write('a.csv', 'Flowrate,Pressure,Temperature\n1,2,3\nbroken,2,3\n')
+        for name, module in ENGINES.items():
+            with self.subTest(engine=name), mock.patch.object(parsing, 'pa_csv', module):
+                    df = read_csv_typed(path)
+            self.assertEqual(df['Flowrate'].tolist(), ['1', 'broken'])
+
+    def test_chunks_keep_the_type_the_first_values_gave_a_column(self):
+        rows = ['Flowrate,Pressure,Temperature,Batch,Code']
+        rows += [f'1,2,3,{i},A{i}' for i in range(6)] + ['1,2,3,late,7', '1,2,3,9,8']
+        path = self.write('a.csv', '\n'.join(rows) + '\n')
+        for name, module in ENGINES.items():
+            with mock.patch.object(parsing, 'pa_csv', module), mock.patch.object(parsing, 'ARROW_BLOCK_BYTES', 64):
+                with open(path, 'rb') as handle:
+                    chunks = list(iter_csv_typed(handle, plan(path), chunksize=3))
+            self.assertGreater(len(chunks), 1)
+            batch = pd.concat([chunk['Batch'] for chunk in chunks], ignore_index=True)
+            code = pd.concat([chunk['Code'] for chunk in chunks], ignore_index=True)
+            self.assertTrue(all(pd.api.types.is_numeric_dtype(chunk['Batch']) for chunk in chunks))
+            self.assertEqual(batch.tolist()[:6], list(range(6)))
+            self.assertTrue(np.isnan(batch[6]))
+            self.assertFalse(any(pd.api.types.is_numeric_dtype(chunk['Code']) for chunk in chunks))
+            self.assertEqual(code.tolist()[-2:], ['7', '8'])
+
+    def test_incremental_reader_matches_a_whole_read(self):
+        df = equipment_frame(2000).assign(Notes='said "hi",\nthen left')
+        path = os.path.join(self.dir, 'plant.csv')
+        df.to_csv(path, index=False)
+        with open(path, 'rb') as f:
+            data = b'\xef\xbb\xbf' + f.read()
+        for name, module in ENGINES.items():
+            with mock.patch.object(parsing, 'pa_csv', module):
+                reader = IncrementalCsvReader(block_bytes=4096)
+                frames = []
+                for start in range(0, len(data), 1000):
+                    frames += reader.feed(data[start:start + 1000])
+                frames += reader.close()
+                whole = read_csv_typed(path)
+            self.assertGreater(len(frames), 5)
+            combined = pd.concat(frames, ignore_index=True)
+            self.assertEqual(len(combined), 2000)
+            for col in ('Pressure', 'Timestamp', 'Notes'):
+                self.assertSameValues(combined[col], whole[col], msg=f'{name} {col}')
+
+    def test_incremental_reader_rejects_a_file_without_schema_columns(self):
+        with self.assertRaisesMessage(ValueError, 'Missing columns'):
+            IncrementalCsvReader().feed(b'A,B\n1,2\n')
+        with self.assertRaisesMessage(ValueError, 'Missing columns'):
+            IncrementalCsvReader().close()
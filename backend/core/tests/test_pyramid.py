@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase, TestCase
+from core import pyramid
+from core.pyramid import Pyramid, build_pyramid
+from .support import TemporaryMediaMixin, csv_file, equipment_frame, write_store
+
+
+class PyramidTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        self.df = equipment_frame(20_000, seed=11)
+        self.df.loc[[3, 4], 'Timestamp'] = None
+        self.store = write_store(os.path.join(self.dir, 'store'), self.df)
+
+    def test_external_sort_matches_a_stable_argsort(self):
+        times = self.store.column('Timestamp')
+        expected = np.argsort(times, kind='stable')
+        for rows in (pyramid.SORT_ROWS, 1000, 37):
+            with self.subTest(rows=rows), tempfile.TemporaryDirectory() as tmp:
+                with mock.patch.object(pyramid, 'SORT_ROWS', rows):
+                    order = pyramid._write_order(times, tmp)
+                np.testing.assert_array_equal(order, expected)
+                np.testing.assert_array_equal(np.load(os.path.join(tmp, 'times.npy')), times[expected])
+                self.assertEqual(sorted(os.listdir(tmp)), ['order.npy', 'times.npy'])
+
+    def test_float_times_with_gaps_sort_last(self):
+        values = np.array([3.0, np.nan, 1.0, 2.0, np.nan, 1.0, 0.5])
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.object(pyramid, 'SORT_ROWS', 2):
+            order = pyramid._write_order(values, tmp)
+        np.testing.assert_array_equal(order, np.argsort(values, kind='stable'))
+
+    def test_buckets_aggregate_rows_in_time_order(self):
+        with mock.patch.object(pyramid, 'SORT_ROWS', 999):
+            built = build_pyramid(self.store)
+        frame = self.df.assign(Timestamp=pd.to_datetime(self.df['Timestamp'])).sort_values(
+            'Timestamp', kind='stable', na_position='first')
+        bucket = built.meta['levels'][1]['bucket_rows']
+        level = built.level(2)
+        pressure = frame['Pressure'].to_numpy()
+        for b in (0, 17, len(level) - 1):
+            values = pressure[b * bucket:(b + 1) * bucket]
+            self.assertAlmostEqual(level['Pressure_sum'][b], np.nansum(values))
+            self.assertEqual(level['Pressure_count'][b], np.count_nonzero(~np.isnan(values)))
+            self.assertEqual(level['Pressure_max'][b], np.nanmax(values))
+
+    def test_queries_pick_the_level_for_the_width(self):
+        built = build_pyramid(self.store)
+        whole = built.query(width=100)
+        self.assertGreater(whole['level'], 0)
+        self.assertLessEqual(len(whole['x']), 100)
+        self.assertIsNone(whole['x'][0])  # rows without a time come first
+        self.assertEqual(whole['x'][1:], sorted(whole['x'][1:]))
+        start, end = '2024-01-03 00:00:00', '2024-01-03 01:00:00'
+        zoomed = built.query(built.parse_x(start), built.parse_x(end), width=1000)
+        self.assertEqual(zoomed['level'], 0)
+        self.assertEqual(len(zoomed['x']), 61)
+        self.assertEqual((zoomed['x'][0], zoomed['x'][-1]), (start, end))
+
+    def test_concurrent_builds_publish_one_pyramid(self):
+        errors = []
+        def build():
+            try:
+                build_pyramid(self.store)
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=build) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertIsNotNone(Pyramid.open(self.store))
+        self.assertFalse([name for name in os.listdir(self.store.path) if '.tmp-' in name])
+
+
+@mock.patch('core.views.schedule_retention')
+class SeriesEndpointTests(TemporaryMediaMixin, TestCase):
+    def test_zoom_range_is_validated_and_answered(self, schedule):
+        file_id = self.client.post('/api/upload/', {'file': csv_file('a.csv', rows=2000)}).json()['file_id']
+        url = f'/api/datasets/{file_id}/series/'
+        response = self.client.get(url, {'width': 50})
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(response.json()['x']), 50)
+        response = self.client.get(url, {'start': '2024-01-01 00:10:00', 'end': '2024-01-01 00:19:00'})
+        self.assertEqual(response.json()['level'], 0)
+        self.assertEqual(len(response.json()['series']['Pressure']['mean']), 10)
+        for query in ({'width': 5}, {'start': 'yesterday-ish'}):
+            self.assertEqual(self.client.get(url, query).status_code, 400, msg=query)
@@ -0,0 +1,76 @@
+import json
+from unittest import mock
+import msgpack
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+from core import renderers
+from core.models import UploadedFile
+from core.renderers import NDARRAY_EXT, FastJSONRenderer, MessagePackRenderer
+from .support import TemporaryMediaMixin, csv_file
+
+
+def unpack(content):
+    def ext_hook(code, data):
+        if code == NDARRAY_EXT:
+            return np.frombuffer(data[3:], dtype=data[:3].decode())
+        return msgpack.ExtType(code, data)
+    return msgpack.unpackb(content, ext_hook=ext_hook, raw=False)
+
+
+class RendererTests(SimpleTestCase):
+    data = {
+        'floats': np.array([1.5, np.nan, 3.0]),
+        'ints': np.array([1, 2, 3], dtype=np.int64),
+        'labels': ['Pump A', None],
+        'count': np.int64(7),
+    }
+
+    def test_orjson_and_standard_encoder_agree(self):
+        fast = FastJSONRenderer().render(self.data)
+        with mock.patch.object(renderers, 'orjson', None):
+            standard = FastJSONRenderer().render(self.data)
+        self.assertEqual(json.loads(fast), json.loads(standard))
+        self.assertEqual(json.loads(fast)['floats'], [1.5, None, 3.0])
+        self.assertIn(b'\\u2028', fast)
+        self.assertIn(b'\\u2028', standard)
+
+    def test_msgpack_packs_numeric_arrays_as_raw_buffers(self):
+        unpacked = unpack(MessagePackRenderer().render(self.data))
+        np.testing.assert_array_equal(unpacked['floats'], self.data['floats'])
+        self.assertEqual(unpacked['ints'].dtype, np.dtype('<i8'))
+        self.assertEqual(unpacked['labels'], ['Pump A', None])
+        self.assertEqual(unpacked['count'], 7)
+        self.assertEqual(MessagePackRenderer().render(None), b'')
+
+
+class ShapeTests(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        retention = mock.patch('core.views.schedule_retention')
+        retention.start()
+        self.addCleanup(retention.stop)
+        file_id = self.client.post('/api/upload/', {'file': csv_file('shape.csv')}).json()['file_id']
+        self.url = f'/api/upload/{UploadedFile.objects.get(pk=file_id).sha256}/'
+
+    def test_records_by_default(self):
+        chart = self.client.get(self.url).json()['data']['chart_data']
+        self.assertIsInstance(chart, list)
+        self.assertIn('Flowrate', chart[0])
+
+    def test_columns_shape_matches_records(self):
+        records = self.client.get(self.url).json()['data']['chart_data']
+        columns = self.client.get(self.url, {'shape': 'columns'}).json()['data']['chart_data']
+        self.assertEqual(columns['Flowrate'], [row['Flowrate'] for row in records])
+        self.assertEqual(columns['Equipment Name'], [row['Equipment Name'] for row in records])
+
+    def test_msgpack_defaults_to_columns(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        records = self.client.get(self.url).json()['data']['chart_data']
+        chart = unpack(response.content)['data']['chart_data']
+        self.assertIsInstance(chart['Flowrate'], np.ndarray)
+        np.testing.assert_allclose(chart['Flowrate'], [row['Flowrate'] for row in records])
+
+    def test_unknown_shape_is_rejected(self):
+        response = self.client.get(self.url, {'shape': 'rows'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('shape', response.json())
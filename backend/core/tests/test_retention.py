@@ -0,0 +1,105 @@
+import os
+import time
+from datetime import timedelta
+from unittest import mock
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from core import retention
+from core.columnar import ColumnStoreWriter
+from core.models import AnalysisCache, ProcessingJob, UploadedFile
+from .support import TemporaryMediaMixin, equipment_frame, write_store
+
+
+class RetentionTests(TemporaryMediaMixin, TestCase):
+    def make_upload(self, name, age_seconds, size=100, digest=None):
+        upload = UploadedFile.objects.create(file=ContentFile(b'x' * size, name=name), sha256=digest or name)
+        UploadedFile.objects.filter(pk=upload.pk).update(uploaded_at=timezone.now() - timedelta(seconds=age_seconds))
+        return upload
+
+    @override_settings(RETENTION={'MAX_FILES': 2, 'MIN_AGE_SECONDS': 600})
+    def test_oldest_uploads_over_the_file_quota_go(self):
+        uploads = [self.make_upload(f'f{i}', age_seconds=3600 * (5 - i)) for i in range(5)]
+        paths = [upload.file.path for upload in uploads]
+        self.assertEqual(retention.sweep()['files'], 3)
+        self.assertEqual(list(UploadedFile.objects.order_by('pk').values_list('pk', flat=True)),
+                         [uploads[3].pk, uploads[4].pk])
+        self.assertEqual([os.path.exists(path) for path in paths], [False, False, False, True, True])
+
+    @override_settings(RETENTION={'MAX_BYTES': 250, 'MIN_AGE_SECONDS': 600})
+    def test_byte_quota_spares_young_and_busy_uploads(self):
+        old = self.make_upload('old', age_seconds=7200)
+        busy = self.make_upload('busy', age_seconds=3600)
+        young = self.make_upload('young', age_seconds=10)
+        ProcessingJob.objects.create(upload=busy, status=ProcessingJob.RUNNING)
+        self.assertEqual(retention.expired_uploads(), [old.pk])
+        retention.sweep()
+        self.assertEqual(set(UploadedFile.objects.values_list('pk', flat=True)), {busy.pk, young.pk})
+
+    @override_settings(RETENTION={'MAX_AGE_SECONDS': 3600, 'MIN_AGE_SECONDS': 600})
+    def test_age_quota(self):
+        self.make_upload('old', age_seconds=7200)
+        recent = self.make_upload('recent', age_seconds=1800)
+        self.assertEqual(retention.sweep(), {'files': 1, 'bytes': 100})
+        self.assertEqual(list(UploadedFile.objects.values_list('pk', flat=True)), [recent.pk])
+
+    @override_settings(RETENTION={'MAX_FILES': 1, 'MIN_AGE_SECONDS': 600})
+    def test_derived_data_goes_with_the_last_upload_of_its_bytes(self):
+        gone = self.make_upload('gone', age_seconds=7200, digest='a' * 64)
+        shared = self.make_upload('shared-old', age_seconds=3600, digest='b' * 64)
+        self.make_upload('shared-new', age_seconds=60, digest='b' * 64)
+        for upload in (gone, shared):
+            write_store(upload.columnar_dir, equipment_frame(10))
+            AnalysisCache.objects.create(sha256=upload.sha256, result={})
+        retention.sweep()
+        self.assertFalse(os.path.exists(gone.columnar_dir))
+        self.assertTrue(os.path.isdir(shared.columnar_dir))
+        self.assertEqual(list(AnalysisCache.objects.values_list('sha256', flat=True)), ['b' * 64])
+
+    @override_settings(RETENTION={'MIN_AGE_SECONDS': 600})
+    def test_orphan_sweep_spares_live_temporary_directories(self):
+        root = os.path.join(self.media_root, 'columnar')
+        kept = self.make_upload('kept', age_seconds=10)
+        stale = time.time() - 3600
+        for name in ('kept', 'orphan', 'orphan.tmp-dead'):
+            os.makedirs(os.path.join(root, name), exist_ok=True)
+            os.utime(os.path.join(root, name), (stale, stale))
+        writer = ColumnStoreWriter(os.path.join(root, 'upload-live'))
+        try:
+            writer.append(equipment_frame(10))
+            os.utime(writer.tmp_path, (stale, stale))
+            writer.append(equipment_frame(10))  # still writing: the append is its heartbeat
+            retention.sweep()
+            self.assertTrue(os.path.isdir(kept.columnar_dir))
+            self.assertTrue(os.path.isdir(writer.tmp_path))
+            self.assertFalse(os.path.exists(os.path.join(root, 'orphan')))
+            self.assertFalse(os.path.exists(os.path.join(root, 'orphan.tmp-dead')))
+        finally:
+            writer.abort()
+
+
+class ScheduleTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(retention, _last_started=None, _thread=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @override_settings(RETENTION={'INTERVAL_SECONDS': 300})
+    def test_at_most_one_sweep_per_interval(self):
+        with mock.patch.object(retention.threading, 'Thread') as thread:
+            thread.return_value.is_alive.return_value = False
+            retention.schedule()
+            retention.schedule()
+            self.assertEqual(thread.call_count, 1)
+            thread.return_value.start.assert_called_once_with()
+            retention._last_started -= 301
+            retention.schedule()
+            self.assertEqual(thread.call_count, 2)
+
+    @override_settings(RETENTION={'INTERVAL_SECONDS': 0})
+    def test_never_two_sweeps_at_once(self):
+        with mock.patch.object(retention.threading, 'Thread') as thread:
+            thread.return_value.is_alive.return_value = True
+            retention.schedule()
+            retention.schedule()
+            self.assertEqual(thread.call_count, 1)
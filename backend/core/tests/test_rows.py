@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase, TestCase
+from core.models import UploadedFile
+from core.rows import page, row_positions
+from .support import TemporaryMediaMixin, csv_file, equipment_frame, write_store
+
+
+class RowPositionTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp = tempfile.mkdtemp()
+        cls.df = equipment_frame(3000)
+        cls.df.loc[[5, 17], 'Type'] = None
+        cls.store = write_store(os.path.join(cls.tmp, 'store'), cls.df, chunk_rows=700)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+        super().tearDownClass()
+
+    def expected(self, column, descending):
+        # pandas' stable sort with missing values last
+        return self.df.sort_values(column, ascending=not descending, kind='stable', na_position='last').index
+
+    def test_pages_concatenate_to_the_sorted_column(self):
+        for column in ('Pressure', 'Timestamp', 'Type'):
+            for descending in (False, True):
+                with self.subTest(column=column, descending=descending):
+                    pages = [row_positions(self.store, offset, 400, column, descending)
+                             for offset in range(0, 3000, 400)]
+                    positions = np.concatenate(pages)
+                    values = self.df[column].to_numpy()[positions]
+                    expected = self.df[column].to_numpy()[self.expected(column, descending)]
+                    np.testing.assert_array_equal(pd.isna(values), pd.isna(expected))
+                    present = ~pd.isna(expected)
+                    np.testing.assert_array_equal(values[present], expected[present])
+
+    def test_missing_values_come_last_both_ways(self):
+        missing = self.df['Pressure'].isna().sum()
+        for descending in (False, True):
+            tail = row_positions(self.store, 3000 - missing, missing, 'Pressure', descending)
+            self.assertTrue(self.df['Pressure'].iloc[tail].isna().all())
+
+    def test_unsorted_pages_and_bounds(self):
+        np.testing.assert_array_equal(row_positions(self.store, 10, 5), np.arange(10, 15))
+        np.testing.assert_array_equal(row_positions(self.store, 0, 3, descending=True), [2999, 2998, 2997])
+        self.assertEqual(len(row_positions(self.store, 2990, 100)), 10)
+        self.assertEqual(len(row_positions(self.store, 5000, 100)), 0)
+
+    def test_page_shapes(self):
+        records = page(self.store, 0, 5, sort='Flowrate')
+        columns = page(self.store, 0, 5, sort='Flowrate', shape='columns')
+        self.assertEqual(records['total'], 3000)
+        self.assertEqual(records['row'], columns['row'].tolist())
+        self.assertEqual([row['Flowrate'] for row in records['rows']], columns['rows']['Flowrate'].tolist())
+        self.assertEqual(records['rows'][0]['Flowrate'], self.df['Flowrate'].min())
+
+
+@mock.patch('core.views.schedule_retention')
+class RowsEndpointTests(TemporaryMediaMixin, TestCase):
+    def url(self):
+        file_id = self.client.post('/api/upload/', {'file': csv_file('rows.csv', rows=200)}).json()['file_id']
+        return f'/api/datasets/{file_id}/rows/'
+
+    def test_sorted_page(self, schedule):
+        response = self.client.get(self.url(), {'offset': 10, 'limit': 20, 'sort': 'Temperature', 'order': 'desc'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['total'], data['offset'], data['sort'], data['order']), (200, 10, 'Temperature', 'desc'))
+        temperatures = [row['Temperature'] for row in data['rows']]
+        self.assertEqual(len(temperatures), 20)
+        self.assertEqual(temperatures, sorted(temperatures, reverse=True))
+        self.assertIn('ETag', response)
+
+    def test_invalid_parameters(self, schedule):
+        url = self.url()
+        for params in ({'offset': 'x'}, {'offset': -1}, {'limit': 10_001}, {'sort': 'Nope'}, {'order': 'up'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+
+    def test_not_ingested(self, schedule):
+        url = self.url()
+        shutil.rmtree(UploadedFile.objects.get().columnar_dir)
+        self.assertEqual(self.client.get(url).status_code, 404)
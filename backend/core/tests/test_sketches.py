@@ -0,0 +1,64 @@
+from unittest import mock
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+from core.sketches import ColumnSketches, Histogram, QuantileSketch
+from .support import TemporaryMediaMixin, csv_file
+
+
+class SketchTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.parts = [rng.lognormal(1.0, 0.5, 20_000) + i for i in range(8)]
+        self.values = np.concatenate(self.parts)
+
+    def assertRankClose(self, estimate, q, tolerance=0.01):
+        rank = np.searchsorted(np.sort(self.values), estimate) / len(self.values)
+        self.assertLess(abs(rank - q), tolerance, msg=f"q={q}")
+
+    def test_small_sketch_is_exact(self):
+        sketch = QuantileSketch()
+        sketch.update(self.parts[0][:1000])
+        self.assertTrue(sketch.is_exact)
+        self.assertAlmostEqual(sketch.median(), float(np.median(self.parts[0][:1000])))
+
+    def test_merged_sketches_track_exact_quantiles(self):
+        merged = QuantileSketch()
+        for part in self.parts:
+            sketch = QuantileSketch()
+            sketch.update(part)
+            merged.merge(sketch)
+        self.assertEqual(merged.n, len(self.values))
+        for q in (0.01, 0.1, 0.5, 0.9, 0.99):
+            self.assertRankClose(merged.quantile(q), q)
+
+    def test_stored_sketches_survive_a_round_trip(self):
+        merged = ColumnSketches()
+        for part in self.parts:
+            sketches = ColumnSketches()
+            for col in sketches.quantiles:
+                sketches.update(col, part)
+            merged.merge(ColumnSketches.from_dict(sketches.to_dict()))
+        self.assertRankClose(merged.quantiles['Pressure'].quantile(0.5), 0.5, tolerance=0.02)
+
+    def test_merged_histogram_counts_are_exact(self):
+        merged = Histogram()
+        for part in self.parts:
+            hist = Histogram()
+            hist.update(part)
+            merged.merge(hist)
+        self.assertLessEqual(len(merged.counts), merged.bins)
+        expected, _ = np.histogram(self.values, bins=merged.edges())
+        np.testing.assert_array_equal(merged.counts, expected)
+
+
+@mock.patch('core.views.schedule_retention')
+class MergedStatsEndpointTests(TemporaryMediaMixin, TestCase):
+    def test_sketches_of_several_uploads_are_merged(self, schedule):
+        ids = [self.client.post('/api/upload/', {'file': csv_file(f'{i}.csv', rows=400, seed=i)}).json()['file_id']
+               for i in range(3)]
+        response = self.client.get('/api/stats/merged/', {'ids': f'{ids[0]},{ids[2]}'})
+        body = response.json()
+        self.assertEqual((body['file_ids'], body['missing']), ([ids[0], ids[2]], []))
+        self.assertEqual(body['stats']['Flowrate']['count'], 800)
+        self.assertEqual(sum(body['histograms']['Flowrate']['counts']), 800)
+        self.assertEqual(self.client.get('/api/stats/merged/', {'ids': 'one,two'}).status_code, 400)
@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+from django.test import SimpleTestCase
+from core import downsample
+from core.utils import process_csv_data
+from .support import equipment_frame
+
+
+class StreamingEquivalenceTests(SimpleTestCase):
+    """The chunked engine (with and without a column store) against the in-memory one."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.dir = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.dir, 'plant.csv')
+        equipment_frame().to_csv(cls.path, index=False)
+        cls.memory = process_csv_data(cls.path)
+        cls.streamed = process_csv_data(cls.path, chunksize=700)
+        cls.stored = process_csv_data(cls.path, chunksize=700, store_dir=os.path.join(cls.dir, 'store'))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_summaries_match(self):
+        for result in (self.streamed, self.stored):
+            self.assertTrue(result['success'])
+            self.assertEqual(result['total_count'], self.memory['total_count'])
+            self.assertEqual(result['distribution'], self.memory['distribution'])
+            self.assertEqual(result['anomaly_count'], self.memory['anomaly_count'])
+            self.assertEqual(result['time_col'], self.memory['time_col'])
+            self.assertEqual(result['preview'], self.memory['preview'])
+            self.assertEqual(result['histograms'], self.memory['histograms'])
+            for col, stats in self.memory['stats'].items():
+                for name, value in stats.items():
+                    # Medians of the exact paths may round a tie differently
+                    self.assertAlmostEqual(result['stats'][col][name], value, delta=0.011, msg=f"{col} {name}")
+            for col, row in self.memory['correlation'].items():
+                for other, value in row.items():
+                    self.assertAlmostEqual(result['correlation'][col][other], value, places=6)
+
+    def test_store_path_matches_rolling_anomalies_and_chart(self):
+        self.assertEqual(self.stored['anomalies'], self.memory['anomalies'])
+        self.assertEqual(self.stored['groups'], self.memory['groups'])
+        self.assertEqual(self.stored['chart_data'], self.memory['chart_data'])
+
+    def test_chart_is_in_time_order(self):
+        times = [row['Timestamp'] for row in self.stored['chart_data']]
+        self.assertEqual(times, sorted(times))
+        self.assertLessEqual(len(times), downsample.DEFAULT_CHART_POINTS)
+
+    def test_missing_columns_fail_the_same_way(self):
+        path = os.path.join(self.dir, 'other.csv')
+        with open(path, 'w') as f:
+            f.write('A,B\n1,2\n')
+        expected = process_csv_data(path)
+        self.assertFalse(expected['success'])
+        self.assertEqual(process_csv_data(path, chunksize=1), expected)
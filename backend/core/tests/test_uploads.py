@@ -0,0 +1,59 @@
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from core.models import AnalysisResult, ProcessingJob, UploadedFile
+from core.utils import process_csv_data
+from .support import TemporaryMediaMixin, csv_file
+
+
+@mock.patch('core.views.schedule_retention')
+class AnalyseOnUploadTests(TemporaryMediaMixin, TestCase):
+    def test_analysed_in_the_request(self, schedule):
+        with mock.patch('core.metrics.observe_job') as observe:
+            response = self.client.post('/api/upload/', {'file': csv_file('live.csv', rows=300)})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(ProcessingJob.objects.exists())
+        data = response.json()['data']
+        self.assertEqual(data['total_count'], 300)
+        upload = UploadedFile.objects.get(pk=response.json()['file_id'])
+        self.assertEqual(AnalysisResult.objects.get(upload=upload).total_count, 300)
+        self.assertIsNotNone(upload.column_store())
+
+        summary = observe.call_args.args[0]
+        self.assertEqual(summary['status'], ProcessingJob.DONE)
+        self.assertEqual(summary['rows'], 300)
+        self.assertEqual(summary['bytes'], upload.file.size)
+        self.assertTrue({'parse', 'stats', 'store', 'pyramid', 'chart'} <= set(summary['stages']))
+        self.assertAlmostEqual(summary['seconds'], sum(summary['stages'].values()))
+        self.assertIn('parse;dur=', response['Server-Timing'])
+
+    def test_matches_the_job_analysis(self, schedule):
+        response = self.client.post('/api/upload/', {'file': csv_file('live.csv', rows=300)})
+        data = response.json()['data']
+        expected = process_csv_data(UploadedFile.objects.get(pk=response.json()['file_id']).file.path)
+        self.assertEqual(data['stats']['Flowrate']['avg'], expected['stats']['Flowrate']['avg'])
+        self.assertEqual(data['stats']['Pressure']['median'], expected['stats']['Pressure']['median'])
+        self.assertEqual(data['anomaly_count'], expected['anomaly_count'])
+
+    @override_settings(ANALYSIS_JOBS={'EAGER': True, 'FINISH_IN_REQUEST_BYTES': 1024})
+    def test_big_uploads_are_finished_by_a_job(self, schedule):
+        with mock.patch('core.utils.process_csv_data') as parse, \
+                mock.patch('core.metrics.observe_job') as observe:
+            response = self.client.post('/api/upload/', {'file': csv_file('big.csv', rows=300)})
+        self.assertEqual(response.status_code, 202)
+        # The store written while the file arrived is analysed; the CSV is not parsed again
+        parse.assert_not_called()
+        job = ProcessingJob.objects.get(pk=response.json()['job_id'])
+        self.assertEqual(job.status, ProcessingJob.DONE)
+        self.assertEqual(job.result['total_count'], 300)
+        self.assertEqual(observe.call_count, 1)
+        self.assertIn('parse;dur=', response['Server-Timing'])
+
+    @override_settings(ANALYSIS_JOBS={'EAGER': True, 'FINISH_IN_REQUEST_BYTES': 0})
+    def test_unusable_file_handed_over_fails_in_the_job(self, schedule):
+        unusable = SimpleUploadedFile('big.csv', b'Equipment Name,Flowrate\nPump-1,1.5\n', 'text/csv')
+        response = self.client.post('/api/upload/', {'file': unusable})
+        self.assertEqual(response.status_code, 202)
+        job = ProcessingJob.objects.get(pk=response.json()['job_id'])
+        self.assertEqual(job.status, ProcessingJob.FAILED)
+        self.assertIsNone(UploadedFile.objects.get(pk=response.json()['file_id']).column_store())
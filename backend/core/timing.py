@@ -0,0 +1,71 @@
+import contextvars
+import time
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar('timings', default=None)
+
+
+class Timings:
+    """
+    Wall-clock seconds per named pipeline stage, in first-seen order. A stage
+    entered several times (e.g. once per chunk) adds up. Code records into
+    whichever Timings is active, so the analysis functions need no extra arguments.
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def include(self, stages, prefix=''):
+        # Stages measured elsewhere (e.g. a finished job), as {name: seconds}
+        for name, seconds in (stages or {}).items():
+            self.add(prefix + name, seconds)
+
+    @contextmanager
+    def activate(self):
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    def to_dict(self, decimals=4):
+        return {name: round(seconds, decimals) for name, seconds in self.stages.items()}
+
+    def header(self, total=None):
+        """Server-Timing header value (durations in milliseconds)."""
+        entries = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in self.stages.items()]
+        if total is not None:
+            entries.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(entries)
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def stage(name):
+    """Times the block into the active Timings (does nothing when none is active)."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+def timed(iterable, name):
+    # Times each step of an iterator (e.g. parsing the next CSV chunk) into `name`
+    iterator = iter(iterable)
+    while True:
+        with stage(name):
+            item = next(iterator, StopIteration)
+        if item is StopIteration:
+            return
+        yield item
@@ -0,0 +1,88 @@
+import hashlib
+import os
+import uuid
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """
+    Computes the SHA-256 of every uploaded file while its chunks arrive and
+    passes the bytes on unchanged to the next handler (memory or temp file).
+    Digests are kept per form field in `self.digests`; fields carrying several
+    files (batch uploads) also get every digest, in order, in `self.digest_lists`.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.digests = {}
+        self.digest_lists = {}
+        self._hasher = None
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self._hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self._hasher.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        self.digests[self.field_name] = self._hasher.hexdigest()
+        self.digest_lists.setdefault(self.field_name, []).append(self.digests[self.field_name])
+        # Let the next handler build the actual UploadedFile
+        return None
+
+
+class AnalysingUploadHandler(HashingUploadHandler):
+    """
+    Also analyses the first file of `field` while it arrives: each piece goes
+    through streaming.IncrementalAnalysis (parse, statistics, column store),
+    so only the store-side passes are left when the last byte lands. The bytes
+    still go on to the next handler, which writes the file to disk as before.
+
+    `analysis` is ready for finish() after the upload; it is None when the
+    file could not be analysed on the fly (the error is in `error`), in which
+    case the upload is analysed by a job as usual.
+    """
+
+    def __init__(self, request=None, field='file'):
+        super().__init__(request)
+        self.field = field
+        self.analysis = None
+        self.error = None
+        self._started = False
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        if field_name == self.field and not self._started:
+            # Imported here so batch uploads and other requests do not need pandas
+            from .streaming import IncrementalAnalysis
+            self._started = True
+            tmp_dir = os.path.join(settings.MEDIA_ROOT, 'columnar', f'upload-{uuid.uuid4().hex}')
+            self.analysis = IncrementalAnalysis(tmp_dir)
+            self._current = self.analysis
+        else:
+            self._current = None
+
+    def receive_data_chunk(self, raw_data, start):
+        raw_data = super().receive_data_chunk(raw_data, start)
+        if self._current is not None:
+            try:
+                self._current.feed(raw_data)
+            except Exception as e:
+                self._give_up(e)
+        return raw_data
+
+    def file_complete(self, file_size):
+        self._current = None
+        return super().file_complete(file_size)
+
+    def upload_interrupted(self):
+        self._give_up(None)
+
+    def _give_up(self, error):
+        if self.analysis is not None:
+            self.analysis.abort()
+        self.analysis = self._current = None
+        self.error = error
@@ -1,33 +1,80 @@
 import pandas as pd
 import numpy as np
+from .anomalies import frame_anomalies
+from .columnar import ColumnStoreWriter
+from .downsample import DEFAULT_CHART_POINTS, downsample_indices
+from .groups import GroupStats
+from .parsing import read_csv_typed
+from .schema import GROUP_COLS, find_time_col, normalize_columns
+from .sketches import QUANTILES, ColumnSketches
+from .timing import stage
+from .streaming import (CHUNK_ROWS, STREAMING_THRESHOLD_BYTES, CoMoments, RunningMoments,
+                        partial_aggregates, process_csv_stream, process_store_stream, should_stream)
 
-def process_csv_data(file_path):
+def process_csv_data(file_path, chunksize=None, progress=None, store_dir=None):
+    # Large files (or an explicit chunksize) go through the bounded-memory engine
+    if chunksize or should_stream(file_path):
+        return process_csv_stream(file_path, chunksize or CHUNK_ROWS, progress, store_dir)
+
+    try:
+        # 1. Load Data (declared schema, only the columns the analysis uses)
+        with stage('parse'):
+            df = read_csv_typed(file_path)
+        return analyse_dataframe(df, store_dir)
+
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+def process_column_store(store, progress=None):
+    # Re-analyse an ingested dataset from its memory-mapped columns (no CSV parsing)
+    if store.nbytes > STREAMING_THRESHOLD_BYTES:
+        return process_store_stream(store, CHUNK_ROWS, progress)
     try:
-        # 1. Load Data
-        df = pd.read_csv(file_path)
-        # Clean headers: " Flowrate " -> "Flowrate"
-        df.columns = [c.strip().title() for c in df.columns]
-
-        # 2. Validation
-        required_cols = ['Flowrate', 'Pressure', 'Temperature']
-        missing = [col for col in required_cols if col not in df.columns]
-        if missing:
-            return {"success": False, "error": f"Missing columns: {', '.join(missing)}"}
-
-        # 3. Handle Time Series
+        with stage('read'):
+            df = store.frame()
+        return analyse_dataframe(df)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+def analyse_dataframe(df, store_dir=None):
+    # Clean headers: " Flowrate " -> "Flowrate"
+    df.columns = normalize_columns(df.columns)
+
+    # 2. Validation
+    required_cols = ['Flowrate', 'Pressure', 'Temperature']
+    missing = [col for col in required_cols if col not in df.columns]
+    if missing:
+        return {"success": False, "error": f"Missing columns: {', '.join(missing)}"}
+
+    # Keep a columnar copy (file order) so later requests skip CSV parsing
+    if store_dir:
+        with stage('store'):
+            writer = ColumnStoreWriter(store_dir)
+            writer.append(df)
+            writer.close()
+
+    # Rolling z-scores per equipment for all three parameters (file order, so before sorting)
+    with stage('anomalies'):
+        rolling_anomalies = frame_anomalies(df, find_time_col(df.columns))
+
+    # 3. Handle Time Series
+    with stage('sort'):
         time_col = next((col for col in df.columns if col in ['Time', 'Timestamp', 'Date', 'Hour']), None)
         if time_col:
             df.sort_values(by=time_col, inplace=True)
-            # Downsample for charts (take 1 point every 10 rows to prevent lag)
-            chart_data = df.iloc[::10].to_dict(orient='records')
         else:
             # If no time, just create a dummy index for plotting
             df['Index'] = range(1, len(df) + 1)
-            chart_data = df.iloc[::10].to_dict(orient='records')
             time_col = 'Index'
+    # Downsample for charts: LTTB keeps shape and spikes within a fixed point budget
+    with stage('chart'):
+        picks = downsample_indices(df, DEFAULT_CHART_POINTS)
+        chart_data = df.iloc[picks].replace({np.nan: None}).to_dict(orient='records')
 
-        # 4. Advanced Statistics Calculation
+    # 4. Advanced Statistics Calculation
+    with stage('stats'):
         stats = {}
+        sketches = ColumnSketches()
         for col in required_cols:
             stats[col] = {
                 'avg': round(df[col].mean(), 2),
@@ -36,23 +83,46 @@ def process_csv_data(file_path):
                 'max': round(df[col].max(), 2),
                 'median': round(df[col].median(), 2)
             }
+            # Exact percentiles here; the sketches are stored so uploads can be merged later
+            for name, q in QUANTILES.items():
+                stats[col][name] = round(df[col].quantile(q), 2)
+            sketches.update(col, df[col].to_numpy(dtype=float))
 
-        # 5. Correlation Analysis (Professional Feature)
-        # Calculates how much Flowrate and Pressure affect each other (-1 to 1)
+    # Same breakdowns per Type / Equipment Name (one bincount-style reduction per column)
+    with stage('groups'):
+        groups = {key: GroupStats(key) for key in GROUP_COLS if key in df.columns}
+        for group in groups.values():
+            group.update(df)
+
+    # 5. Correlation Analysis (Professional Feature)
+    # Calculates how much Flowrate and Pressure affect each other (-1 to 1)
+    with stage('corr'):
         correlation_matrix = df[required_cols].corr().round(2).to_dict()
 
-        # 6. Anomaly Detection (Safety Check)
-        # "Critical" if value is > Mean + 2 Standard Deviations
+    # Exact, mergeable per-upload aggregates for cross-upload queries
+    with stage('partials'):
+        moments = {col: RunningMoments() for col in required_cols}
+        for col in required_cols:
+            moments[col].update(df[col].to_numpy(dtype=float))
+        comoments = CoMoments(required_cols)
+        comoments.update(df)
+
+    # 6. Anomaly Detection (Safety Check)
+    # "Critical" if value is > Mean + 2 Standard Deviations
+    with stage('threshold'):
         pressure_limit = stats['Pressure']['avg'] + (2 * stats['Pressure']['std'])
         anomalies = df[df['Pressure'] > pressure_limit]
         anomaly_count = len(anomalies)
+        for group in groups.values():
+            group.add_anomalies(df[group.key], (df['Pressure'] > pressure_limit).to_numpy())
 
-        # 7. Distribution for Pie Chart
-        if 'Type' in df.columns:
-            distribution = df['Type'].value_counts().to_dict()
-        else:
-            distribution = {}
+    # 7. Distribution for Pie Chart
+    if 'Type' in df.columns:
+        distribution = df['Type'].value_counts().to_dict()
+    else:
+        distribution = {}
 
+    with stage('serialize'):
         return {
             "success": True,
             "total_count": len(df),
@@ -61,9 +131,11 @@ def process_csv_data(file_path):
             "distribution": distribution,
             "preview": df.head(5).replace({np.nan: None}).to_dict(orient='records'),
             "anomaly_count": anomaly_count,
+            "anomalies": rolling_anomalies,
+            "groups": {key: group.result(rolling_anomalies) for key, group in groups.items()},
             "chart_data": chart_data,        # NEW: For Line/Scatter charts
-            "time_col": time_col
+            "time_col": time_col,
+            "histograms": sketches.histogram_json(),
+            "sketches": sketches.to_dict(),
+            "partials": partial_aggregates(moments, comoments)
         }
-
-    except Exception as e:
-        return {"success": False, "error": str(e)}
\ No newline at end of file
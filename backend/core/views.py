@@ -1,41 +1,532 @@
+import numpy as np
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
-from .models import UploadedFile
-from .serializers import FileUploadSerializer
-from .utils import process_csv_data
+from rest_framework.exceptions import ValidationError
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.views import View
+from . import metrics
+from .models import UploadedFile, UploadBatch, AnalysisResult, ProcessingJob, json_safe, public_result
+from .serializers import FileUploadSerializer, HistorySerializer, HistoryDetailSerializer, JobSerializer
+from .aggregates import combine_analyses
+from .anomalies import MAX_LISTED_ROWS, ROLLING_WINDOW, Z_THRESHOLD, store_anomalies
+from .cache import get_cached_result, is_cached, store_result
+from .conditional import conditional
+from .downsample import DEFAULT_CHART_POINTS, MAX_CHART_POINTS, METHODS, chart_from_store
+from .payloads import SHAPES, shape_result
+from .jobs import enqueue, jobs_setting
+from .pyramid import Pyramid, build_pyramid
+from .retention import schedule as schedule_retention
+from .rows import MAX_PAGE_ROWS, page
+from .schema import REQUIRED_COLS
+from .sketches import ColumnSketches
+from .timing import current, stage
+from .uploadhandlers import AnalysingUploadHandler, HashingUploadHandler
+
+def chart_options(request):
+    # ?points=N&method=lttb|minmax, validated
+    try:
+        points = int(request.query_params.get('points', DEFAULT_CHART_POINTS))
+    except ValueError:
+        raise ValidationError({"points": "Must be an integer."})
+    if not 3 <= points <= MAX_CHART_POINTS:
+        raise ValidationError({"points": f"Must be between 3 and {MAX_CHART_POINTS}."})
+    method = request.query_params.get('method', 'lttb')
+    if method not in METHODS:
+        raise ValidationError({"method": f"Must be one of: {', '.join(METHODS)}."})
+    return points, method
+
+def result_shape(request):
+    # ?shape=records|columns; binary (msgpack) responses default to columns
+    shape = request.query_params.get('shape')
+    if shape is None:
+        return 'columns' if getattr(request.accepted_renderer, 'format', None) == 'msgpack' else 'records'
+    if shape not in SHAPES:
+        raise ValidationError({"shape": f"Must be one of: {', '.join(SHAPES)}."})
+    return shape
+
+def upload_version(pk):
+    # Results are a function of the uploaded bytes, so the hash versions them
+    return UploadedFile.objects.filter(pk=pk).values_list('pk', 'sha256', 'analysis__pk').first()
+
+def history_version():
+    return list(UploadedFile.objects.order_by('-uploaded_at').values_list('pk', 'sha256', 'analysis__pk')[:5])
+
+def job_version(pk):
+    return ProcessingJob.objects.filter(pk=pk).values_list(
+        'pk', 'status', 'progress', 'finished_at', 'upload__sha256').first()
+
+def lookup_version(sha256):
+    # The newest upload of these bytes (its file_id is in the response) and the newest analysis of them
+    digest = sha256.lower()
+    uploads = UploadedFile.objects.filter(sha256=digest).order_by('-uploaded_at', '-pk')
+    latest = uploads.values_list('pk', flat=True).first()
+    if latest is None:
+        return None
+    analyses = AnalysisResult.objects.filter(upload__sha256=digest).order_by('-pk')
+    return latest, analyses.values_list('pk', flat=True).first()
+
+def with_chart(request, upload, result):
+    # Re-sample chart_data from the column store when the client asks for a point budget
+    if result and ('points' in request.query_params or 'method' in request.query_params):
+        points, method = chart_options(request)
+        store = upload.column_store()
+        if store is not None:
+            result = dict(result, chart_data=chart_from_store(store, points, method))
+    return result
+
+def stored_result(digest):
+    """
+    The analysis of these bytes when the cache entry was evicted or never written:
+    the summary kept in AnalysisResult, with the chart, preview and anomalies
+    re-read from the column store. Stored in the cache again; None if either is gone.
+    """
+    analysis = AnalysisResult.objects.filter(upload__sha256=digest).select_related('upload').order_by('-pk').first()
+    store = analysis.upload.column_store() if analysis is not None else None
+    if store is None:
+        return None
+    # Earliest five rows by time, like the analysis itself (rows without a time sort first
+    # in the pyramid's order, as NaT, and are skipped)
+    pyramid = Pyramid.open(store)
+    rows = np.arange(min(5, store.rows))
+    if pyramid is not None and pyramid.order is not None:
+        start = 0
+        if store.kind(pyramid.time_col) == 'datetime':
+            start = int(np.searchsorted(pyramid.times, np.iinfo(np.int64).min, side='right'))
+        rows = np.asarray(pyramid.order[start:start + 5])
+    preview = store.take(rows)
+    if not store.time_col:
+        preview['Index'] = rows + 1
+    sketches = analysis.column_sketches()
+    result = json_safe({
+        "success": True,
+        "total_count": analysis.total_count,
+        "stats": analysis.stats,
+        "correlation": analysis.correlation,
+        "distribution": analysis.distribution,
+        "preview": preview.astype(object).where(preview.notna(), None).to_dict(orient='records'),
+        "anomaly_count": analysis.anomaly_count,
+        "anomalies": store_anomalies(store),
+        "groups": analysis.groups,
+        "chart_data": chart_from_store(store),
+        "time_col": analysis.time_col or 'Index',
+        "histograms": sketches.histogram_json() if sketches else None,
+        # Kept for merging, so later uploads served from this entry still count in aggregates
+        "sketches": analysis.sketches,
+        "partials": analysis.partials,
+    })
+    store_result(digest, result)
+    return result
+
+def include_analysis_timings(analysis):
+    # The upload's parse/stats/store stages (and the store passes) in the Server-Timing header
+    timings = current()
+    if timings is not None:
+        timings.include(analysis.timings.stages)
+
+def observe_analysis(analysis, result, size):
+    # Same summary as jobs.run_job, so analyses finished in a request show up in the
+    # analysis_* metrics too. No peak memory: the web process's is shared by every request
+    stages = analysis.timings.stages
+    metrics.observe_job({
+        'status': ProcessingJob.DONE if result['success'] else ProcessingJob.FAILED,
+        'seconds': sum(stages.values()),
+        'stages': stages,
+        'rows': result.get('total_count'),
+        'bytes': size,
+        'peak_memory': None,
+    })
+
+def save_cached_analysis(upload, result):
+    """
+    AnalysisResult for an upload served from the cache. Entries rebuilt before
+    stored_result kept the merge data lack sketches/partials; those come from
+    an earlier analysis of the same bytes.
+    """
+    if not (result.get('sketches') and result.get('partials')):
+        earlier = (AnalysisResult.objects.filter(upload__sha256=upload.sha256).exclude(upload=upload)
+                   .order_by('-pk').values_list('sketches', 'partials'))
+        for sketches, partials in earlier:
+            if sketches and partials:
+                result = dict(result, sketches=sketches, partials=partials)
+                break
+    return AnalysisResult.from_result(upload, result)
 
 class UploadAndProcessView(APIView):
     parser_classes = (MultiPartParser, FormParser)
 
     def post(self, request, *args, **kwargs):
-        file_serializer = FileUploadSerializer(data=request.data)
-        
-        if file_serializer.is_valid():
+        # Hash (and analyse) the upload while it streams in (must be set before request.data is read).
+        # Clients that know the file's hash send it up front, so cached files are not parsed again;
+        # the digest computed from the bytes still decides what is served
+        declared = request.headers.get('X-Content-SHA256', '').lower()
+        if jobs_setting('ANALYSE_ON_UPLOAD') and not (declared and is_cached(declared)):
+            hasher = AnalysingUploadHandler(request)
+        else:
+            hasher = HashingUploadHandler(request)
+        request.upload_handlers.insert(0, hasher)
+        with stage('receive'):
+            data = request.data
+        file_serializer = FileUploadSerializer(data=data)
+        analysis = getattr(hasher, 'analysis', None)
+
+        with stage('validate'):
+            valid = file_serializer.is_valid()
+        if valid:
+            digest = hasher.digests.get('file', '')
+
             # 1. Save file to DB (History)
-            file_instance = file_serializer.save()
-            
-            # 2. Process with Pandas
-            # We pass the file path to our utility function
-            analysis_result = process_csv_data(file_instance.file.path)
-            
-            if analysis_result['success']:
+            with stage('save'):
+                file_instance = file_serializer.save(sha256=digest)
+            # Old uploads are cleaned up in the background
+            schedule_retention()
+
+            # 2. Same bytes analysed before? Serve the stored result without parsing
+            with stage('cache'):
+                cached_result = get_cached_result(digest)
+                if cached_result is not None:
+                    save_cached_analysis(file_instance, cached_result)
+            if cached_result is not None:
+                if analysis is not None:
+                    analysis.abort()
                 return Response({
                     "message": "File processed successfully",
                     "file_id": file_instance.id,
-                    "data": analysis_result
+                    "cached": True,
+                    "data": shape_result(with_chart(request, file_instance, public_result(cached_result)),
+                                         result_shape(request))
                 }, status=200)
-            else:
-                return Response({
-                    "message": "Error processing CSV",
-                    "error": analysis_result['error']
-                }, status=400)
-        
+
+            # 3. Analysed while it arrived: only the column-store passes are left, unless the
+            # file is big enough for them to be handed to a job (which reuses the store)
+            if analysis is not None and file_instance.file.size > jobs_setting('FINISH_IN_REQUEST_BYTES'):
+                try:
+                    analysis.close(file_instance.columnar_dir)
+                except Exception:
+                    analysis.abort()  # the job parses the file itself
+                include_analysis_timings(analysis)
+            elif analysis is not None:
+                result = analysis.finish(file_instance.columnar_dir)
+                include_analysis_timings(analysis)
+                observe_analysis(analysis, result, file_instance.file.size)
+                if result['success']:
+                    with stage('save'):
+                        AnalysisResult.from_result(file_instance, result)
+                        store_result(file_instance.sha256, result)
+                    return Response({
+                        "message": "File processed successfully",
+                        "file_id": file_instance.id,
+                        "cached": False,
+                        "data": shape_result(with_chart(request, file_instance, json_safe(public_result(result))),
+                                             result_shape(request))
+                    }, status=200)
+
+            # 4. Otherwise queue the pandas analysis; the client polls the job for the result
+            with stage('queue'):
+                job = enqueue(file_instance, profile=getattr(request, 'profile', False))
+            return Response({
+                "message": "File queued for processing",
+                "file_id": file_instance.id,
+                "cached": False,
+                "job_id": str(job.pk),
+                "status_url": reverse('job-status', args=[job.pk]),
+            }, status=202)
+
+        if analysis is not None:
+            analysis.abort()
         return Response(file_serializer.errors, status=400)
 
+class DatasetLookupView(APIView):
+    @conditional(lookup_version)
+    def get(self, request, sha256):
+        # Clients hash a file before uploading it; a hit returns the stored result and the upload is skipped
+        digest = sha256.lower()
+        upload = UploadedFile.objects.filter(sha256=digest).order_by('-uploaded_at', '-pk').first()
+        result = None
+        if upload is not None:
+            result = get_cached_result(digest) or stored_result(digest)
+        if result is None:
+            return Response({"error": "No analysis for this file yet"}, status=404)
+        return Response({
+            "message": "File processed successfully",
+            "file_id": upload.id,
+            "cached": True,
+            "data": shape_result(with_chart(request, upload, public_result(result)), result_shape(request))
+        })
+
+class BatchUploadView(APIView):
+    parser_classes = (MultiPartParser, FormParser)
+
+    def post(self, request, *args, **kwargs):
+        # Same flow as UploadAndProcessView, for every file in the `files` field
+        hasher = HashingUploadHandler(request)
+        request.upload_handlers.insert(0, hasher)
+        files = request.FILES.getlist('files')
+        if not files:
+            return Response({"files": ["No files were submitted."]}, status=400)
+        for f in files:
+            file_serializer = FileUploadSerializer(data={'file': f})
+            if not file_serializer.is_valid():
+                return Response({"files": {f.name: file_serializer.errors['file']}}, status=400)
+        # The handler hashed the parts of `files` in the order they arrived, which is the list's order
+        digests = hasher.digest_lists.get('files', [])
+        if len(digests) != len(files):
+            return Response({"files": ["Could not hash every file; upload them again."]}, status=400)
+
+        # 1. Save every file first, so all jobs can start together
+        batch = UploadBatch.objects.create()
+        uploads = []
+        for f, digest in zip(files, digests):
+            upload = UploadedFile(file=f, sha256=digest, batch=batch)
+            upload.save()
+            uploads.append(upload)
+        schedule_retention()
+
+        # 2. Cached files are done already; the rest go to the worker pool in parallel
+        entries = []
+        for upload in uploads:
+            cached_result = get_cached_result(upload.sha256)
+            entry = {"file_id": upload.id, "file_name": upload.file_name, "cached": cached_result is not None}
+            if cached_result is not None:
+                save_cached_analysis(upload, cached_result)
+            else:
+                entry["job_id"] = str(enqueue(upload).pk)
+            entries.append(entry)
+
+        return Response({
+            "message": "Files queued for processing",
+            "batch_id": str(batch.pk),
+            "status_url": reverse('batch-status', args=[batch.pk]),
+            "files": entries
+        }, status=202)
+
+class BatchStatusView(APIView):
+    def get(self, request, pk):
+        # Per-file status/summary, plus one summary over every finished file
+        batch = get_object_or_404(UploadBatch, pk=pk)
+        uploads = batch.files.select_related('analysis').prefetch_related('jobs').order_by('id')
+        files, finished = [], []
+        for upload in uploads:
+            job = max(upload.jobs.all(), key=lambda j: j.created_at, default=None)
+            # Light per-file entry: polled often, so no groups/histograms here (see history detail)
+            entry = HistorySerializer(upload).data
+            # Neither an analysis nor a job: the job was never created (e.g. the server stopped in between)
+            entry.update(stats=None, status=ProcessingJob.FAILED, progress=0.0,
+                         error="File was not analysed; upload it again.")
+            if hasattr(upload, 'analysis'):
+                entry.update(status=ProcessingJob.DONE, progress=1.0, error='', stats=upload.analysis.stats)
+                finished.append(upload.analysis)
+            elif job is not None:
+                entry.update(status=job.status, progress=job.progress, error=job.error)
+            entry['job_id'] = str(job.pk) if job else None
+            files.append(entry)
+
+        pending = [f for f in files if f['status'] in (ProcessingJob.QUEUED, ProcessingJob.RUNNING)]
+        return Response({
+            "batch_id": str(batch.pk),
+            "complete": not pending,
+            "done": len(finished),
+            "failed": sum(f['status'] == ProcessingJob.FAILED for f in files),
+            "files": files,
+            "summary": combine_analyses(finished)
+        })
+
 class HistoryView(APIView):
+    @conditional(history_version)
+    def get(self, request):
+        # Return last 5 uploads with their stored summaries (no CSV is opened)
+        files = UploadedFile.objects.select_related('analysis').order_by('-uploaded_at')[:5]
+        serializer = HistorySerializer(files, many=True)
+        return Response(serializer.data)
+
+class HistoryDetailView(APIView):
+    @conditional(upload_version)
+    def get(self, request, pk):
+        upload = get_object_or_404(UploadedFile.objects.select_related('analysis'), pk=pk)
+        return Response(HistoryDetailSerializer(upload).data)
+
+class JobStatusView(APIView):
+    @conditional(job_version)
+    def get(self, request, pk):
+        job = get_object_or_404(ProcessingJob.objects.select_related('upload'), pk=pk)
+        data = JobSerializer(job).data
+        data['result'] = shape_result(with_chart(request, job.upload, data['result']), result_shape(request))
+        timings = current()
+        if timings is not None:
+            # The analysis stages, next to this request's own timing
+            timings.include(job.timings, prefix='job-')
+        return Response(data)
+
+class DatasetChartView(APIView):
+    @conditional(upload_version)
+    def get(self, request, pk):
+        # chart_data at any point budget, straight from the memory-mapped columns
+        points, method = chart_options(request)
+        upload = get_object_or_404(UploadedFile, pk=pk)
+        store = upload.column_store()
+        if store is None:
+            return Response({"error": "Dataset has not been ingested yet"}, status=404)
+        return Response({
+            "file_id": upload.id,
+            "points": points,
+            "method": method,
+            "time_col": store.time_col or 'Index',
+            "chart_data": chart_from_store(store, points, method, orient=result_shape(request))
+        })
+
+class DatasetSeriesView(APIView):
+    @conditional(upload_version)
+    def get(self, request, pk):
+        # Zoom/pan: min/max/mean buckets for [start, end] sized to `width` pixels
+        upload = get_object_or_404(UploadedFile, pk=pk)
+        store = upload.column_store()
+        if store is None:
+            return Response({"error": "Dataset has not been ingested yet"}, status=404)
+        # Datasets ingested before pyramids existed get one built on first use
+        pyramid = Pyramid.open(store) or build_pyramid(store)
+
+        try:
+            width = int(request.query_params.get('width', 1000))
+        except ValueError:
+            raise ValidationError({"width": "Must be an integer."})
+        if not 10 <= width <= 10_000:
+            raise ValidationError({"width": "Must be between 10 and 10000."})
+        bounds = {}
+        for name in ('start', 'end'):
+            try:
+                bounds[name] = pyramid.parse_x(request.query_params.get(name))
+            except (ValueError, TypeError):
+                raise ValidationError({name: "Not a valid time or Index value."})
+
+        return Response({
+            "file_id": upload.id,
+            "time_col": pyramid.time_col or 'Index',
+            **pyramid.query(bounds['start'], bounds['end'], width)
+        })
+
+class DatasetAnomaliesView(APIView):
+    @conditional(upload_version)
+    def get(self, request, pk):
+        # Rolling z-score anomalies per equipment, recomputed from the column store
+        upload = get_object_or_404(UploadedFile, pk=pk)
+        store = upload.column_store()
+        if store is None:
+            return Response({"error": "Dataset has not been ingested yet"}, status=404)
+        params = request.query_params
+        try:
+            window = int(params.get('window', ROLLING_WINDOW))
+            threshold = float(params.get('threshold', Z_THRESHOLD))
+            offset = int(params.get('offset', 0))
+            limit = int(params.get('limit', MAX_LISTED_ROWS))
+        except ValueError:
+            raise ValidationError({"detail": "window, offset and limit must be integers; threshold a number."})
+        if not 2 <= window <= 100_000:
+            raise ValidationError({"window": "Must be between 2 and 100000."})
+        if not threshold > 0:
+            raise ValidationError({"threshold": "Must be positive."})
+        if offset < 0 or not 0 <= limit <= 100_000:
+            raise ValidationError({"limit": "offset must be >= 0 and limit between 0 and 100000."})
+
+        return Response({
+            "file_id": upload.id,
+            "offset": offset,
+            **store_anomalies(store, window, threshold, offset, limit)
+        })
+
+class DatasetRowsView(APIView):
+    @conditional(upload_version)
+    def get(self, request, pk):
+        # Raw rows, a page at a time, optionally sorted by one column (?sort=Pressure&order=desc)
+        upload = get_object_or_404(UploadedFile, pk=pk)
+        store = upload.column_store()
+        if store is None:
+            return Response({"error": "Dataset has not been ingested yet"}, status=404)
+        params = request.query_params
+        try:
+            offset = int(params.get('offset', 0))
+            limit = int(params.get('limit', 100))
+        except ValueError:
+            raise ValidationError({"detail": "offset and limit must be integers."})
+        if offset < 0 or not 0 <= limit <= MAX_PAGE_ROWS:
+            raise ValidationError({"limit": f"offset must be >= 0 and limit between 0 and {MAX_PAGE_ROWS}."})
+        sort = params.get('sort') or None
+        if sort is not None and sort not in store.columns:
+            raise ValidationError({"sort": f"Must be one of: {', '.join(store.columns)}."})
+        order = params.get('order', 'asc')
+        if order not in ('asc', 'desc'):
+            raise ValidationError({"order": "Must be asc or desc."})
+
+        return Response({
+            "file_id": upload.id,
+            "offset": offset,
+            "sort": sort,
+            "order": order,
+            **page(store, offset, limit, sort, order == 'desc', result_shape(request))
+        })
+
+class MergedStatsView(APIView):
+    def get(self, request):
+        # Percentiles/histograms over several uploads, merged from stored sketches (no raw data read)
+        analyses = AnalysisResult.objects.all()
+        ids = request.query_params.get('ids')
+        if ids:
+            try:
+                analyses = analyses.filter(upload_id__in=[int(i) for i in ids.split(',') if i.strip()])
+            except ValueError:
+                raise ValidationError({"ids": "Must be a comma-separated list of file ids."})
+
+        merged, used, missing = ColumnSketches(), [], []
+        for analysis in analyses.order_by('upload_id'):
+            sketches = analysis.column_sketches()
+            if sketches is None:
+                missing.append(analysis.upload_id)
+                continue
+            merged.merge(sketches)
+            used.append(analysis.upload_id)
+
+        return Response({
+            "file_ids": used,
+            "missing": missing,
+            "stats": {col: {"count": merged.quantiles[col].n, **merged.percentiles(col)} for col in REQUIRED_COLS},
+            "histograms": merged.histogram_json()
+        })
+
+class AggregateView(APIView):
+    def get(self, request):
+        # Fleet-wide stats over uploads in [start, end], merged from stored partial aggregates
+        analyses = AnalysisResult.objects.all()
+        for name, lookup in (('start', 'gte'), ('end', 'lte')):
+            value = request.query_params.get(name)
+            if not value:
+                continue
+            try:
+                day = parse_date(value)
+                moment = None if day else parse_datetime(value)
+            except ValueError:
+                day = moment = None
+            if day is not None:
+                # Whole days, inclusive at both ends
+                analyses = analyses.filter(**{f"upload__uploaded_at__date__{lookup}": day})
+            elif moment is not None:
+                if timezone.is_naive(moment):
+                    moment = timezone.make_aware(moment)
+                analyses = analyses.filter(**{f"upload__uploaded_at__{lookup}": moment})
+            else:
+                raise ValidationError({name: "Must be a date (YYYY-MM-DD) or ISO datetime."})
+
+        analyses = analyses.order_by('upload_id')
+        return Response({
+            "start": request.query_params.get('start'),
+            "end": request.query_params.get('end'),
+            "file_ids": [a.upload_id for a in analyses],
+            **combine_analyses(analyses)
+        })
+
+class MetricsView(View):
     def get(self, request):
-        # Return last 5 uploads
-        files = UploadedFile.objects.all().order_by('-uploaded_at')[:5]
-        serializer = FileUploadSerializer(files, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        # Prometheus text exposition format (scraped, so plain Django rather than a DRF view)
+        return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,14 @@
+# Entry points for pool processes. Spawned workers unpickle these before Django
+# is configured, so nothing Django-related may be imported at module level here.
+import os
+
+
+def init_worker():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    import django
+    django.setup()
+
+
+def execute_job(job_id, profile=False):
+    from .jobs import run_job
+    return run_job(job_id, profile)
@@ -0,0 +1,69 @@
+# gunicorn settings, read automatically when gunicorn starts in this directory:
+#   gunicorn backend.wsgi
+# Environment: PORT, WEB_CONCURRENCY (workers), GUNICORN_THREADS, GUNICORN_TIMEOUT.
+import os
+import shutil
+import tempfile
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.production')
+
+wsgi_app = 'backend.wsgi:application'
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# Threads per worker: request threads mostly wait on the network, SQLite or the job pool.
+# Uploads analysed on the fly are CPU-bound, so workers (processes) scale those.
+workers = int(os.environ.get('WEB_CONCURRENCY', min(4, max(2, os.cpu_count() or 1))))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+# production.py sizes each worker's analysis pool from this
+os.environ['WEB_CONCURRENCY'] = str(workers)
+
+# Large uploads are parsed while they arrive; allow for slow clients
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 300))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then so pandas/numpy memory fragmentation cannot build up
+max_requests = 2000
+max_requests_jitter = 200
+
+# Worker heartbeat files on tmpfs where available (a slow disk can stall workers)
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+# Directory the workers share their metrics through (production.py reads it). Created per
+# server start in on_starting, so the counters start from zero like a single process would
+metrics_parent = worker_tmp_dir if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    if not os.environ.get('METRICS_DIR'):
+        os.environ['METRICS_DIR'] = tempfile.mkdtemp(prefix='metrics-', dir=metrics_parent)
+        server.metrics_dir = os.environ['METRICS_DIR']
+
+
+def on_exit(server):
+    # Only a directory on_starting created; one given through the environment is left alone
+    if getattr(server, 'metrics_dir', None):
+        shutil.rmtree(server.metrics_dir, ignore_errors=True)
+
+
+def worker_exit(server, worker):
+    # Last numbers of a recycled or stopped worker (the next scrape folds them into the archive)
+    from core import metrics
+    metrics.flush()
+
+
+def post_worker_init(worker):
+    # Jobs queued or running in workers that have exited (restart, max_requests) are picked up again
+    from django.db import connection
+    from core.jobs import recover_jobs
+    try:
+        requeued, failed = recover_jobs()
+        if requeued or failed:
+            worker.log.info("Recovered jobs: %d requeued, %d failed", requeued, failed)
+    finally:
+        connection.close()
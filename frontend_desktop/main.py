@@ -1,6 +1,16 @@
+import hashlib
+import io
+import multiprocessing
+import pickle
 import sys
+import uuid
 import requests
 import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from requests.adapters import HTTPAdapter
+import numpy as np
+import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
@@ -8,14 +18,556 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QHBoxLayout, QPushButton, QLabel, QFileDialog, 
                              QMessageBox, QTableWidget, QTableWidgetItem, 
                              QHeaderView, QFrame, QScrollArea, QTabWidget, 
-                             QCheckBox, QGridLayout, QSplitter)
-from PyQt5.QtCore import Qt, QTimer
+                             QCheckBox, QGridLayout, QSplitter, QProgressBar, QTableView)
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QAbstractTableModel
 from PyQt5.QtGui import QFont, QIcon, QColor
 
 # --- Configuration ---
 # Pointing to Localhost Backend
 API_BASE = "http://127.0.0.1:8000/api/"
 
+# One keep-alive connection pool for every call (GUI and worker threads)
+SESSION = requests.Session()
+SESSION.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=8))
+SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
+# Analysis results of files seen before, by SHA-256 of the file (newest RESULT_CACHE_SIZE kept)
+RESULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.chemical-visualizer', 'results-v2')
+RESULT_CACHE_SIZE = 100
+
+# Offline mode runs the backend's analysis engine (backend/core/engine.py) in local worker processes
+ENGINE_DIR = os.environ.get('CHEMVIZ_BACKEND_DIR',
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+ENGINE_WORKERS = min(4, os.cpu_count() or 1)
+
+try:
+    # Optional: binary API responses whose chart columns decode straight into NumPy arrays
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Analysis results are requested one array per column (msgpack when available, else JSON)
+RESULT_PARAMS = {'shape': 'columns'}
+RESULT_HEADERS = {'Accept': 'application/msgpack, application/json;q=0.9'} if msgpack else {}
+NDARRAY_EXT = 1  # msgpack ext type: 3-byte dtype string + raw array bytes
+
+# Seconds to wait for the history list (the window waits for the request when it closes)
+HISTORY_TIMEOUT = 10
+
+# Above this many points the scatter is drawn as one marker path instead of a PathCollection
+DENSE_POINTS = 20_000
+# Longer lines are reduced to a min/max envelope of LINE_BUCKETS buckets (wider than any chart in pixels)
+LINE_BUCKETS = 2_000
+# Render very long lines in chunks (Agg refuses single paths that are too complex)
+matplotlib.rcParams['agg.path.chunksize'] = 20_000
+
+
+def decode_ext(code, data):
+    if code == NDARRAY_EXT:
+        return np.frombuffer(data[3:], dtype=data[:3].decode())
+    return msgpack.ExtType(code, data)
+
+
+def decode(response):
+    # msgpack or JSON body, whichever the server sent
+    if msgpack and response.headers.get('Content-Type', '').startswith('application/msgpack'):
+        return msgpack.unpackb(response.content, raw=False, ext_hook=decode_ext)
+    return response.json()
+
+
+class UploadCancelled(Exception):
+    pass
+
+
+# url -> (ETag, decoded body) of the last 200 response
+ETAG_CACHE = {}
+
+
+def conditional_get(url, params=None, headers=None, timeout=None):
+    # GET that sends If-None-Match and reuses the cached body on 304; None on errors
+    key = url + '?' + '&'.join(f'{k}={v}' for k, v in sorted((params or {}).items()))
+    cached = ETAG_CACHE.get(key)
+    headers = dict(headers or {})
+    if cached:
+        headers['If-None-Match'] = cached[0]
+    response = SESSION.get(url, params=params, headers=headers, timeout=timeout)
+    if response.status_code == 304 and cached:
+        return cached[1]
+    if response.status_code != 200:
+        return None
+    body = decode(response)
+    if response.headers.get('ETag'):
+        ETAG_CACHE[key] = (response.headers['ETag'], body)
+    return body
+
+
+def file_digest(path, cancelled=lambda: False):
+    # SHA-256 of the file, the same key the server caches analyses under
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            if cancelled():
+                raise UploadCancelled()
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_cached_result(digest):
+    # {'data': result, 'file_id': server-side id or None}, or None when not cached
+    path = os.path.join(RESULT_CACHE_DIR, digest + '.pickle')
+    try:
+        with open(path, 'rb') as f:
+            result = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+    os.utime(path)  # least recently used goes first
+    return result
+
+
+def save_cached_result(digest, result, file_id=None):
+    try:
+        os.makedirs(RESULT_CACHE_DIR, exist_ok=True)
+        tmp = os.path.join(RESULT_CACHE_DIR, f'{digest}.{uuid.uuid4().hex}.tmp')
+        with open(tmp, 'wb') as f:
+            pickle.dump({'data': result, 'file_id': file_id}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, os.path.join(RESULT_CACHE_DIR, digest + '.pickle'))
+        entries = sorted((e for e in os.scandir(RESULT_CACHE_DIR) if e.name.endswith('.pickle')),
+                         key=lambda e: e.stat().st_mtime, reverse=True)
+        for entry in entries[RESULT_CACHE_SIZE:]:
+            os.remove(entry.path)
+    except OSError:
+        pass  # the cache is only a shortcut
+
+
+def drop_cached_result(digest):
+    try:
+        os.remove(os.path.join(RESULT_CACHE_DIR, digest + '.pickle'))
+    except OSError:
+        pass
+
+
+def dataset_exists(file_id):
+    # Whether the server still has this upload (retention removes old ones); raises when it is unreachable
+    return SESSION.head(API_BASE + f"history/{file_id}/").status_code != 404
+
+
+def minmax_envelope(y, buckets=LINE_BUCKETS):
+    # (x, y) with the min and max of each of `buckets` equal slices: the same picture as the full line
+    if len(y) <= 4 * buckets:
+        return np.arange(len(y)), y
+    starts = np.linspace(0, len(y), buckets, endpoint=False).astype(np.int64)
+    x = np.repeat(starts, 2)
+    env = np.empty(2 * buckets)
+    env[0::2] = np.fmin.reduceat(y, starts)  # fmin/fmax skip NaN gaps
+    env[1::2] = np.fmax.reduceat(y, starts)
+    return x, env
+
+
+_engine_pool = None
+
+
+def local_engine():
+    # Process pool for offline analysis, or None when the engine (or pandas) is not available
+    global _engine_pool
+    if _engine_pool is None:
+        if ENGINE_DIR not in sys.path:
+            sys.path.insert(0, ENGINE_DIR)  # spawned workers get the same sys.path
+        try:
+            import core.engine  # noqa: F401
+        except ImportError:
+            return None
+        # 'spawn': children must not inherit the Qt application
+        _engine_pool = ProcessPoolExecutor(max_workers=ENGINE_WORKERS,
+                                           mp_context=multiprocessing.get_context('spawn'))
+    return _engine_pool
+
+
+def analyse_locally(path, cancelled=lambda: False):
+    # Same result structure as the upload endpoint's "data"; the GUI thread never waits on this
+    from core.engine import analyse_file
+    future = local_engine().submit(analyse_file, path, RESULT_PARAMS['shape'])
+    while True:
+        if cancelled():
+            future.cancel()  # a running analysis finishes in its worker; the result is dropped
+            raise UploadCancelled()
+        try:
+            return future.result(timeout=0.2)
+        except FutureTimeout:
+            pass
+
+
+def chart_columns(chart_data):
+    # {name: values} already, or row dicts from a server without ?shape support
+    if isinstance(chart_data, dict):
+        return chart_data
+    names = chart_data[0].keys() if chart_data else []
+    return {name: [row.get(name) for row in chart_data] for name in names}
+
+
+def disposition_filename(name):
+    # Quoted filename in Content-Disposition (RFC 7578 / HTML form encoding): a quote or line
+    # break would end the header early, so they are percent-encoded; the rest is sent as UTF-8
+    return name.replace('"', '%22').replace('\r', '%0D').replace('\n', '%0A')
+
+
+class MultipartBody:
+    """
+    multipart/form-data body for one or more files, read from disk while
+    requests sends it, so large files never sit in memory. Calls
+    progress(sent, total) as it goes; once `cancelled` is set the next read
+    raises UploadCancelled, which aborts the transfer.
+    """
+
+    def __init__(self, paths, progress, field='file'):
+        self.boundary = uuid.uuid4().hex
+        self.parts = []
+        self.total = 0
+        for path in [paths] if isinstance(paths, str) else paths:
+            name = disposition_filename(os.path.basename(path))
+            head = (f'--{self.boundary}\r\nContent-Disposition: form-data; name="{field}"; '
+                    f'filename="{name}"\r\nContent-Type: text/csv\r\n\r\n').encode()
+            self.parts += [io.BytesIO(head), open(path, 'rb'), io.BytesIO(b'\r\n')]
+            self.total += len(head) + os.path.getsize(path) + 2
+        tail = f'--{self.boundary}--\r\n'.encode()
+        self.parts.append(io.BytesIO(tail))
+        self.total += len(tail)
+        self.sent = 0
+        self.progress = progress
+        self.cancelled = False
+
+    @property
+    def content_type(self):
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def __len__(self):
+        return self.total
+
+    def read(self, size=-1):
+        if self.cancelled:
+            raise UploadCancelled()
+        chunks = []
+        while self.parts and (size < 0 or size > 0):
+            chunk = self.parts[0].read(size)
+            if not chunk:
+                self.parts.pop(0).close()
+                continue
+            chunks.append(chunk)
+            if size > 0:
+                size -= len(chunk)
+        data = b''.join(chunks)
+        self.sent += len(data)
+        self.progress(self.sent, self.total)
+        return data
+
+    def close(self):
+        for part in self.parts:
+            part.close()
+        self.parts = []
+
+
+class UploadWorker(QThread):
+    """
+    Uploads one CSV off the GUI thread and waits for its analysis (polling the
+    job when the server queued one). Everything comes back through signals, so
+    the window stays responsive; cancel() aborts the transfer or the wait.
+
+    The file is hashed first: results already in the local cache only cost a
+    HEAD (is the upload still on the server?), and ones the server has
+    analysed before cost one GET instead of the upload. With `local` (or when the backend cannot be
+    reached) the file is analysed on this computer instead.
+    """
+    progress = pyqtSignal(int)       # percent of the file sent
+    status = pyqtSignal(str)
+    result = pyqtSignal(object)      # the analysis result, for render_data
+    dataset = pyqtSignal(int)        # server-side file id, when there is one (for the row browser)
+    failed = pyqtSignal(str)
+
+    def __init__(self, path, local=False):
+        super().__init__()
+        self.path = path
+        self.local = local
+        self.cancelled = False
+        self.body = None
+        self.digest = None
+        self.percent = -1
+
+    def cancel(self):
+        self.cancelled = True
+        if self.body is not None:
+            self.body.cancelled = True
+
+    def report(self, sent, total):
+        percent = int(sent * 100 / total) if total else 100
+        if percent != self.percent:
+            self.percent = percent
+            self.progress.emit(percent)
+            if percent == 100:
+                self.status.emit("Analysing...")
+
+    def run(self):
+        try:
+            self.transfer()
+        except UploadCancelled:
+            self.status.emit("Upload cancelled")
+        except Exception as e:
+            if self.cancelled:
+                self.status.emit("Upload cancelled")
+            else:
+                self.failed.emit(f"Is backend running?\n{e}")
+
+    def transfer(self):
+        self.status.emit("Checking...")
+        self.digest = file_digest(self.path, lambda: self.cancelled)
+        cached = load_cached_result(self.digest)
+        if cached and cached['file_id'] is not None and not self.local:
+            # The server may have removed that upload since; then the lookup below finds
+            # another upload of the same bytes, or the file is uploaded again
+            try:
+                if not dataset_exists(cached['file_id']):
+                    drop_cached_result(self.digest)
+                    cached = None
+            except requests.ConnectionError:
+                cached['file_id'] = None  # offline: the result still holds, the server copy is unknown
+        result, file_id = (cached['data'], cached['file_id']) if cached else (None, None)
+        if result is None and not self.local:
+            try:
+                response = SESSION.get(API_BASE + f"upload/{self.digest}/", params=RESULT_PARAMS,
+                                       headers=RESULT_HEADERS)
+            except requests.ConnectionError:
+                if local_engine() is None:
+                    raise
+                self.local = True  # no backend: analyse here instead
+            else:
+                if response.status_code == 200:
+                    body = decode(response)
+                    result, file_id = body['data'], body['file_id']
+                    save_cached_result(self.digest, result, file_id)
+        if result is None and self.local:
+            self.status.emit("Analysing locally...")
+            result = analyse_locally(self.path, lambda: self.cancelled)
+            if not result['success']:
+                self.failed.emit(f"Error processing CSV\n{result['error']}")
+                return
+            save_cached_result(self.digest, result)
+        if result is not None:
+            self.progress.emit(100)
+            self.emit_result(result, file_id)
+            return
+
+        self.body = MultipartBody(self.path, self.report)
+        self.body.cancelled = self.cancelled
+        try:
+            # The hash lets the server skip parsing a file it analysed meanwhile
+            response = SESSION.post(API_BASE + "upload/", data=self.body, params=RESULT_PARAMS,
+                                    headers={**RESULT_HEADERS, 'Content-Type': self.body.content_type,
+                                             'X-Content-SHA256': self.digest})
+        finally:
+            self.body.close()
+        if response.status_code == 200:
+            body = decode(response)
+            save_cached_result(self.digest, body['data'], body['file_id'])
+            self.emit_result(body['data'], body['file_id'])
+        elif response.status_code == 202:
+            # Analysis runs as a background job on the server; poll until it finishes
+            self.wait_for_job(decode(response)['job_id'])
+        else:
+            self.failed.emit("Upload failed. Check Backend.")
+
+    def emit_result(self, result, file_id):
+        if file_id is not None:
+            self.dataset.emit(file_id)
+        self.result.emit(result)
+
+    def wait_for_job(self, job_id):
+        while not self.cancelled:
+            job = conditional_get(API_BASE + f"jobs/{job_id}/", params=RESULT_PARAMS, headers=RESULT_HEADERS)
+            if job is None:
+                self.failed.emit("Analysis job not found.")
+                return
+            if job['status'] == 'done':
+                save_cached_result(self.digest, job['result'], job['file_id'])
+                self.emit_result(job['result'], job['file_id'])
+                return
+            if job['status'] == 'failed':
+                self.failed.emit(f"Error processing CSV\n{job['error']}")
+                return
+            self.status.emit(f"Analysing... {int(job['progress'] * 100)}%")
+            self.msleep(500)
+        self.status.emit("Stopped waiting for the analysis")
+
+
+class BatchUploadWorker(UploadWorker):
+    """
+    Uploads several CSVs in one request (the server analyses them in
+    parallel) and polls the batch until every file is done, off the GUI
+    thread like UploadWorker. `result` carries the final batch status.
+    """
+
+    def __init__(self, paths):
+        super().__init__(None)
+        self.paths = paths
+
+    def transfer(self):
+        self.body = MultipartBody(self.paths, self.report, field='files')
+        self.body.cancelled = self.cancelled
+        try:
+            response = SESSION.post(API_BASE + "upload/batch/", data=self.body,
+                                    headers={'Content-Type': self.body.content_type})
+        finally:
+            self.body.close()
+        if response.status_code != 202:
+            self.failed.emit(f"Batch upload failed.\n{response.text}")
+            return
+        batch_id = response.json()['batch_id']
+        while not self.cancelled:
+            batch = SESSION.get(API_BASE + f"batches/{batch_id}/").json()
+            if batch['complete']:
+                self.progress.emit(100)
+                self.result.emit(batch)
+                return
+            self.status.emit(f"Analysing batch... {batch['done']}/{len(batch['files'])} files done")
+            self.msleep(1000)
+        self.status.emit("Stopped waiting for the analysis")
+
+
+class HistoryWorker(QThread):
+    """Fetches the history list off the GUI thread; `loaded` carries the records."""
+    loaded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def run(self):
+        try:
+            records = conditional_get(API_BASE + "history/", timeout=HISTORY_TIMEOUT)
+        except requests.RequestException as e:
+            self.failed.emit(str(e))
+            return
+        if records is None:
+            self.failed.emit("History request failed")
+        else:
+            self.loaded.emit(records)
+
+
+# Row browser pages are fetched in the background by these threads
+PAGE_FETCHERS = ThreadPoolExecutor(max_workers=2)
+
+
+class RowsModel(QAbstractTableModel):
+    """
+    All rows of a stored dataset, read a page at a time from
+    api/datasets/<id>/rows/ as the view scrolls to them. Only the PAGE_CACHE
+    most recently used pages are kept, so memory stays flat for any number of
+    rows; cells of pages still in flight show a placeholder. Sorting (header
+    clicks) happens on the server.
+    """
+    PAGE_ROWS = 200
+    PAGE_CACHE = 16
+    page_loaded = pyqtSignal(int, int, object)  # generation, page, payload (emitted from fetch threads)
+
+    def __init__(self, file_id, parent=None):
+        super().__init__(parent)
+        self.file_id = file_id
+        self.total = 0
+        self.columns = []
+        self.sort_col = None
+        self.descending = False
+        self.pages = OrderedDict()
+        self.pending = set()
+        self.generation = 0  # bumped on every re-sort, so late pages of the old order are dropped
+        self.page_loaded.connect(self.on_page_loaded)
+        self.fetch(0)
+
+    def fetch(self, page):
+        if page in self.pending:
+            return
+        self.pending.add(page)
+        params = {**RESULT_PARAMS, 'offset': page * self.PAGE_ROWS, 'limit': self.PAGE_ROWS}
+        if self.sort_col:
+            params.update(sort=self.sort_col, order='desc' if self.descending else 'asc')
+        PAGE_FETCHERS.submit(self._fetch, self.generation, page, params)
+
+    def _fetch(self, generation, page, params):
+        try:
+            response = SESSION.get(API_BASE + f"datasets/{self.file_id}/rows/", params=params,
+                                   headers=RESULT_HEADERS, timeout=300)
+            payload = decode(response) if response.status_code == 200 else None
+        except Exception:
+            payload = None
+        try:
+            self.page_loaded.emit(generation, page, payload)
+        except RuntimeError:
+            pass  # the model was deleted meanwhile
+
+    def on_page_loaded(self, generation, page, payload):
+        if generation != self.generation:
+            return
+        self.pending.discard(page)
+        if payload is None:
+            return
+        self.pages[page] = payload
+        while len(self.pages) > self.PAGE_CACHE:
+            self.pages.popitem(last=False)
+        if payload['total'] != self.total or payload['columns'] != self.columns:
+            # First page: now the size is known
+            self.beginResetModel()
+            self.total, self.columns = payload['total'], payload['columns']
+            self.endResetModel()
+            return
+        first = page * self.PAGE_ROWS
+        last = min(first + self.PAGE_ROWS, self.total) - 1
+        self.dataChanged.emit(self.index(first, 0), self.index(last, len(self.columns) - 1))
+        self.headerDataChanged.emit(Qt.Vertical, first, last)
+
+    def page_for(self, row):
+        page = row // self.PAGE_ROWS
+        payload = self.pages.get(page)
+        if payload is None:
+            self.fetch(page)
+            return None
+        self.pages.move_to_end(page)
+        return payload
+
+    def rowCount(self, parent=None):
+        return self.total
+
+    def columnCount(self, parent=None):
+        return len(self.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        payload = self.page_for(index.row())
+        if payload is None:
+            return "..."
+        value = payload['rows'][self.columns[index.column()]][index.row() % self.PAGE_ROWS]
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return ""
+        return str(value)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.columns[section] if section < len(self.columns) else None
+        # Row numbers as in the file, also when sorted
+        payload = self.pages.get(section // self.PAGE_ROWS)
+        if payload is None:
+            return ""
+        return str(int(payload['row'][section % self.PAGE_ROWS]) + 1)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        sort_col = self.columns[column] if 0 <= column < len(self.columns) else None
+        descending = order == Qt.DescendingOrder
+        if (sort_col, descending) == (self.sort_col, self.descending):
+            return
+        self.beginResetModel()
+        self.sort_col, self.descending = sort_col, descending
+        self.pages.clear()
+        self.pending.clear()
+        self.generation += 1
+        self.endResetModel()
+        self.fetch(0)
+
+
 # --- Styling (Light & Dark Themes) ---
 THEME_LIGHT = """
 QMainWindow { background-color: #f8fafc; }
@@ -72,7 +624,7 @@ class ProfessionalStatCard(QFrame):
         
         # Footer (Min/Max/Median)
         bot_layout = QHBoxLayout()
-        for label, val in [("Min", stats['min']), ("Max", stats['max']), ("Med", stats['median'])]:
+        for label, val in [("Min", stats['min']), ("Max", stats['max']), ("Med", stats.get('median', stats.get('p50')))]:
             sub = QLabel(f"{label}: {val}")
             sub.setObjectName("SubStat")
             bot_layout.addWidget(sub)
@@ -84,6 +636,7 @@ class ChemicalApp(QMainWindow):
         self.setWindowTitle("Chemical Visualizer Pro")
         self.resize(1200, 850)
         self.dark_mode = False
+        self.local_mode = False
         self.apply_theme()
 
         # Main Tab Widget
@@ -93,15 +646,18 @@ class ChemicalApp(QMainWindow):
         # Create Tabs
         self.dashboard_tab = QWidget()
         self.history_tab = QWidget()
+        self.data_tab = QWidget()
         self.settings_tab = QWidget()
 
         self.tabs.addTab(self.dashboard_tab, "Dashboard")
         self.tabs.addTab(self.history_tab, "History")
+        self.tabs.addTab(self.data_tab, "Data")
         self.tabs.addTab(self.settings_tab, "Settings")
 
         # Initialize UI
         self.init_dashboard()
         self.init_history()
+        self.init_data()
         self.init_settings()
         
         # Connect tab change to refresh history
@@ -127,9 +683,21 @@ class ChemicalApp(QMainWindow):
         ul = QHBoxLayout(self.upload_frame)
         self.upload_btn = QPushButton("Import CSV Dataset")
         self.upload_btn.clicked.connect(self.upload_file)
+        self.batch_btn = QPushButton("Import Multiple CSVs")
+        self.batch_btn.clicked.connect(self.upload_batch)
         self.upload_label = QLabel("No file loaded")
+        self.upload_progress = QProgressBar()
+        self.upload_progress.setFixedWidth(200)
+        self.upload_progress.hide()
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.clicked.connect(self.cancel_upload)
+        self.cancel_btn.hide()
+        self.upload_worker = None
         ul.addWidget(self.upload_btn)
+        ul.addWidget(self.batch_btn)
         ul.addWidget(self.upload_label)
+        ul.addWidget(self.upload_progress)
+        ul.addWidget(self.cancel_btn)
         ul.addStretch()
         self.dash_layout.addWidget(self.upload_frame)
 
@@ -150,6 +718,8 @@ class ChemicalApp(QMainWindow):
         self.fig_pie = Figure(figsize=(5, 4), facecolor='none')
         self.canvas_pie = FigureCanvas(self.fig_pie)
 
+        self.init_charts()
+
         # Add to grid (Frame them for styling)
         for i, (canvas, title) in enumerate([
             (self.canvas_line, "Time Series Analysis"), 
@@ -176,20 +746,143 @@ class ChemicalApp(QMainWindow):
     def upload_file(self):
         fname, _ = QFileDialog.getOpenFileName(self, 'Open CSV', '.', "CSV Files (*.csv)")
         if fname:
-            self.upload_label.setText(f"Processing {os.path.basename(fname)}...")
-            QApplication.processEvents()
-            try:
-                files = {'file': open(fname, 'rb')}
-                # Call the new Upload Endpoint
-                response = requests.post(API_BASE + "upload/", files=files)
-                if response.status_code == 200:
-                    data = response.json()['data']
-                    self.render_data(data)
-                    self.upload_label.setText("Analysis Complete")
-                else:
-                    QMessageBox.critical(self, "Error", "Upload failed. Check Backend.")
-            except Exception as e:
-                QMessageBox.critical(self, "Connection Error", f"Is backend running?\n{e}")
+            self.upload_label.setText(f"Uploading {os.path.basename(fname)}...")
+            # Network and decoding run on the worker thread; results arrive as signals
+            worker = UploadWorker(fname, local=self.local_mode)
+            worker.progress.connect(self.upload_progress.setValue)
+            worker.status.connect(self.upload_label.setText)
+            worker.result.connect(self.on_upload_result)
+            worker.dataset.connect(lambda file_id: self.open_rows(file_id, os.path.basename(fname)))
+            worker.failed.connect(self.on_upload_failed)
+            worker.finished.connect(lambda: self.set_uploading(False))
+            self.upload_worker = worker
+            self.set_uploading(True)
+            worker.start()
+
+    def set_uploading(self, uploading):
+        self.upload_btn.setEnabled(not uploading)
+        self.batch_btn.setEnabled(not uploading)
+        self.upload_progress.setValue(0)
+        self.upload_progress.setVisible(uploading)
+        self.cancel_btn.setVisible(uploading)
+        if not uploading:
+            self.upload_worker = None
+
+    def cancel_upload(self):
+        if self.upload_worker is not None:
+            self.upload_worker.cancel()
+
+    def on_upload_result(self, data):
+        self.render_data(data)
+        self.upload_label.setText("Analysis Complete")
+
+    def on_upload_failed(self, message):
+        self.upload_label.setText("Analysis Failed")
+        QMessageBox.critical(self, "Error", message)
+
+    def closeEvent(self, event):
+        # Abort a running upload rather than leaving its thread behind
+        if self.upload_worker is not None:
+            self.upload_worker.cancel()
+            self.upload_worker.wait()
+        if self.history_worker is not None:
+            self.history_worker.wait()
+        if _engine_pool is not None:
+            _engine_pool.shutdown(wait=False, cancel_futures=True)
+        super().closeEvent(event)
+
+    def upload_batch(self):
+        fnames, _ = QFileDialog.getOpenFileNames(self, 'Open CSVs', '.', "CSV Files (*.csv)")
+        if fnames:
+            self.upload_label.setText(f"Uploading {len(fnames)} files...")
+            # All files in one request, sent and polled on the worker thread
+            worker = BatchUploadWorker(fnames)
+            worker.progress.connect(self.upload_progress.setValue)
+            worker.status.connect(self.upload_label.setText)
+            worker.result.connect(self.on_batch_result)
+            worker.failed.connect(self.on_upload_failed)
+            worker.finished.connect(lambda: self.set_uploading(False))
+            self.upload_worker = worker
+            self.set_uploading(True)
+            worker.start()
+
+    def on_batch_result(self, batch):
+        # Combined summary over every file that finished
+        if batch['done']:
+            self.render_data(batch['summary'])
+        self.upload_label.setText(f"Batch complete: {batch['done']}/{len(batch['files'])} files analysed")
+        failed = [f"{f['file_name']}: {f['error']}" for f in batch['files'] if f['status'] == 'failed']
+        if failed:
+            QMessageBox.warning(self, "Some files failed", "\n".join(failed))
+
+    def init_charts(self):
+        # Axes and artists are made once; render_data only swaps their data
+        self.ax_line = self.fig_line.add_subplot(111)
+        self.line_pressure, = self.ax_line.plot([], [], label='Pressure', color='#f43f5e')
+        self.line_temp, = self.ax_line.plot([], [], label='Temp', color='#3b82f6')
+        self.ax_line.legend()
+        self.ax_line.set_title("Process Stability")
+
+        self.ax_scatter = self.fig_scatter.add_subplot(111)
+        self.scatter = self.ax_scatter.scatter([], [], alpha=0.5, color='#6366f1')
+        # Fast path for large datasets: a single path of pixel-sized markers
+        self.scatter_dense, = self.ax_scatter.plot([], [], linestyle='none', marker=',',
+                                                   alpha=0.5, color='#6366f1')
+        self.ax_scatter.set_xlabel("Pressure")
+        self.ax_scatter.set_ylabel("Flowrate")
+        self.ax_scatter.set_title("P vs F Correlation")
+
+        self.ax_pie = self.fig_pie.add_subplot(111)
+        self.pie_labels = None
+        self.pie_wedges, self.pie_texts, self.pie_pcts = [], [], []
+
+    def style_charts(self):
+        text = 'white' if self.dark_mode else 'black'
+        for fig in [self.fig_line, self.fig_scatter, self.fig_pie]:
+            fig.patch.set_facecolor('none') # Keep transparent to match card
+            for ax in fig.axes:
+                ax.tick_params(colors=text)
+                ax.xaxis.label.set_color(text)
+                ax.yaxis.label.set_color(text)
+                ax.title.set_color(text)
+                for spine in ax.spines.values():
+                    spine.set_edgecolor(text)
+        for label in self.ax_line.get_legend().get_texts() + self.pie_texts:
+            label.set_color(text)
+
+    def draw_charts(self):
+        # Coalesced: each canvas repaints once on the next event loop pass
+        self.canvas_line.draw_idle()
+        self.canvas_scatter.draw_idle()
+        self.canvas_pie.draw_idle()
+
+    def update_pie(self, dist):
+        labels, values = list(dist.keys()), np.asarray(list(dist.values()), dtype=float)
+        total = values.sum()
+        if labels != self.pie_labels or not total:
+            # Different categories: rebuild the (few) wedges
+            for artist in self.pie_wedges + self.pie_texts + self.pie_pcts:
+                artist.remove()
+            self.pie_wedges, self.pie_texts, self.pie_pcts = [], [], []
+            self.pie_labels = labels
+            if total:
+                self.pie_wedges, self.pie_texts, self.pie_pcts = self.ax_pie.pie(
+                    values, labels=labels, autopct='%1.1f%%', startangle=90,
+                    colors=matplotlib.rcParams['axes.prop_cycle'].by_key()['color'])
+                self.style_charts()
+            return
+        # Same categories: move the existing wedges and their labels
+        theta = 90 + 360 * np.concatenate([[0], np.cumsum(values / total)])
+        for wedge, text, pct, t1, t2, share in zip(self.pie_wedges, self.pie_texts, self.pie_pcts,
+                                                   theta[:-1], theta[1:], values / total):
+            wedge.set_theta1(t1)
+            wedge.set_theta2(t2)
+            mid = np.deg2rad((t1 + t2) / 2)
+            x, y = np.cos(mid), np.sin(mid)
+            text.set_position((1.1 * x, 1.1 * y))
+            text.set_horizontalalignment('left' if x > 0 else 'right')
+            pct.set_position((0.6 * x, 0.6 * y))
+            pct.set_text(f'{share * 100:1.1f}%')
 
     def render_data(self, data):
         # 1. Update Stats
@@ -206,41 +899,39 @@ class ChemicalApp(QMainWindow):
         if 'Temperature' in stats:
             self.stats_layout.addWidget(ProfessionalStatCard("Temp", "°C", stats['Temperature']))
 
-        # 2. Update Charts
+        # 2. Update Charts (the artists stay; only their data changes)
+        chart = chart_columns(data.get('chart_data') or [])
+        # Gaps (None) become NaN, which matplotlib leaves out of the lines
+        pressures = np.asarray(chart.get('Pressure', []), dtype=float)
+        temps = np.asarray(chart.get('Temperature', []), dtype=float)
+        flows = np.asarray(chart.get('Flowrate', []), dtype=float)
+        if len(temps) != len(pressures):
+            temps = np.full(len(pressures), np.nan)
+        if len(flows) != len(pressures):
+            flows = np.full(len(pressures), np.nan)
+
         # Line Chart
-        self.fig_line.clear()
-        ax1 = self.fig_line.add_subplot(111)
-        chart_data = data.get('chart_data', [])
-        if chart_data:
-            idx = range(len(chart_data))
-            pressures = [d.get('Pressure', 0) for d in chart_data]
-            temps = [d.get('Temperature', 0) for d in chart_data]
-            ax1.plot(idx, pressures, label='Pressure', color='#f43f5e')
-            ax1.plot(idx, temps, label='Temp', color='#3b82f6')
-            ax1.legend()
-            ax1.set_title("Process Stability")
-        self.canvas_line.draw()
+        self.line_pressure.set_data(*minmax_envelope(pressures))
+        self.line_temp.set_data(*minmax_envelope(temps))
+        self.ax_line.relim()
+        self.ax_line.autoscale_view()
 
         # Scatter Chart
-        self.fig_scatter.clear()
-        ax2 = self.fig_scatter.add_subplot(111)
-        if chart_data:
-            p = [d.get('Pressure', 0) for d in chart_data]
-            f = [d.get('Flowrate', 0) for d in chart_data]
-            ax2.scatter(p, f, alpha=0.5, color='#6366f1')
-            ax2.set_xlabel("Pressure")
-            ax2.set_ylabel("Flowrate")
-            ax2.set_title("P vs F Correlation")
-        self.canvas_scatter.draw()
+        points = np.column_stack([pressures, flows])
+        points = points[np.isfinite(points).all(axis=1)]
+        dense = len(points) > DENSE_POINTS
+        self.scatter.set_offsets(points[:0] if dense else points)
+        self.scatter_dense.set_data(points[:, 0] if dense else [], points[:, 1] if dense else [])
+        # Collections are not part of relim(), so the limits come from the points themselves
+        self.ax_scatter.ignore_existing_data_limits = True
+        if len(points):
+            self.ax_scatter.update_datalim(points)
+        self.ax_scatter.autoscale_view()
 
         # Pie Chart
-        self.fig_pie.clear()
-        ax3 = self.fig_pie.add_subplot(111)
-        dist = data.get('distribution', {})
-        if dist:
-            ax3.pie(dist.values(), labels=dist.keys(), autopct='%1.1f%%', startangle=90)
-        self.canvas_pie.draw()
+        self.update_pie(data.get('distribution') or {})
 
+        self.draw_charts()
         self.chart_container.show()
 
     # --- TAB 2: HISTORY ---
@@ -260,29 +951,74 @@ class ChemicalApp(QMainWindow):
         self.hist_table.setColumnCount(4)
         self.hist_table.setHorizontalHeaderLabels(["Date", "File Name", "Avg Pressure", "Avg Temp"])
         self.hist_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.hist_table.cellDoubleClicked.connect(self.open_history_rows)
+        self.history_ids = []
+        self.history_worker = None
         layout.addWidget(self.hist_table)
 
     def load_history(self):
-        try:
-            res = requests.get(API_BASE + "history/")
-            if res.status_code == 200:
-                records = res.json()
-                self.hist_table.setRowCount(len(records))
-                for i, r in enumerate(records):
-                    # Parse date slightly for readability
-                    date_str = r['upload_date'].split('T')[0]
-                    self.hist_table.setItem(i, 0, QTableWidgetItem(date_str))
-                    self.hist_table.setItem(i, 1, QTableWidgetItem(r['file_name']))
-                    self.hist_table.setItem(i, 2, QTableWidgetItem(str(r['avg_pressure'])))
-                    self.hist_table.setItem(i, 3, QTableWidgetItem(str(r['avg_temperature'])))
-        except:
-            print("Could not fetch history")
+        if self.history_worker is not None:
+            return  # a refresh is already on its way
+        # The request runs on a worker thread; the table is filled when `loaded` arrives
+        worker = HistoryWorker()
+        worker.loaded.connect(self.show_history)
+        worker.failed.connect(lambda message: print(f"Could not fetch history: {message}"))
+        worker.finished.connect(self.on_history_finished)
+        self.history_worker = worker
+        worker.start()
+
+    def on_history_finished(self):
+        self.history_worker = None
+
+    def show_history(self, records):
+        self.history_ids = [(r['id'], r['file_name']) for r in records]
+        self.hist_table.setRowCount(len(records))
+        for i, r in enumerate(records):
+            # Parse date slightly for readability
+            date_str = r['uploaded_at'].split('T')[0]
+            self.hist_table.setItem(i, 0, QTableWidgetItem(date_str))
+            self.hist_table.setItem(i, 1, QTableWidgetItem(r['file_name']))
+            self.hist_table.setItem(i, 2, QTableWidgetItem(str(r['avg_pressure'])))
+            self.hist_table.setItem(i, 3, QTableWidgetItem(str(r['avg_temperature'])))
+
+    def open_history_rows(self, row, column):
+        if row < len(self.history_ids):
+            self.open_rows(*self.history_ids[row])
+            self.tabs.setCurrentWidget(self.data_tab)
+
+    # --- TAB 3: DATA ---
+    def init_data(self):
+        layout = QVBoxLayout(self.data_tab)
+        self.data_label = QLabel("Import a dataset (or double-click one in History) to browse its rows")
+        layout.addWidget(self.data_label)
+
+        self.rows_view = QTableView()
+        self.rows_view.setAlternatingRowColors(True)
+        # Fixed row heights: the view never measures rows it does not show
+        self.rows_view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.rows_view.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.rows_view.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.rows_view.setSortingEnabled(True)
+        self.rows_model = None
+        layout.addWidget(self.rows_view)
+
+    def open_rows(self, file_id, name):
+        if self.rows_model is not None and self.rows_model.file_id == file_id:
+            return
+        self.rows_view.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        if self.rows_model is not None:
+            self.rows_model.deleteLater()
+        self.rows_model = RowsModel(file_id, self)
+        self.rows_model.modelReset.connect(
+            lambda: self.data_label.setText(f"{name}: {self.rows_model.total:,} rows (click a header to sort)"))
+        self.rows_view.setModel(self.rows_model)
+        self.data_label.setText(f"Loading {name}...")
 
     def on_tab_change(self, index):
         if index == 1: # History Tab
             self.load_history()
 
-    # --- TAB 3: SETTINGS ---
+    # --- TAB 4: SETTINGS ---
     def init_settings(self):
         layout = QVBoxLayout(self.settings_tab)
         layout.setAlignment(Qt.AlignTop)
@@ -297,32 +1033,34 @@ class ChemicalApp(QMainWindow):
         self.cb_dark.setStyleSheet("font-size: 16px; padding: 10px;")
         self.cb_dark.stateChanged.connect(self.toggle_dark_mode)
         l.addWidget(self.cb_dark)
+
+        l.addWidget(QLabel("Analysis"))
+
+        self.cb_local = QCheckBox("Analyse files on this computer (offline mode)")
+        self.cb_local.setStyleSheet("font-size: 16px; padding: 10px;")
+        self.cb_local.stateChanged.connect(self.toggle_local_mode)
+        l.addWidget(self.cb_local)
         
         layout.addWidget(container)
 
+    def toggle_local_mode(self, state):
+        self.local_mode = (state == Qt.Checked)
+        if self.local_mode and local_engine() is None:
+            QMessageBox.warning(self, "Offline Mode",
+                                f"The analysis engine could not be loaded from {ENGINE_DIR}.\n"
+                                "Install pandas and numpy, or set CHEMVIZ_BACKEND_DIR.")
+            self.cb_local.setChecked(False)
+
     def toggle_dark_mode(self, state):
         self.dark_mode = (state == Qt.Checked)
         self.apply_theme()
         
-        # Matplotlib figures need recoloring
-        face = '#1e293b' if self.dark_mode else 'none'
-        text = 'white' if self.dark_mode else 'black'
-        
-        for fig in [self.fig_line, self.fig_scatter, self.fig_pie]:
-            fig.patch.set_facecolor('none') # Keep transparent to match card
-            for ax in fig.axes:
-                ax.tick_params(colors=text)
-                ax.xaxis.label.set_color(text)
-                ax.yaxis.label.set_color(text)
-                ax.title.set_color(text)
-                for spine in ax.spines.values():
-                    spine.set_edgecolor(text)
-        
-        self.canvas_line.draw()
-        self.canvas_scatter.draw()
-        self.canvas_pie.draw()
+        # Matplotlib figures need recoloring (only colours change, nothing is re-plotted)
+        self.style_charts()
+        self.draw_charts()
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # offline-mode workers in packaged builds
     app = QApplication(sys.argv)
     app.setFont(QFont("Segoe UI", 10))
     
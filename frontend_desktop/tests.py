@@ -0,0 +1,253 @@
+"""
+Desktop client tests (no backend needed; Qt runs offscreen):
+
+    cd frontend_desktop && QT_QPA_PLATFORM=offscreen python -m unittest tests
+"""
+import email.parser
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import requests
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QApplication
+
+import main
+
+APP = QApplication.instance() or QApplication([])
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = {'Content-Type': 'application/json'}
+
+    def json(self):
+        return self.body
+
+
+class FakeSession:
+    """Answers by (method, path below API_BASE); records every call."""
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.calls = []
+        self.threads = set()
+
+    def request(self, method, url, **kwargs):
+        path = url[len(main.API_BASE):]
+        self.calls.append((method, path))
+        self.threads.add(threading.get_ident())
+        answer = self.routes.get((method, path), FakeResponse(404))
+        if callable(answer):
+            answer = answer(**kwargs)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    def head(self, url, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        if 'data' in kwargs:
+            kwargs['data'].read()
+        return self.request('POST', url, **kwargs)
+
+
+class MultipartBodyTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+
+    def write(self, name, content=b'Flowrate\n1.5\n'):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def parts(self, body):
+        # Parsed the way a server reads the form: one message part per file
+        raw = b''.join(iter(lambda: body.read(7), b''))
+        self.assertEqual(len(raw), len(body))
+        message = email.parser.BytesParser().parsebytes(
+            f'Content-Type: {body.content_type}\r\n\r\n'.encode() + raw)
+        return message.get_payload()
+
+    def test_files_and_progress(self):
+        sent = []
+        paths = [self.write('a.csv'), self.write('b.csv', b'x' * 5000)]
+        body = main.MultipartBody(paths, lambda done, total: sent.append((done, total)), field='files')
+        parts = self.parts(body)
+        self.assertEqual([part.get_filename() for part in parts], ['a.csv', 'b.csv'])
+        self.assertEqual(parts[1].get_payload(decode=True), b'x' * 5000)
+        self.assertEqual(sent[-1], (len(body), len(body)))
+
+    def test_quotes_and_line_breaks_in_file_names_are_percent_encoded(self):
+        if os.name == 'nt':
+            self.skipTest('quotes and line breaks are not allowed in Windows file names')
+        path = self.write('plant "A"\r\nContent-Type: x.csv')
+        body = main.MultipartBody(path, lambda done, total: None)
+        part, = self.parts(body)
+        self.assertEqual(part.get_filename(), 'plant %22A%22%0D%0AContent-Type: x.csv')
+        self.assertEqual(part.get_content_type(), 'text/csv')
+        self.assertEqual(part.get_payload(decode=True), b'Flowrate\n1.5\n')
+
+    def test_cancelled_body_stops_the_transfer(self):
+        body = main.MultipartBody(self.write('a.csv'), lambda done, total: None)
+        body.read(10)
+        body.cancelled = True
+        with self.assertRaises(main.UploadCancelled):
+            body.read(10)
+        body.close()
+
+
+class ResultCacheTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        patcher = mock.patch.object(main, 'RESULT_CACHE_DIR', os.path.join(tmp, 'cache'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.path = os.path.join(tmp, 'plant.csv')
+        with open(self.path, 'wb') as f:
+            f.write(b'Flowrate\n1.5\n')
+        self.digest = main.file_digest(self.path)
+        main.save_cached_result(self.digest, {'total_count': 1}, file_id=3)
+
+    def run_worker(self, routes):
+        session = FakeSession(routes)
+        worker = main.UploadWorker(self.path)
+        results, datasets = [], []
+        worker.result.connect(results.append)
+        worker.dataset.connect(datasets.append)
+        with mock.patch.object(main, 'SESSION', session):
+            worker.transfer()
+        return session.calls, results, datasets
+
+    def test_hit_is_checked_with_the_server(self):
+        calls, results, datasets = self.run_worker({('HEAD', 'history/3/'): FakeResponse(200)})
+        self.assertEqual(calls, [('HEAD', 'history/3/')])
+        self.assertEqual((results, datasets), ([{'total_count': 1}], [3]))
+
+    def test_upload_removed_on_the_server_is_looked_up_again(self):
+        lookup = FakeResponse(200, {'data': {'total_count': 1}, 'file_id': 8})
+        calls, results, datasets = self.run_worker({('GET', f'upload/{self.digest}/'): lookup})
+        self.assertEqual(calls, [('HEAD', 'history/3/'), ('GET', f'upload/{self.digest}/')])
+        self.assertEqual(datasets, [8])
+        self.assertEqual(main.load_cached_result(self.digest)['file_id'], 8)
+
+    def test_bytes_gone_from_the_server_are_uploaded_again(self):
+        upload = FakeResponse(200, {'data': {'total_count': 1}, 'file_id': 9})
+        calls, results, datasets = self.run_worker({('POST', 'upload/'): upload})
+        self.assertEqual([call[0] for call in calls], ['HEAD', 'GET', 'POST'])
+        self.assertEqual(datasets, [9])
+
+    def test_stale_entry_is_dropped_even_if_the_upload_fails(self):
+        self.run_worker({('POST', 'upload/'): FakeResponse(500)})
+        self.assertIsNone(main.load_cached_result(self.digest))
+
+    def test_offline_hit_keeps_the_result_without_the_server_id(self):
+        calls, results, datasets = self.run_worker({('HEAD', 'history/3/'): requests.ConnectionError()})
+        self.assertEqual((results, datasets), ([{'total_count': 1}], []))
+
+
+class HistoryTests(unittest.TestCase):
+    records = [{'id': 4, 'file_name': 'plant.csv', 'uploaded_at': '2024-05-01T08:00:00Z',
+                'avg_pressure': 5.1, 'avg_temperature': 110.2}]
+
+    def setUp(self):
+        patcher = mock.patch.dict(main.ETAG_CACHE, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.window = main.ChemicalApp()
+        self.addCleanup(self.window.deleteLater)
+
+    def load(self, answer):
+        session = FakeSession({('GET', 'history/'): answer})
+        with mock.patch.object(main, 'SESSION', session):
+            self.window.load_history()
+            worker = self.window.history_worker
+            self.assertTrue(worker.wait(5000))
+            APP.processEvents()  # queued signals from the worker thread
+        return session
+
+    def test_history_is_fetched_off_the_gui_thread(self):
+        session = self.load(FakeResponse(200, self.records))
+        self.assertNotIn(threading.get_ident(), session.threads)
+        self.assertIsNone(self.window.history_worker)
+        table = self.window.hist_table
+        self.assertEqual(table.rowCount(), 1)
+        self.assertEqual([table.item(0, c).text() for c in range(4)], ['2024-05-01', 'plant.csv', '5.1', '110.2'])
+        self.assertEqual(self.window.history_ids, [(4, 'plant.csv')])
+
+    def test_unreachable_backend_leaves_the_table(self):
+        self.load(FakeResponse(200, self.records))
+        with mock.patch('builtins.print') as log:
+            self.load(requests.ConnectionError('refused'))
+        self.assertIn('Could not fetch history', log.call_args.args[0])
+        self.assertEqual(self.window.hist_table.rowCount(), 1)
+        self.assertIsNone(self.window.history_worker)
+
+
+class RowsModelTests(unittest.TestCase):
+    total = 450
+
+    def rows(self, params, **kwargs):
+        # The server's rows endpoint over Flowrate = 0..449 (no gaps)
+        self.requests.append(params)
+        positions = list(range(self.total))
+        if params.get('sort'):
+            positions.sort(reverse=params['order'] == 'desc')
+        positions = positions[params['offset']:params['offset'] + params['limit']]
+        return FakeResponse(200, {'total': self.total, 'columns': ['Flowrate'], 'row': positions,
+                                  'rows': {'Flowrate': [float(p) for p in positions]}})
+
+    def setUp(self):
+        self.requests = []
+        patcher = mock.patch.object(main, 'SESSION', FakeSession({('GET', 'datasets/5/rows/'): self.rows}))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def settle(self, condition):
+        # Pages arrive from the fetch threads as queued signals
+        deadline = time.monotonic() + 5
+        while not condition() and time.monotonic() < deadline:
+            APP.processEvents()
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_pages_are_fetched_as_rows_are_shown(self):
+        model = main.RowsModel(5)
+        self.settle(lambda: model.total == self.total)
+        self.assertEqual(model.data(model.index(3, 0)), '3.0')
+        self.assertEqual(model.data(model.index(420, 0)), '...')
+        self.settle(lambda: model.data(model.index(420, 0)) == '420.0')
+        self.assertEqual(model.headerData(420, Qt.Vertical), '421')
+        self.assertEqual([params['offset'] for params in self.requests], [0, 400])
+
+    def test_sorting_refetches_in_the_new_order(self):
+        model = main.RowsModel(5)
+        self.settle(lambda: model.total == self.total)
+        model.sort(0, Qt.DescendingOrder)
+        self.assertEqual(model.data(model.index(0, 0)), '...')
+        self.settle(lambda: model.data(model.index(0, 0)) == '449.0')
+        self.assertEqual((self.requests[-1]['sort'], self.requests[-1]['order']), ('Flowrate', 'desc'))
+
+    def test_pages_of_an_old_order_are_dropped(self):
+        model = main.RowsModel(5)
+        self.settle(lambda: model.total == self.total)
+        model.sort(0, Qt.DescendingOrder)
+        model.on_page_loaded(0, 0, self.rows({'offset': 0, 'limit': 200}).json())
+        self.assertNotIn(0, model.pages)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -60,6 +60,33 @@ const StatCard = ({ title, data, unit }) => (
   </div>
 );
 
+// Last ETag and body per URL: repeat GETs send If-None-Match and reuse the body on 304
+const etagCache = new Map();
+const conditionalGet = async (url) => {
+  const cached = etagCache.get(url);
+  const response = await axios.get(url, {
+    headers: cached ? { 'If-None-Match': cached.etag } : {},
+    validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+  });
+  if (response.status === 304) return cached.data;
+  if (response.headers.etag) {
+    etagCache.delete(url);
+    etagCache.set(url, { etag: response.headers.etag, data: response.data });
+    if (etagCache.size > 50) etagCache.delete(etagCache.keys().next().value);
+  }
+  return response.data;
+};
+
+// Polls a background analysis job until it is done and returns its result
+const waitForJob = async (jobId) => {
+  for (;;) {
+    const job = await conditionalGet(`http://127.0.0.1:8000/api/jobs/${jobId}/`);
+    if (job.status === 'done') return job.result;
+    if (job.status === 'failed') throw new Error(job.error);
+    await new Promise((resolve) => setTimeout(resolve, 500));
+  }
+};
+
 // --- Dashboard Component ---
 const Dashboard = () => {
   const [file, setFile] = useState(null);
@@ -76,7 +103,12 @@ const Dashboard = () => {
     setLoading(true); setError(null);
     try {
       const response = await axios.post('http://127.0.0.1:8000/api/upload/', formData);
-      setData(response.data.data);
+      if (response.status === 202) {
+        // Analysis runs as a background job; poll until it finishes
+        setData(await waitForJob(response.data.job_id));
+      } else {
+        setData(response.data.data);
+      }
     } catch (err) {
       console.error(err);
       setError("Failed to connect. Ensure Backend is running.");